@@ -8,20 +8,141 @@ MODEL_CONFIGS = [
     {
         "path": "./models/qrcode.pt",
         "conf_threshold": 0.65,
-        "name": "QR Code Detector"
+        "name": "QR Code Detector",
+        "batch_size": 8,     # Pages per forward pass
+        "backend": "torch",  # "torch", or "onnx"/"openvino" after running app.services.model_export
+        "precision": "fp32"  # "int8" (onnx) / "fp16" (openvino) once evaluated, see QUANT_* below
     },
     {
         "path": "./models/danik&stamp.pt",
         "conf_threshold": 0.25,
-        "name": "Signature Detector"
+        "name": "Signature Detector",
+        "batch_size": 8,
+        "backend": "torch"
     },
     # Add your third model when ready:
     # {
     #     "path": "./models/stamp_detector.pt",
     #     "conf_threshold": 0.65,
-    #     "name": "Stamp Detector"
+    #     "name": "Stamp Detector",
+    #     "batch_size": 8,
+    #     "backend": "torch"
     # },
 ]
 
+# Tiled inference (per model, in MODEL_CONFIGS): small objects such as QR codes
+# and initials get lost when the whole page is downscaled to INFERENCE_IMGSZ.
+# Pages larger than that can additionally be cut into overlapping tiles that
+# run at native resolution, e.g. with RASTER_MAX_DIMENSION = 4096:
+#     "tile_size": 1024,        # Tile side in pixels; None/absent: full page only
+#     "tile_overlap": 0.2,      # Share of a tile its neighbours overlap
+#     "tile_merge": "nms",      # "nms" or "wbf" for duplicates across tiles
+#     "tile_merge_threshold": 0.5
+
+# Inference image size ('slight zoom' effect from cropper)
+INFERENCE_IMGSZ = 1280
+
+# Run the models concurrently on the shared preprocessed page tensor (one
+# thread per model; separate CUDA streams on GPU). Off: one model after another
+INFERENCE_CONCURRENT_MODELS = False
+
+# Drop a box when another model reported the same class at a higher confidence
+# with more than this IoU. None keeps every model's boxes
+INFERENCE_CROSS_MODEL_IOU = None
+
+# Cascade: a fast pass at CASCADE_IMGSZ decides per page and model whether the
+# full INFERENCE_IMGSZ pass runs (benchmarks/bench_cascade.py helps pick these)
+CASCADE_IMGSZ = None     # e.g. 640; None always runs the full-resolution pass
+CASCADE_CONF = 0.05      # Pre-pass confidence that sends a page to the full pass
+
+# Quantized model variants
+# A model's "precision" other than fp32 is only used when its evaluation
+# report (python -m app.services.evaluation) shows at most this much loss
+# against FP32 on the labeled page set; otherwise FP32 is loaded
+QUANT_MAX_MAP50_DROP = 0.01    # Absolute mAP@0.5
+QUANT_MAX_RECALL_DROP = 0.02   # Absolute recall at the model's conf_threshold
+
 # API Settings
 STATIC_DIR = "static/annotated"
+
+# Annotated page JPGs and PDF of /analyze (overridable per request with ?annotations=):
+# "eager" draws them while the job runs, "lazy" on the first GET /annotated/...,
+# "none" skips them
+ANNOTATIONS_MODE = "eager"
+# Annotated PDF: "vector" adds the boxes as annotations to the original PDF
+# (keeps its text layer and size), "raster" assembles the annotated page JPGs
+ANNOTATED_PDF_STYLE = "vector"
+# Annotated JPGs are encoded on a thread pool while the next page is drawn
+ANNOTATION_JPEG_WORKERS = 2   # 0 encodes in the job's thread
+ANNOTATION_JPEG_QUALITY = 75
+
+# Uploads
+# Uploads are copied to a temp file in chunks and jobs read them from disk;
+# ZIP members are extracted one at a time next to it
+UPLOAD_CHUNK_BYTES = 1024 * 1024   # Copy/extract chunk size
+UPLOAD_TMP_DIR = None              # None uses the system temp directory
+ZIP_MAX_MEMBERS = 1000                              # Files in a /batch-analyze archive; beyond → HTTP 413
+ZIP_MAX_UNCOMPRESSED_BYTES = 8 * 1024 * 1024 * 1024  # Total size of its PDFs once extracted; beyond → HTTP 413
+
+# Execution layer
+# PDF rendering and inference run on a bounded worker pool, off the event loop
+EXECUTOR_MAX_WORKERS = 2   # Jobs processed at the same time
+EXECUTOR_MAX_QUEUE = 8     # Jobs allowed to wait for a worker; beyond this → HTTP 429
+EXECUTOR_RETRY_AFTER = 5   # Seconds suggested to clients in the 429 Retry-After header
+
+# Page pipeline
+# Pages stream through render → infer → annotate → write; this many pages per
+# job are held in memory at once (also the most a single job adds to a batch)
+PIPELINE_MAX_INFLIGHT_PAGES = 8
+
+# Rasterization
+# PDFs are rendered on worker processes, page ranges in parallel
+RASTER_WORKERS = 2       # Rendering processes; 0 renders in the request thread
+RASTER_CHUNK_PAGES = 4   # Pages per task handed to a worker
+RASTER_MIN_POOL_PAGES = 8  # /analyze renders shorter PDFs in the request thread
+RASTER_MAX_DIMENSION = 2048  # Longest rendered page side; raise (e.g. 4096) for tiled models
+# Pages only the models look at (lazy/no annotations, /batch-analyze) are rendered
+# at the largest imgsz in use instead, since the models letterbox to that anyway;
+# eager annotated JPGs and tiled models still get RASTER_MAX_DIMENSION. Coordinates
+# are reported in RASTER_MAX_DIMENSION pixels either way
+# (benchmarks/bench_render_resolution.py compares both)
+RASTER_AT_MODEL_RESOLUTION = True
+
+# Blank page triage: separator sheets and empty back sides skip the models and
+# report no detections; the response statistics show the share of such pages
+# (see app/utils/page_triage.py)
+TRIAGE_ENABLED = True
+TRIAGE_MAX_TEXT_CHARS = 100       # No images/drawings and at most this much text; None: check off
+TRIAGE_MAX_INK_COVERAGE = 0.0005  # Share of ink pixels up to which a page is blank; None: check off
+TRIAGE_INK_THRESHOLD = 160        # A pixel whose darkest channel is below this counts as ink
+
+# ROI mode: on born-digital pages the models only run on the placements of
+# embedded images, vector drawings and annotations, each rendered at its own
+# resolution and mapped back (see app/utils/page_regions.py); scans and busy
+# pages still run whole. benchmarks/bench_roi.py compares it with full pages
+ROI_ENABLED = False
+ROI_IMGSZ = 640             # Inference size of the crops
+ROI_MAX_REGIONS = 12        # Pages with more regions run whole
+ROI_MAX_PAGE_SHARE = 0.5    # Pages where one placement, or all regions, cover more run whole
+
+# Batching
+# Pages from concurrent requests (and across PDFs in a ZIP) share batches
+BATCHER_MAX_BATCH_SIZE = 16   # Pages per dispatched batch
+BATCHER_MAX_WAIT_MS = 10      # Max time a page waits for its batch to fill
+
+# Result cache
+# Repeated documents/pages skip inference; keyed by content hash + model fingerprint
+CACHE_ENABLED = True
+CACHE_MEMORY_BYTES = 64 * 1024 * 1024       # In-process LRU budget
+CACHE_DISK_DIR = "cache/results"            # None disables the on-disk store
+CACHE_DISK_BYTES = 1024 * 1024 * 1024       # On-disk store budget
+
+# Background jobs
+# POST /jobs returns a job id at once; GET /jobs/{job_id} reports progress and the result.
+# Jobs run on the execution layer above and share its EXECUTOR_* limits (HTTP 429 when full)
+JOBS_STORE = "memory"                  # "memory" (this process only) or "sqlite" (shared by uvicorn workers)
+JOBS_SQLITE_PATH = "jobs/jobs.sqlite3"  # Used when JOBS_STORE = "sqlite"
+JOBS_UPLOAD_DIR = "jobs/uploads"       # Uploads wait here until their job runs
+JOBS_RETENTION_SECONDS = 24 * 3600     # Finished jobs (and their results) are dropped this long after finishing
+JOBS_MAX_RETAINED = 1000               # Most finished jobs kept; the oldest go first
+JOBS_PROGRESS_INTERVAL_SECONDS = 1.0   # Page progress is written at most this often; file boundaries always
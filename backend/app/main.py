@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from app.routers.analyze import router as analyze_router
+from app.routers.jobs import router as jobs_router
 from fastapi.middleware.cors import CORSMiddleware
 
 
@@ -28,4 +29,10 @@ app.add_middleware(
 # Static files for annotated images
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-app.include_router(analyze_router)
\ No newline at end of file
+app.include_router(analyze_router)
+app.include_router(jobs_router)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
@@ -1,250 +1,237 @@
-import uuid
-import zipfile
-import io
-from pathlib import Path
-
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
-
-from app.utils.pdf_tools import pdf_bytes_to_images, images_to_pdf
-from app.services.document_inspector import DocumentInspector
-from app.config import MODEL_CONFIGS
-
-router = APIRouter()
-
-# Load all models once globally with cropper parameters
-# Use CPU by default, but will use CUDA if available
-import torch
-device = "cuda" if torch.cuda.is_available() else "cpu"
-inspector = DocumentInspector(
-    MODEL_CONFIGS,
-    device=device,
-    imgsz=1280  # 'Slight zoom' effect from cropper
+import asyncio
+import re
+from typing import Literal, Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.services.executor import BoundedExecutor, ExecutorSaturatedError
+from app.services import analysis, annotations
+from app.services.metrics import registry
+from app.utils.serialization import FastJSONResponse, dumps
+from app.utils.uploads import remove_upload, save_upload
+from app.config import (
+    EXECUTOR_MAX_WORKERS,
+    EXECUTOR_MAX_QUEUE,
+    EXECUTOR_RETRY_AFTER,
+    ANNOTATIONS_MODE,
+    ANNOTATED_PDF_STYLE,
 )
 
-STATIC_DIR = Path("static/annotated")
-STATIC_DIR.mkdir(parents=True, exist_ok=True)
+router = APIRouter(default_response_class=FastJSONResponse)
 
+# ?format=compact returns columnar per-page arrays instead of one dict per
+# detection (see analysis.RESPONSE_FORMATS); the default stays as it was
+ResponseFormat = Literal["default", "compact"]
+
+# ?annotations= overrides ANNOTATIONS_MODE for one /analyze request
+AnnotationsMode = Literal["eager", "lazy", "none"]
+
+# Blocking work (rasterization, inference, file writes) runs here
+executor = BoundedExecutor(EXECUTOR_MAX_WORKERS, EXECUTOR_MAX_QUEUE)
+
+
+def _submit_blocking(fn, *args, **kwargs) -> asyncio.Future:
+    """Submit a blocking job to the executor, answering 429 when it is saturated."""
+    try:
+        return executor.submit(fn, *args, **kwargs)
+    except ExecutorSaturatedError:
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy processing other documents. Please retry shortly.",
+            headers={"Retry-After": str(EXECUTOR_RETRY_AFTER)}
+        )
 
-@router.post("/analyze")
-async def analyze(pdf_file: UploadFile = File(...)):
-    # Validate input type
-    if not pdf_file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Uploaded file is not a PDF")
 
-    pdf_bytes = await pdf_file.read()
+async def _run_blocking(fn, *args, **kwargs):
+    """Run a blocking job on the executor and await its result."""
+    return await _submit_blocking(fn, *args, **kwargs)
 
-    # Convert PDF → list of PIL images
+
+def _consume_upload(fn, path, *args, **kwargs):
+    """Run fn on a spooled upload on the executor, deleting the file afterwards."""
     try:
-        pages = pdf_bytes_to_images(pdf_bytes)
-    except Exception as e:
-        error_msg = str(e)
-        if "exceeds limit" in error_msg or "decompression bomb" in error_msg:
-            raise HTTPException(
-                status_code=400, 
-                detail="PDF contains very large images. Please try a lower resolution PDF or split it into smaller files."
-            )
-        raise HTTPException(status_code=500, detail=f"PDF parsing error: {error_msg}")
-
-    # Create a unique job directory
-    job_id = uuid.uuid4().hex
-    job_dir = STATIC_DIR / job_id
-    job_dir.mkdir(parents=True, exist_ok=True)
-
-    # Reset statistics for this job
-    inspector.reset_statistics()
-
-    output = {
-        "job_id": job_id,
-        "pages": []
+        return fn(path, *args, **kwargs)
+    finally:
+        remove_upload(path)
+
+
+def _ndjson(event: dict) -> bytes:
+    return dumps(event) + b"\n"
+
+
+def _stream_blocking(fn, *args, **kwargs) -> StreamingResponse:
+    """
+    Run a blocking analysis job and stream its progress events as NDJSON,
+    one JSON object per line: file_started / page / file_completed /
+    file_failed as they happen, then a final "summary" event (job id,
+    statistics, output URLs) or an "error" event. A file that fails after
+    some of its pages were sent is dropped: clients discard its page events
+    on file_failed, and the summary leaves it out (see EventCallback).
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_event(event: dict):
+        # Called on the worker thread
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    # Admission happens before the response starts, so 429 is still possible
+    job = _submit_blocking(fn, *args, on_event=on_event, **kwargs)
+
+    async def body():
+        while True:
+            next_event = asyncio.ensure_future(events.get())
+            await asyncio.wait({next_event, job}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_event.done():
+                next_event.cancel()
+                break
+            yield _ndjson(next_event.result())
+
+        # Events are queued before the job's result is delivered
+        while not events.empty():
+            yield _ndjson(events.get_nowait())
+
+        try:
+            output = job.result()
+        except HTTPException as e:
+            yield _ndjson({"event": "error", "status_code": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            yield _ndjson({"event": "error", "status_code": 500, "detail": str(e)})
+            return
+
+        # Pages were already streamed; the summary carries the rest
+        summary = {key: value for key, value in output.items() if key not in ("pages", "result")}
+        yield _ndjson({"event": "summary", **summary})
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@router.get("/metrics")
+async def metrics():
+    """Scheduler, worker pool and cumulative detection metrics for tuning throughput vs. latency."""
+    return {
+        "executor": executor.get_statistics(),
+        "detections": registry.get_statistics(),
+        "batcher": analysis.batcher.get_statistics(),
+        "cache": analysis.result_cache.get_statistics() if analysis.result_cache is not None else None
     }
 
-    annotated_images = []   # <-- NEW: store annotated page images for PDF export
-
-    # Process each page
-    global_ann_index = 1  # Track annotation number across all pages
-    for idx, page_img in enumerate(pages):
-        detections, annotated_img = inspector.detect_image(page_img)
-        annotated_images.append(annotated_img)
-
-        page_width, page_height = page_img.size
-
-        # Save annotated JPG
-        filename = f"page_{idx + 1}.jpg"
-        filepath = job_dir / filename
-        annotated_img.save(filepath)
-
-        # Format detection structure properly
-        formatted_detections = []
-        for det in detections:
-            formatted_detections.append({
-                "category": det["class"],
-                "confidence": det["confidence"],
-                "bbox": {
-                    "x": det["bbox"][0],
-                    "y": det["bbox"][1],
-                    "width": det["bbox"][2] - det["bbox"][0],
-                    "height": det["bbox"][3] - det["bbox"][1]
-                }
-            })
-
-        output["pages"].append({
-            "page_index": idx + 1,
-            "page_size": {
-                "width": page_width,
-                "height": page_height
-            },
-            "detections": formatted_detections,
-            "annotated_image_url": f"/static/annotated/{job_id}/{filename}"
-        })
-
-    # === NEW: Generate annotated PDF ===
-    annotated_pdf_path = job_dir / "annotated.pdf"
-    images_to_pdf(annotated_images, annotated_pdf_path)
-
-    output["annotated_pdf_url"] = f"/static/annotated/{job_id}/annotated.pdf"
-    
-    # Build parent JSON structure from the already-processed pages (wrapper)
+
+@router.post("/analyze")
+async def analyze(
+    pdf_file: UploadFile = File(...),
+    response_format: ResponseFormat = Query("default", alias="format"),
+    annotations_mode: Optional[AnnotationsMode] = Query(None, alias="annotations")
+):
+    # Validate input type
+    if not pdf_file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Uploaded file is not a PDF")
+
+    pdf_path = await save_upload(pdf_file, suffix=".pdf")
     pdf_name = pdf_file.filename or "document.pdf"
-    parent_json = {pdf_name: {}}
-    
-    global_ann_counter = 1  # Track annotation number across all pages for parent JSON
-    for page in output["pages"]:
-        page_key = f"page_{page['page_index']}"
-        parent_json[pdf_name][page_key] = {
-            "annotations": [],
-            "page_size": page["page_size"]
-        }
-        
-        # Convert detections to annotation format
-        for detection in page["detections"]:
-            ann_key = f"annotation_{global_ann_counter}"
-            global_ann_counter += 1
-            bbox = detection["bbox"]
-            area = bbox["width"] * bbox["height"]
-            
-            annotation_entry = {
-                ann_key: {
-                    "category": detection["category"],
-                    "bbox": bbox,
-                    "area": float(area)
-                }
-            }
-            parent_json[pdf_name][page_key]["annotations"].append(annotation_entry)
-    
-    output["result"] = parent_json
-    
-    # Add statistics from cropper functionality
-    stats = inspector.get_statistics()
-    output["statistics"] = stats
-
-    return JSONResponse(output)
 
+    try:
+        job = _submit_blocking(
+            _consume_upload, analysis.analyze_pdf, pdf_path, pdf_name,
+            response_format=response_format, annotations=annotations_mode or ANNOTATIONS_MODE
+        )
+    except HTTPException:
+        remove_upload(pdf_path)
+        raise
+    return FastJSONResponse(await job)
 
 
 @router.post("/batch-analyze")
-async def batch_analyze(zip_file: UploadFile = File(...)):
+async def batch_analyze(zip_file: UploadFile = File(...), response_format: ResponseFormat = Query("default", alias="format")):
     if not zip_file.filename.lower().endswith(".zip"):
         raise HTTPException(status_code=400, detail="Uploaded file is not a ZIP archive")
 
-    zip_bytes = await zip_file.read()
+    zip_path = await save_upload(zip_file, suffix=".zip")
+    try:
+        job = _submit_blocking(
+            _consume_upload, analysis.batch_analyze_zip, zip_path, zip_file.filename,
+            response_format=response_format
+        )
+    except HTTPException:
+        remove_upload(zip_path)
+        raise
+    return FastJSONResponse(await job)
+
+
+@router.post("/analyze/stream")
+async def analyze_stream(
+    pdf_file: UploadFile = File(...),
+    response_format: ResponseFormat = Query("default", alias="format"),
+    annotations_mode: Optional[AnnotationsMode] = Query(None, alias="annotations")
+):
+    """Like /analyze, but streams one NDJSON event per page as it finishes."""
+    if not pdf_file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Uploaded file is not a PDF")
+
+    pdf_path = await save_upload(pdf_file, suffix=".pdf")
+    pdf_name = pdf_file.filename or "document.pdf"
 
     try:
-        zip_data = zipfile.ZipFile(io.BytesIO(zip_bytes))
-        # Try to decode filenames with UTF-8
-        zip_data.filename = zip_file.filename
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid ZIP file: {e}")
-
-    job_id = uuid.uuid4().hex
-    parent_json = {}
-    files_processed_count = 0
-    
-    # Reset statistics for this batch job
-    inspector.reset_statistics()
-
-    # Get PDF files and decode filenames properly
-    pdf_files = []
-    for name in zip_data.namelist():
-        if name.startswith("__MACOSX") or name.startswith("._"):
-            continue
-        if name.lower().endswith(".pdf"):
-            # Try to decode filename properly
-            try:
-                # Some ZIP tools encode filenames incorrectly, try CP437 first then UTF-8
-                decoded_name = name.encode('cp437').decode('utf-8')
-            except (UnicodeDecodeError, UnicodeEncodeError):
-                decoded_name = name
-            pdf_files.append((name, decoded_name))
-    
-    if not pdf_files:
-        raise HTTPException(status_code=400, detail="ZIP contains no PDF files")
-
-    # Global annotation counter across ALL PDFs in the batch
-    global_ann_index = 1
-
-    for original_name, display_name in pdf_files:
-        try:
-            pdf_bytes = zip_data.read(original_name)
-        except:
-            continue
+        return _stream_blocking(
+            _consume_upload, analysis.analyze_pdf, pdf_path, pdf_name,
+            response_format=response_format, annotations=annotations_mode or ANNOTATIONS_MODE
+        )
+    except HTTPException:
+        remove_upload(pdf_path)
+        raise
+
+
+@router.post("/batch-analyze/stream")
+async def batch_analyze_stream(zip_file: UploadFile = File(...), response_format: ResponseFormat = Query("default", alias="format")):
+    """Like /batch-analyze, but streams one NDJSON event per page as it finishes."""
+    if not zip_file.filename.lower().endswith(".zip"):
+        raise HTTPException(status_code=400, detail="Uploaded file is not a ZIP archive")
 
-        # Convert PDF to images
-        try:
-            pages = pdf_bytes_to_images(pdf_bytes)
-        except Exception as e:
-            error_msg = str(e)
-            if "exceeds limit" in error_msg or "decompression bomb" in error_msg:
-                parent_json[display_name] = {"error": "PDF contains very large images and cannot be processed"}
-            else:
-                parent_json[display_name] = {"error": f"PDF parsing failed: {error_msg}"}
-            continue
-
-        parent_json[display_name] = {}
-        files_processed_count += 1  # Count successfully processed files
-
-        for page_index, page_img in enumerate(pages, start=1):
-            detections, annotated_img = inspector.detect_image(page_img)
-            w, h = page_img.size
-
-            page_key = f"page_{page_index}"
-            parent_json[display_name][page_key] = {
-                "annotations": [],
-                "page_size": { "width": w, "height": h }
-            }
-
-            # Add each detection
-            for det in detections:
-                x1, y1, x2, y2 = det["bbox"]
-                width = x2 - x1
-                height = y2 - y1
-                area = width * height
-
-                ann_key = f"annotation_{global_ann_index}"
-                global_ann_index += 1
-
-                # Build annotation entry
-                annotation_entry = {
-                    ann_key: {
-                        "category": det["class"],
-                        "bbox": {
-                            "x": x1,
-                            "y": y1,
-                            "width": width,
-                            "height": height
-                        },
-                        "area": float(area)
-                    }
-                }
-
-                parent_json[display_name][page_key]["annotations"].append(annotation_entry)
-    
-    # Add statistics from cropper functionality
-    stats = inspector.get_statistics()
-
-    return JSONResponse({
-        "job_id": job_id,
-        "files_processed": files_processed_count,
-        "result": parent_json,
-        "statistics": stats
-    })
+    zip_path = await save_upload(zip_file, suffix=".zip")
+    try:
+        return _stream_blocking(
+            _consume_upload, analysis.batch_analyze_zip, zip_path, zip_file.filename,
+            response_format=response_format
+        )
+    except HTTPException:
+        remove_upload(zip_path)
+        raise
+
+
+def _lazy_job_dir(job_id: str):
+    # Job ids are uuid4 hex; anything else cannot name a job directory
+    if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return analysis.STATIC_DIR / job_id
+
+
+@router.get("/annotated/{job_id}/pages/{page_index}")
+async def annotated_page(job_id: str, page_index: int):
+    """Annotated JPG of a page analyzed with annotations=lazy; drawn on the first request, then cached."""
+    job_dir = _lazy_job_dir(job_id)
+    path = annotations.page_image_path(job_dir, page_index)
+    if not path.exists():
+        if not annotations.has_page(job_dir, page_index):
+            raise HTTPException(status_code=404, detail="Page not found")
+        path = await _run_blocking(
+            annotations.render_page, job_dir, page_index, analysis.annotation_renderer,
+            analysis.raster_pool.max_dimension
+        )
+    return FileResponse(path, media_type="image/jpeg")
+
+
+@router.get("/annotated/{job_id}/pdf")
+async def annotated_pdf(job_id: str):
+    """Annotated PDF of a document analyzed with annotations=lazy; built on the first request, then cached."""
+    job_dir = _lazy_job_dir(job_id)
+    path = annotations.annotated_pdf_path(job_dir)
+    if not path.exists():
+        if not annotations.pdf_ready(job_dir):
+            raise HTTPException(status_code=404, detail="Annotated PDF not available")
+        path = await _run_blocking(
+            annotations.render_pdf, job_dir, analysis.annotation_renderer, analysis.raster_pool.max_dimension,
+            ANNOTATED_PDF_STYLE
+        )
+    return FileResponse(path, media_type="application/pdf")
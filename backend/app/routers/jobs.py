@@ -0,0 +1,67 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from app.routers.analyze import executor
+from app.services.executor import ExecutorSaturatedError
+from app.services.job_store import JobRunner, create_job_store
+from app.utils.uploads import remove_upload, save_upload
+from app.config import (
+    EXECUTOR_RETRY_AFTER,
+    JOBS_STORE,
+    JOBS_SQLITE_PATH,
+    JOBS_UPLOAD_DIR,
+    JOBS_RETENTION_SECONDS,
+    JOBS_MAX_RETAINED,
+    JOBS_PROGRESS_INTERVAL_SECONDS,
+)
+
+router = APIRouter()
+
+# Background jobs: submitted here, processed by the runner, polled via GET /jobs/{job_id}.
+# They run on the same bounded executor as /analyze and /batch-analyze.
+job_store = create_job_store(JOBS_STORE, JOBS_SQLITE_PATH, JOBS_RETENTION_SECONDS, JOBS_MAX_RETAINED)
+job_runner = JobRunner(job_store, executor, JOBS_UPLOAD_DIR, JOBS_PROGRESS_INTERVAL_SECONDS)
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    """Queue a PDF (like /analyze) or a ZIP (like /batch-analyze) and return its job id."""
+    filename = file.filename or ""
+    if filename.lower().endswith(".pdf"):
+        kind = "pdf"
+    elif filename.lower().endswith(".zip"):
+        kind = "zip"
+    else:
+        raise HTTPException(status_code=400, detail="Uploaded file must be a PDF or a ZIP archive")
+
+    upload_path = await save_upload(file, suffix=f".{kind}", directory=job_runner.upload_dir)
+    try:
+        job_id = await run_in_threadpool(job_runner.submit, kind, filename, upload_path)
+    except ExecutorSaturatedError:
+        remove_upload(upload_path)
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy processing other documents. Please retry shortly.",
+            headers={"Retry-After": str(EXECUTOR_RETRY_AFTER)}
+        )
+    except BaseException:
+        remove_upload(upload_path)
+        raise
+
+    return JSONResponse(
+        {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"},
+        status_code=202
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Job status and progress; once completed, "result" holds the same JSON
+    /analyze or /batch-analyze would have returned.
+    """
+    record = await run_in_threadpool(job_runner.store.get, job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return record
@@ -0,0 +1,734 @@
+"""
+Document analysis pipeline shared by the HTTP endpoints and background jobs.
+
+Holds the process-wide inference components (inspector, batcher, raster pool,
+result cache) and the blocking /analyze and /batch-analyze bodies built on
+them. Callers run analyze_pdf / batch_analyze_zip on a worker thread.
+"""
+import uuid
+import zipfile
+import io
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import nullcontext
+from itertools import groupby
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.utils.page_regions import RegionExtractor
+from app.utils.page_triage import PageTriage
+from app.utils.pdf_tools import OversizedPdfError, PdfRenderError, StreamingPdfWriter
+from app.utils.uploads import file_sha256, remove_upload, spool_stream
+from app.services.annotations import (
+    annotated_pdf_url, page_image_url, save_page, save_source, write_vector_pdf
+)
+from app.services.annotation_renderer import AnnotationRenderer
+from app.services.detections import Detections
+from app.services.document_inspector import DocumentInspector
+from app.services.batcher import InferenceBatcher
+from app.services.raster_pool import RasterPool
+from app.services.result_cache import ResultCache, MemoryLRUBackend, DiskBackend
+from app.services.metrics import DetectionStatistics, registry
+from app.config import (
+    MODEL_CONFIGS,
+    INFERENCE_IMGSZ,
+    INFERENCE_CONCURRENT_MODELS,
+    INFERENCE_CROSS_MODEL_IOU,
+    CASCADE_IMGSZ,
+    CASCADE_CONF,
+    QUANT_MAX_MAP50_DROP,
+    QUANT_MAX_RECALL_DROP,
+    PIPELINE_MAX_INFLIGHT_PAGES,
+    BATCHER_MAX_BATCH_SIZE,
+    BATCHER_MAX_WAIT_MS,
+    RASTER_WORKERS,
+    RASTER_CHUNK_PAGES,
+    RASTER_MIN_POOL_PAGES,
+    RASTER_MAX_DIMENSION,
+    RASTER_AT_MODEL_RESOLUTION,
+    TRIAGE_ENABLED,
+    TRIAGE_MAX_TEXT_CHARS,
+    TRIAGE_MAX_INK_COVERAGE,
+    TRIAGE_INK_THRESHOLD,
+    ROI_ENABLED,
+    ROI_IMGSZ,
+    ROI_MAX_REGIONS,
+    ROI_MAX_PAGE_SHARE,
+    CACHE_ENABLED,
+    CACHE_MEMORY_BYTES,
+    CACHE_DISK_DIR,
+    CACHE_DISK_BYTES,
+    ANNOTATIONS_MODE,
+    ANNOTATED_PDF_STYLE,
+    ANNOTATION_JPEG_WORKERS,
+    ANNOTATION_JPEG_QUALITY,
+    ZIP_MAX_MEMBERS,
+    ZIP_MAX_UNCOMPRESSED_BYTES,
+)
+
+# Response formats of analyze_pdf / batch_analyze_zip. "compact" keeps the
+# structure but replaces each page's list of detection/annotation dicts by
+# parallel arrays: "bboxes" ([x, y, width, height] rows), "categories" and
+# "confidences"
+RESPONSE_FORMATS = ("default", "compact")
+
+# Progress hook: called with one event dict at a time, e.g.
+#   {"event": "file_started", "file": name}
+#   {"event": "page", "file": name, "page_index": 1, "page": {...}}
+#   {"event": "file_completed", "file": name, "pages": 3}
+#   {"event": "file_failed", "file": name, "error": "..."}
+# A file ends with either file_completed or file_failed. A PDF can fail after
+# some of its pages were reported: file_failed then supersedes its earlier
+# page events, and the file counts toward neither the result nor the
+# statistics (nor the annotation numbering of later files).
+EventCallback = Callable[[Dict], None]
+
+
+# Load all models once globally with cropper parameters
+# Use CPU by default, but will use CUDA if available
+import torch
+device = "cuda" if torch.cuda.is_available() else "cpu"
+_inspector = None
+
+# Draws and encodes annotated pages for the inspector and the /analyze jobs
+annotation_renderer = AnnotationRenderer(jpeg_workers=ANNOTATION_JPEG_WORKERS, jpeg_quality=ANNOTATION_JPEG_QUALITY)
+
+
+def get_inspector() -> DocumentInspector:
+    """Return the shared inspector, loading the models on first use."""
+    global _inspector
+    if _inspector is None:
+        _inspector = DocumentInspector(
+            MODEL_CONFIGS,
+            device=device,
+            imgsz=INFERENCE_IMGSZ,
+            max_map50_drop=QUANT_MAX_MAP50_DROP,
+            max_recall_drop=QUANT_MAX_RECALL_DROP,
+            concurrent_models=INFERENCE_CONCURRENT_MODELS,
+            cascade_imgsz=CASCADE_IMGSZ,
+            cascade_conf=CASCADE_CONF,
+            cross_model_iou=INFERENCE_CROSS_MODEL_IOU,
+            roi_imgsz=ROI_IMGSZ if ROI_ENABLED else None,
+            renderer=annotation_renderer
+        )
+    return _inspector
+
+
+def _detect_batch(pages):
+    return [detections for detections, _ in get_inspector().detect_images(pages, annotate=False)]
+
+
+# Central scheduler in front of the inspector: pages from concurrent
+# requests share forward passes
+batcher = InferenceBatcher(
+    _detect_batch,
+    max_batch_size=BATCHER_MAX_BATCH_SIZE,
+    max_wait_ms=BATCHER_MAX_WAIT_MS
+)
+
+# PDF pages are rasterized (blank ones triaged, ROI crops cut) on worker processes
+raster_pool = RasterPool(
+    RASTER_WORKERS,
+    chunk_pages=RASTER_CHUNK_PAGES,
+    min_pool_pages=RASTER_MIN_POOL_PAGES,
+    max_dimension=RASTER_MAX_DIMENSION,
+    triage=PageTriage(
+        max_text_chars=TRIAGE_MAX_TEXT_CHARS,
+        max_ink_coverage=TRIAGE_MAX_INK_COVERAGE,
+        ink_threshold=TRIAGE_INK_THRESHOLD
+    ) if TRIAGE_ENABLED else None,
+    regions=RegionExtractor(
+        target_size=ROI_IMGSZ,
+        max_regions=ROI_MAX_REGIONS,
+        max_page_share=ROI_MAX_PAGE_SHARE
+    ) if ROI_ENABLED else None
+)
+
+
+def _render_dimension(full_resolution: bool) -> Optional[int]:
+    """
+    Longest page side to render for a job, or None for the full
+    RASTER_MAX_DIMENSION raster. The models letterbox pages to their imgsz,
+    so more pixels than that only pay off for annotated JPGs (full_resolution)
+    and tiled models, which cut tiles from the full raster.
+    """
+    if full_resolution or not RASTER_AT_MODEL_RESOLUTION:
+        return None
+    if any(config.get("tile_size") for config in MODEL_CONFIGS):
+        return None
+    return max(INFERENCE_IMGSZ, CASCADE_IMGSZ or 0)
+
+
+def _build_result_cache():
+    backends = [MemoryLRUBackend(CACHE_MEMORY_BYTES)]
+    if CACHE_DISK_DIR:
+        backends.append(DiskBackend(CACHE_DISK_DIR, CACHE_DISK_BYTES))
+    return ResultCache(
+        backends,
+        MODEL_CONFIGS,
+        imgsz=INFERENCE_IMGSZ,
+        render_settings={
+            "max_dimension": raster_pool.max_dimension,
+            "render_dimension": _render_dimension(False),
+            # Triaged pages report no detections
+            "triage": list(raster_pool.triage) if raster_pool.triage else None,
+            "roi": list(raster_pool.regions) if raster_pool.regions else None,
+            # The cascade can drop detections, so it is part of the key too
+            "cascade_imgsz": CASCADE_IMGSZ,
+            "cascade_conf": CASCADE_CONF,
+            "cross_model_iou": INFERENCE_CROSS_MODEL_IOU
+        },
+        max_map50_drop=QUANT_MAX_MAP50_DROP,
+        max_recall_drop=QUANT_MAX_RECALL_DROP
+    )
+
+
+# Detections for repeated documents and pages
+result_cache = _build_result_cache() if CACHE_ENABLED else None
+
+STATIC_DIR = Path("static/annotated")
+STATIC_DIR.mkdir(parents=True, exist_ok=True)
+
+
+class _CachedPage(NamedTuple):
+    """Stands in for a page that was not rendered because its results were cached."""
+    size: Tuple[int, int]
+    triage: Optional[str] = None
+
+    @property
+    def output_size(self) -> Tuple[int, int]:
+        return self.size
+
+
+def _iter_detections(items):
+    """
+    Pipeline pages through the result cache and the batcher.
+
+    Takes (key, page_img, detections) triples and yields (key, page_img,
+    Detections) in the same order. Pages arriving with detections=None get
+    none if they were triaged as blank, are otherwise looked up in the page
+    cache and else inferred; known detections
+    (e.g. from the document cache) pass straight through, and so do markers
+    with page_img=None. Detections are yielded (and cached) in the page's
+    output_size coordinates, also for pages rendered below it.
+    At most PIPELINE_MAX_INFLIGHT_PAGES pages are held at once: the next
+    pages are rasterized while earlier ones are in inference, and a page is
+    released as soon as the caller is done with it.
+    """
+    in_flight = deque()
+
+    def finish():
+        key, page_img, page_key, future, inferred = in_flight.popleft()
+        detections = future.result()
+        if inferred and page_img.size != page_img.output_size:
+            # Rendered below the full raster: map the boxes up to it
+            (width, height), (output_width, output_height) = page_img.size, page_img.output_size
+            detections = detections.scale(output_width / width, output_height / height)
+        if page_key is not None:
+            result_cache.set(page_key, detections.to_json())
+        return key, page_img, detections
+
+    for key, page_img, detections in items:
+        page_key = None
+        inferred = False
+        if page_img is None:
+            # Marker (e.g. end of a document): keeps its place in the order,
+            # and counts towards the limit so pages cannot pile up behind
+            # the markers of many short documents
+            future = Future()
+            future.set_result(None)
+        else:
+            source = "cached"
+            if detections is None and page_img.triage is not None:
+                detections = Detections.empty()
+                source = "triaged"
+            if detections is None and result_cache is not None:
+                page_key = result_cache.page_key(page_img.array, page_img.output_size, page_img.regions)
+                detections = result_cache.get(page_key)
+                if detections is not None:
+                    page_key = None   # Hit: nothing to store
+
+            if detections is not None:
+                detections = Detections.coerce(detections)
+                registry.record_page(detections, source=source)
+                future = Future()
+                future.set_result(detections)
+            else:
+                future = batcher.submit([page_img])[0]
+                inferred = True
+
+        in_flight.append((key, page_img, page_key, future, inferred))
+        if len(in_flight) >= PIPELINE_MAX_INFLIGHT_PAGES:
+            yield finish()
+
+    while in_flight:
+        yield finish()
+
+
+def _format_detections(detections: Detections) -> List[Dict]:
+    """/analyze form of one page's detections; the only place they become dicts."""
+    return [
+        {
+            "category": category,
+            "confidence": confidence,
+            "bbox": {"x": x, "y": y, "width": width, "height": height}
+        }
+        for category, confidence, (x, y, width, height) in zip(
+            detections.classes, detections.confidence.tolist(), detections.xywh().tolist()
+        )
+    ]
+
+
+def _format_annotations(detections: Detections, first_index: int) -> List[Dict]:
+    """
+    Parent-JSON form of one page's detections, numbered from first_index:
+    [{"annotation_<n>": {"category", "bbox", "area"}}, ...]
+    """
+    xywh = detections.xywh()
+    areas = (xywh[:, 2] * xywh[:, 3]).tolist()
+    return [
+        {
+            f"annotation_{first_index + offset}": {
+                "category": category,
+                "bbox": {"x": x, "y": y, "width": width, "height": height},
+                "area": area
+            }
+        }
+        for offset, (category, (x, y, width, height), area) in enumerate(
+            zip(detections.classes, xywh.tolist(), areas)
+        )
+    ]
+
+
+def _compact_detections(detections: Detections) -> Dict:
+    """
+    Compact form of one page's detections. The arrays are left as NumPy
+    arrays for the response encoder (see app.utils.serialization), as
+    float64 like the default format's numbers.
+    """
+    return {
+        "bboxes": detections.xywh().astype(np.float64),
+        "categories": detections.classes,
+        "confidences": detections.confidence.astype(np.float64)
+    }
+
+
+def _emit(on_event: Optional[EventCallback], event: Dict):
+    if on_event is not None:
+        on_event(event)
+
+
+def _pdf_render_http_error(e: PdfRenderError) -> HTTPException:
+    error_msg = str(e)
+    if isinstance(e, OversizedPdfError):
+        return HTTPException(
+            status_code=400, 
+            detail="PDF contains very large images. Please try a lower resolution PDF or split it into smaller files."
+        )
+    return HTTPException(status_code=500, detail=f"PDF parsing error: {error_msg}")
+
+
+def analyze_pdf(
+    pdf_source: Union[bytes, str, Path],
+    pdf_name: str,
+    job_id: Optional[str] = None,
+    on_event: Optional[EventCallback] = None,
+    response_format: str = "default",
+    annotations: str = ANNOTATIONS_MODE
+) -> dict:
+    """
+    Blocking body of /analyze: detections, annotated JPGs and annotated PDF
+    for one document.
+    
+    Args:
+        pdf_source: The uploaded PDF, or the path of its spooled copy,
+                    which PyMuPDF then reads pages from as needed
+        pdf_name: File name used as the key in the result JSON
+        job_id: Reuse an already issued job id (background jobs)
+        on_event: Optional progress hook, see EventCallback
+        response_format: "default" or "compact", see RESPONSE_FORMATS
+        annotations: "eager", "lazy" or "none", see app.services.annotations
+    """
+    compact = response_format == "compact"
+    eager = annotations == "eager"
+    # Eager vector PDFs are written from the original once all pages are done
+    vector_pages = [] if eager and ANNOTATED_PDF_STYLE == "vector" else None
+
+    # A cached document only needs its pages rendered for eager annotated
+    # output, and none of them go through the models
+    document_key = None
+    if result_cache is not None:
+        if isinstance(pdf_source, bytes):
+            document_key = result_cache.document_key(pdf_source)
+        else:
+            document_key = result_cache.document_key_for_digest(file_sha256(pdf_source))
+    cached_pages = result_cache.get(document_key) if document_key is not None else None
+    document_pages = []
+
+    # Open the PDF; pages are rendered lazily as the pipeline pulls them
+    if cached_pages is not None and not eager:
+        pages = (
+            _CachedPage((page["page_size"]["width"], page["page_size"]["height"]), page.get("triage"))
+            for page in cached_pages
+        )
+    else:
+        try:
+            # Annotated JPGs are drawn on the page itself
+            pages = raster_pool.iter_pages(pdf_source, _render_dimension(full_resolution=eager))
+        except PdfRenderError as e:
+            raise _pdf_render_http_error(e)
+
+    # Create a unique job directory
+    job_id = job_id or uuid.uuid4().hex
+    job_dir = STATIC_DIR / job_id
+    if annotations != "none":
+        job_dir.mkdir(parents=True, exist_ok=True)
+    if annotations == "lazy":
+        save_source(job_dir, pdf_source)
+
+    # Statistics of this job only; concurrent jobs keep their own
+    statistics = DetectionStatistics()
+    _emit(on_event, {"event": "file_started", "file": pdf_name})
+
+    def page_items():
+        for page_index, page_img in enumerate(pages, start=1):
+            detections = cached_pages[page_index - 1]["detections"] if cached_pages else None
+            yield page_index, page_img, detections
+
+    output = {
+        "job_id": job_id,
+        "pages": []
+    }
+
+    # Parent JSON structure (wrapper), filled in as pages finish; annotations
+    # are numbered across all pages
+    parent_pages = {}
+    global_ann_counter = 1
+
+    # render → infer → annotate → write out → release, one page at a time;
+    # JPGs are encoded in the background and written out (and a raster
+    # annotated PDF appended to) in page order as soon as they are ready.
+    # An eager page's event is only sent once its JPG is on disk.
+    annotated_pdf_path = job_dir / "annotated.pdf"
+    raster_pdf = eager and vector_pages is None
+    pending_jpegs = deque()
+    write_lock = threading.Lock()
+
+    def write_jpegs(_=None):
+        # On the job thread and as encodes finish; a failed encode stays at
+        # the head for wait_jpegs to raise
+        with write_lock:
+            while pending_jpegs and pending_jpegs[0][1].done() and pending_jpegs[0][1].exception() is None:
+                page_index, future, width, height, event = pending_jpegs.popleft()
+                jpeg_bytes = future.result()
+                (job_dir / f"page_{page_index}.jpg").write_bytes(jpeg_bytes)
+                if raster_pdf:
+                    pdf_writer.add_jpeg(jpeg_bytes, width, height)
+                _emit(on_event, event)
+
+    def wait_jpegs(keep: int):
+        # Bounds the annotated pages held in memory
+        while True:
+            with write_lock:
+                if len(pending_jpegs) <= keep:
+                    return
+                head = pending_jpegs[0][1]
+            head.result()
+            write_jpegs()
+
+    try:
+        with StreamingPdfWriter(annotated_pdf_path) if raster_pdf else nullcontext() as pdf_writer:
+            for page_index, page_img, detections in _iter_detections(page_items()):
+                statistics.add(detections, triaged=page_img.triage is not None)
+
+                page_width, page_height = page_img.output_size
+                page_size = {
+                    "width": page_width,
+                    "height": page_height
+                }
+                document_pages.append({
+                    "page_size": page_size,
+                    "detections": detections.to_json(),
+                    "triage": page_img.triage
+                })
+
+                if eager:
+                    # Draw now, encode in the background
+                    jpeg = annotation_renderer.submit_jpeg(annotation_renderer.draw(page_img, detections))
+                    if not raster_pdf:
+                        vector_pages.append((page_size, detections))
+                elif annotations == "lazy":
+                    # Drawn when GET /annotated/... first asks for it
+                    save_page(job_dir, page_index, page_size, detections)
+
+                image_url = page_image_url(job_id, page_index, annotations)
+                if compact:
+                    columns = _compact_detections(detections)
+                    output["pages"].append({
+                        "page_index": page_index,
+                        "page_size": page_size,
+                        **columns,
+                        "annotated_image_url": image_url
+                    })
+                    parent_pages[f"page_{page_index}"] = {**columns, "page_size": page_size}
+                else:
+                    output["pages"].append({
+                        "page_index": page_index,
+                        "page_size": page_size,
+                        "detections": _format_detections(detections),
+                        "annotated_image_url": image_url
+                    })
+                    parent_pages[f"page_{page_index}"] = {
+                        "annotations": _format_annotations(detections, global_ann_counter),
+                        "page_size": page_size
+                    }
+                global_ann_counter += len(detections)
+
+                event = {
+                    "event": "page",
+                    "file": pdf_name,
+                    "page_index": page_index,
+                    "page": output["pages"][-1]
+                }
+                if eager:
+                    with write_lock:
+                        pending_jpegs.append((page_index, jpeg, page_width, page_height, event))
+                    jpeg.add_done_callback(write_jpegs)
+                    wait_jpegs(keep=ANNOTATION_JPEG_WORKERS)
+                else:
+                    _emit(on_event, event)
+            wait_jpegs(keep=0)
+    except PdfRenderError as e:
+        with write_lock:
+            pending_jpegs.clear()
+        shutil.rmtree(job_dir, ignore_errors=True)
+        _emit(on_event, {"event": "file_failed", "file": pdf_name, "error": str(e)})
+        raise _pdf_render_http_error(e)
+
+    if vector_pages is not None:
+        write_vector_pdf(pdf_source, vector_pages, annotated_pdf_path)
+
+    _emit(on_event, {"event": "file_completed", "file": pdf_name, "pages": len(output["pages"])})
+
+    if document_key is not None and cached_pages is None:
+        result_cache.set(document_key, document_pages)
+
+    output["annotated_pdf_url"] = annotated_pdf_url(job_id, annotations)
+    
+    output["result"] = {pdf_name: parent_pages}
+    
+    # Add statistics from cropper functionality
+    output["statistics"] = statistics.to_dict()
+
+    return output
+
+
+def batch_analyze_zip(
+    zip_source: Union[bytes, str, Path],
+    zip_name: str,
+    job_id: Optional[str] = None,
+    on_event: Optional[EventCallback] = None,
+    response_format: str = "default"
+) -> dict:
+    """
+    Blocking body of /batch-analyze: detections for every PDF in a ZIP.
+    
+    The archive is read from disk when given as a path. Its PDFs are
+    extracted one at a time into temp files as the raster pool asks for
+    them, so memory does not grow with the archive, and at most a window's
+    worth of them is on disk at once.
+    
+    Args:
+        zip_source: The uploaded archive, or the path of its spooled copy
+        zip_name: Archive file name
+        job_id: Reuse an already issued job id (background jobs)
+        on_event: Optional progress hook, see EventCallback
+        response_format: "default" or "compact", see RESPONSE_FORMATS
+    """
+    try:
+        zip_data = zipfile.ZipFile(io.BytesIO(zip_source) if isinstance(zip_source, bytes) else zip_source)
+        # Try to decode filenames with UTF-8
+        zip_data.filename = zip_name
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ZIP file: {e}")
+
+    with zip_data:
+        return _batch_analyze_members(zip_data, job_id, on_event, response_format)
+
+
+def _batch_analyze_members(
+    zip_data: zipfile.ZipFile,
+    job_id: Optional[str],
+    on_event: Optional[EventCallback],
+    response_format: str
+) -> dict:
+    compact = response_format == "compact"
+    job_id = job_id or uuid.uuid4().hex
+    parent_json = {}
+    files_processed_count = 0
+    
+    # Statistics of this batch job only; concurrent jobs keep their own
+    statistics = DetectionStatistics()
+
+    # Get PDF files and decode filenames properly
+    pdf_files = []
+    for name in zip_data.namelist():
+        if name.startswith("__MACOSX") or name.startswith("._"):
+            continue
+        if name.lower().endswith(".pdf"):
+            # Try to decode filename properly
+            try:
+                # Some ZIP tools encode filenames incorrectly, try CP437 first then UTF-8
+                decoded_name = name.encode('cp437').decode('utf-8')
+            except (UnicodeDecodeError, UnicodeEncodeError):
+                decoded_name = name
+            pdf_files.append((name, decoded_name))
+    
+    if not pdf_files:
+        raise HTTPException(status_code=400, detail="ZIP contains no PDF files")
+
+    # Sizes come from the central directory; extraction never yields more
+    # than a member's declared size (a mismatch fails its CRC check)
+    member_count = sum(1 for info in zip_data.infolist() if not info.is_dir())
+    if member_count > ZIP_MAX_MEMBERS:
+        raise HTTPException(
+            status_code=413, detail=f"ZIP contains {member_count} files; at most {ZIP_MAX_MEMBERS} are accepted"
+        )
+    uncompressed = sum(zip_data.getinfo(name).file_size for name, _ in pdf_files)
+    if uncompressed > ZIP_MAX_UNCOMPRESSED_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"PDFs in the ZIP total {uncompressed} bytes uncompressed; "
+                   f"at most {ZIP_MAX_UNCOMPRESSED_BYTES} are accepted"
+        )
+
+    # Global annotation counter across ALL PDFs in the batch. A file's
+    # numbers and statistics only count once it completes: a PDF failing
+    # mid-document leaves no trace, as when PDFs were rendered up front.
+    global_ann_index = 1
+    file_annotations = {}   # display_name -> annotations numbered so far
+    file_statistics = {}    # display_name -> DetectionStatistics so far
+    failed_files = set()
+
+    # Per-document results of this run, stored in the document cache at the end
+    document_keys = {}
+    document_pages = {}
+
+    def iter_zip_documents():
+        # Pulled one document at a time; uncached PDFs are handed to the
+        # raster pool as files, which it deletes once they are rendered
+        for original_name, display_name in pdf_files:
+            try:
+                with zip_data.open(original_name) as member:
+                    pdf_path, digest = spool_stream(member, suffix=".pdf")
+            except Exception:
+                continue
+
+            cached_pages = None
+            if result_cache is not None:
+                document_keys[display_name] = result_cache.document_key_for_digest(digest)
+                cached_pages = result_cache.get(document_keys[display_name])
+            if cached_pages is not None:
+                remove_upload(pdf_path)
+            yield display_name, pdf_path, cached_pages
+
+    def iter_zip_pages():
+        # Runs of uncached PDFs render in parallel on the raster pool; their
+        # pages arrive in order and share batches in the pipeline. Cached
+        # PDFs are neither rendered nor inferred.
+        for is_cached, documents in groupby(iter_zip_documents(), key=lambda doc: doc[2] is not None):
+            if is_cached:
+                for display_name, _, cached_pages in documents:
+                    parent_json[display_name] = {}
+                    _emit(on_event, {"event": "file_started", "file": display_name})
+                    document_keys.pop(display_name, None)
+                    for page_index, cached_page in enumerate(cached_pages, start=1):
+                        size = cached_page["page_size"]
+                        page_stub = _CachedPage((size["width"], size["height"]), cached_page.get("triage"))
+                        yield (display_name, page_index), page_stub, cached_page["detections"]
+                    yield (display_name, None), None, None
+                continue
+
+            documents = ((display_name, pdf_path) for display_name, pdf_path, _ in documents)
+            for display_name, page_index, page_img in raster_pool.iter_documents(documents, _render_dimension(False)):
+                if isinstance(page_img, PdfRenderError):
+                    error_msg = str(page_img)
+                    if isinstance(page_img, OversizedPdfError):
+                        parent_json[display_name] = {"error": "PDF contains very large images and cannot be processed"}
+                    else:
+                        parent_json[display_name] = {"error": f"PDF parsing failed: {error_msg}"}
+                    failed_files.add(display_name)
+                    _emit(on_event, {"event": "file_failed", "file": display_name, "error": parent_json[display_name]["error"]})
+                    continue
+
+                if display_name not in parent_json:
+                    parent_json[display_name] = {}
+                    document_pages[display_name] = []
+                    _emit(on_event, {"event": "file_started", "file": display_name})
+
+                # page_img is None marks the end of the document
+                yield (display_name, page_index), page_img, None
+
+    for (display_name, page_index), page_img, detections in _iter_detections(iter_zip_pages()):
+        # Pages rendered before a later page of the same PDF failed
+        if display_name in failed_files:
+            continue
+
+        if page_img is None:
+            files_processed_count += 1  # Count successfully processed files
+            global_ann_index += file_annotations.pop(display_name, 0)
+            statistics.merge(file_statistics.pop(display_name, DetectionStatistics()))
+            _emit(on_event, {
+                "event": "file_completed",
+                "file": display_name,
+                "pages": len(parent_json[display_name])
+            })
+            continue
+
+        file_statistics.setdefault(display_name, DetectionStatistics()).add(
+            detections, triaged=page_img.triage is not None
+        )
+        first_index = global_ann_index + file_annotations.get(display_name, 0)
+        w, h = page_img.output_size
+        if display_name in document_pages:
+            document_pages[display_name].append({
+                "page_size": {"width": w, "height": h},
+                "detections": detections.to_json(),
+                "triage": page_img.triage
+            })
+
+        page_key = f"page_{page_index}"
+        if compact:
+            parent_json[display_name][page_key] = {
+                **_compact_detections(detections),
+                "page_size": { "width": w, "height": h }
+            }
+        else:
+            parent_json[display_name][page_key] = {
+                "annotations": _format_annotations(detections, first_index),
+                "page_size": { "width": w, "height": h }
+            }
+        file_annotations[display_name] = file_annotations.get(display_name, 0) + len(detections)
+
+        _emit(on_event, {
+            "event": "page",
+            "file": display_name,
+            "page_index": page_index,
+            "page": {page_key: parent_json[display_name][page_key]}
+        })
+    
+    for display_name, pages in document_pages.items():
+        if display_name not in failed_files and display_name in document_keys:
+            result_cache.set(document_keys[display_name], pages)
+
+    return {
+        "job_id": job_id,
+        "files_processed": files_processed_count,
+        "result": parent_json,
+        "statistics": statistics.to_dict()
+    }
@@ -0,0 +1,192 @@
+"""
+Drawing detections onto page rasters and encoding the annotated JPGs.
+
+AnnotationRenderer replaces the per-page PIL drawing in DocumentInspector,
+which looked up a TrueType font (two failed lookups on most Linux hosts)
+and built its colour table again for every page. Here the font is
+resolved once and each size is loaded once. Boxes and label backgrounds
+are written straight into a copy of the page's NumPy buffer, and label
+text is a cached glyph mask blended in. JPEG encoding runs on a small
+thread pool (Pillow releases the GIL while encoding), so the pipeline can
+draw the next page while the previous one is being encoded.
+
+Label size and line width follow the page resolution: 32 px text and 5 px
+lines on a page whose longest side is REFERENCE_DIMENSION, proportionally
+smaller or larger otherwise.
+
+Drawing is timed as the "annotate" stage and encoding as "jpeg_encode"
+(see GET /metrics).
+"""
+import io
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from app.services.annotations import CLASS_COLORS, DEFAULT_COLOR
+from app.services.detections import Detections
+from app.services.metrics import registry
+from app.utils.pdf_tools import RenderedPage
+
+Page = Union[RenderedPage, Image.Image, np.ndarray]
+
+# Tried in order; the first one that loads is used for every label
+FONT_CANDIDATES = ("arial.ttf", "Arial Bold.ttf", "DejaVuSans-Bold.ttf")
+
+REFERENCE_DIMENSION = 2048
+LABEL_FONT_SIZE = 32   # px at REFERENCE_DIMENSION
+LINE_WIDTH = 5         # px at REFERENCE_DIMENSION
+MIN_LABEL_FONT_SIZE = 10
+LABEL_PADDING = 0.15   # Of the font size, around the label text
+
+
+def _as_array(page: Page) -> np.ndarray:
+    if isinstance(page, RenderedPage):
+        return page.array
+    if isinstance(page, np.ndarray):
+        return page
+    return np.asarray(page.convert("RGB"))
+
+
+def _paste(buffer: np.ndarray, x: int, y: int, block: np.ndarray, alpha: Optional[np.ndarray] = None):
+    """Write block (h x w x 3) into buffer at (x, y), clipped to the buffer; alpha in 0..1 blends."""
+    height, width = buffer.shape[:2]
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + block.shape[1], width), min(y + block.shape[0], height)
+    if x1 >= x2 or y1 >= y2:
+        return
+    block = block[y1 - y:y2 - y, x1 - x:x2 - x]
+    if alpha is None:
+        buffer[y1:y2, x1:x2] = block
+        return
+    alpha = alpha[y1 - y:y2 - y, x1 - x:x2 - x, None]
+    region = buffer[y1:y2, x1:x2]
+    region[:] = (region * (1.0 - alpha) + block * alpha).astype(np.uint8)
+
+
+class AnnotationRenderer:
+    def __init__(
+        self,
+        jpeg_workers: int = 2,
+        jpeg_quality: int = 75,
+        font_candidates: Sequence[str] = FONT_CANDIDATES
+    ):
+        """
+        Args:
+            jpeg_workers: Threads encoding JPGs; 0 encodes in the caller
+            jpeg_quality: Pillow JPEG quality (75 is Pillow's default)
+            font_candidates: Font files or names tried in order, once
+        """
+        self.jpeg_quality = jpeg_quality
+        self._font_candidates = tuple(font_candidates)
+        self._font_path = None          # Resolved on first use; "" = Pillow's default font
+        self._fonts = {}                # size -> font
+        self._labels = {}               # (label, size) -> (alpha mask, width, height)
+        self._lock = threading.Lock()
+        self._jpeg_pool = (
+            ThreadPoolExecutor(max_workers=jpeg_workers, thread_name_prefix="jpeg-encode")
+            if jpeg_workers > 0 else None
+        )
+
+    def font(self, size: int) -> ImageFont.ImageFont:
+        """Label font at this pixel size, loaded once."""
+        with self._lock:
+            font = self._fonts.get(size)
+            if font is not None:
+                return font
+
+            if self._font_path is None:
+                self._font_path = ""
+                for candidate in self._font_candidates:
+                    try:
+                        ImageFont.truetype(candidate, size)
+                    except OSError:
+                        continue
+                    self._font_path = candidate
+                    break
+            if self._font_path:
+                font = ImageFont.truetype(self._font_path, size)
+            else:
+                font = ImageFont.load_default(size)
+            self._fonts[size] = font
+            return font
+
+    @staticmethod
+    def style(width: int, height: int) -> Tuple[int, int]:
+        """(label font size, box line width) in pixels for a page of this size."""
+        scale = max(width, height) / REFERENCE_DIMENSION
+        return max(MIN_LABEL_FONT_SIZE, round(LABEL_FONT_SIZE * scale)), max(1, round(LINE_WIDTH * scale))
+
+    def _label(self, text: str, size: int) -> Tuple[np.ndarray, int, int]:
+        """Alpha mask (0..1) of the label text, plus the padded label width and height."""
+        key = (text, size)
+        label = self._labels.get(key)
+        if label is None:
+            font = self.font(size)
+            left, top, right, bottom = font.getbbox(text)
+            padding = max(1, round(size * LABEL_PADDING))
+            mask = Image.new("L", (right - left + 2 * padding, bottom - top + 2 * padding))
+            ImageDraw.Draw(mask).text((padding - left, padding - top), text, fill=255, font=font)
+            alpha = np.asarray(mask, dtype=np.float32) / 255.0
+            label = self._labels[key] = (alpha, alpha.shape[1], alpha.shape[0])
+        return label
+
+    def draw(self, page: Page, detections: Detections) -> np.ndarray:
+        """Copy of the page (HxWx3 uint8) with boxes and "class NN%" labels drawn on it."""
+        started = time.perf_counter()
+        buffer = np.array(_as_array(page), dtype=np.uint8, copy=True)
+        height, width = buffer.shape[:2]
+        font_size, line = self.style(width, height)
+        white = np.full((1, 1, 3), 255, dtype=np.uint8)
+
+        boxes = np.rint(detections.xyxy).astype(np.int64).tolist()
+        for class_name, confidence, (x1, y1, x2, y2) in zip(
+            detections.classes, detections.confidence.tolist(), boxes
+        ):
+            color = np.array(CLASS_COLORS.get(class_name, DEFAULT_COLOR), dtype=np.uint8)
+            x1, x2 = sorted((min(max(x1, 0), width - 1), min(max(x2, 0), width - 1)))
+            y1, y2 = sorted((min(max(y1, 0), height - 1), min(max(y2, 0), height - 1)))
+
+            # Frame, drawn inwards from the box edges like PIL's outline
+            buffer[y1:min(y1 + line, y2 + 1), x1:x2 + 1] = color
+            buffer[max(y2 - line + 1, y1):y2 + 1, x1:x2 + 1] = color
+            buffer[y1:y2 + 1, x1:min(x1 + line, x2 + 1)] = color
+            buffer[y1:y2 + 1, max(x2 - line + 1, x1):x2 + 1] = color
+
+            # Label on a filled background above the box, inside it at the top edge
+            alpha, label_width, label_height = self._label(f"{class_name} {confidence:.0%}", font_size)
+            top = y1 - label_height if y1 >= label_height else y1
+            _paste(buffer, x1, top, np.broadcast_to(color, (label_height, label_width, 3)))
+            _paste(buffer, x1, top, np.broadcast_to(white, (label_height, label_width, 3)), alpha)
+
+        registry.record_timing("annotate", time.perf_counter() - started)
+        return buffer
+
+    def draw_batch(self, pages: Sequence[Page], detections: Sequence[Detections]) -> List[np.ndarray]:
+        return [self.draw(page, page_detections) for page, page_detections in zip(pages, detections)]
+
+    def encode_jpeg(self, array: np.ndarray) -> bytes:
+        started = time.perf_counter()
+        buffer = io.BytesIO()
+        Image.fromarray(array).save(buffer, format="JPEG", quality=self.jpeg_quality)
+        registry.record_timing("jpeg_encode", time.perf_counter() - started)
+        return buffer.getvalue()
+
+    def submit_jpeg(self, array: np.ndarray) -> Future:
+        """Encode on the JPEG pool; a Future of the JPEG bytes."""
+        if self._jpeg_pool is None:
+            future = Future()
+            future.set_result(self.encode_jpeg(array))
+            return future
+        return self._jpeg_pool.submit(self.encode_jpeg, array)
+
+    def render_jpeg(self, page: Page, detections: Detections) -> bytes:
+        """Annotated JPG of one page, drawn and encoded in the caller."""
+        return self.encode_jpeg(self.draw(page, detections))
+
+    def shutdown(self):
+        if self._jpeg_pool is not None:
+            self._jpeg_pool.shutdown(wait=True)
@@ -0,0 +1,242 @@
+"""
+Annotated output of /analyze jobs: one JPG per page and an annotated PDF.
+
+How it is produced is chosen per request:
+    "eager"  drawn, JPEG-encoded and assembled into the PDF while the job
+             runs (served from /static/annotated/<job_id>/)
+    "lazy"   the job only stores the source PDF and each page's detections
+             in its directory; a page's JPG, or the PDF, is drawn the first
+             time GET /annotated/<job_id>/... asks for it and served from
+             disk afterwards
+    "none"   nothing is written; the URLs in the response are null
+
+Lazy pages are re-rendered from the source PDF at the same max_dimension the
+job used, so the stored detections line up with the raster.
+
+The annotated PDF comes in two styles. "vector" (write_vector_pdf) is the
+original document with every detection's box and label drawn over it, so
+it keeps the text layer and is about the size of the upload. "raster" is
+an image-only PDF of the annotated page JPGs.
+"""
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+import fitz
+import numpy as np
+
+from app.services.detections import Detections
+from app.utils.pdf_tools import StreamingPdfWriter, render_page_range
+
+if TYPE_CHECKING:
+    from app.services.annotation_renderer import AnnotationRenderer
+
+ANNOTATION_MODES = ("eager", "lazy", "none")
+PDF_STYLES = ("vector", "raster")
+
+# Box and label colours per class (RGB)
+CLASS_COLORS = {
+    "qr_code": (0, 0, 255),      # Blue
+    "signature": (255, 0, 0),     # Red
+    "stamp": (0, 255, 0),         # Green
+}
+DEFAULT_COLOR = (255, 165, 0)  # Orange for unknown classes
+
+# Vector labels, in PDF points
+LABEL_FONT_SIZE = 8
+BOX_BORDER_WIDTH = 1.5
+
+SOURCE_PDF = "source.pdf"
+
+
+def page_image_url(job_id: str, page_index: int, mode: str) -> Optional[str]:
+    if mode == "eager":
+        return f"/static/annotated/{job_id}/page_{page_index}.jpg"
+    if mode == "lazy":
+        return f"/annotated/{job_id}/pages/{page_index}"
+    return None
+
+
+def annotated_pdf_url(job_id: str, mode: str) -> Optional[str]:
+    if mode == "eager":
+        return f"/static/annotated/{job_id}/annotated.pdf"
+    if mode == "lazy":
+        return f"/annotated/{job_id}/pdf"
+    return None
+
+
+def _detections_path(job_dir: Path, page_index: int) -> Path:
+    return job_dir / f"page_{page_index}.detections.json"
+
+
+def page_image_path(job_dir: Path, page_index: int) -> Path:
+    return job_dir / f"page_{page_index}.jpg"
+
+
+def annotated_pdf_path(job_dir: Path) -> Path:
+    return job_dir / "annotated.pdf"
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write via a temporary file, so concurrent readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def save_source(job_dir: Path, source: Union[bytes, str, Path]):
+    """Keep the uploaded PDF (bytes, or a file that is copied) of a lazy job for rendering its pages later."""
+    if isinstance(source, bytes):
+        _write_atomic(job_dir / SOURCE_PDF, source)
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=job_dir, prefix=f".{SOURCE_PDF}.")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, job_dir / SOURCE_PDF)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def save_page(job_dir: Path, page_index: int, page_size: Dict, detections: Detections):
+    """Store one finished page of a lazy job; from now on it can be rendered."""
+    record = {"page_size": page_size, "detections": detections.to_json()}
+    _write_atomic(_detections_path(job_dir, page_index), json.dumps(record).encode())
+
+
+def has_page(job_dir: Path, page_index: int) -> bool:
+    return (job_dir / SOURCE_PDF).exists() and _detections_path(job_dir, page_index).exists()
+
+
+def render_page(job_dir: Path, page_index: int, renderer: "AnnotationRenderer", max_dimension: int) -> Path:
+    """
+    Annotated JPG of one page of a lazy job, drawn on first use.
+
+    Args:
+        job_dir: The job's directory
+        page_index: 1-based page number
+        renderer: Draws and encodes the page (analysis.annotation_renderer)
+        max_dimension: Raster size the job was analyzed at
+
+    Returns:
+        Path of the cached JPG.
+    """
+    target = page_image_path(job_dir, page_index)
+    if target.exists():
+        return target
+
+    record = json.loads(_detections_path(job_dir, page_index).read_text())
+    (page,) = render_page_range(str(job_dir / SOURCE_PDF), page_index - 1, page_index, max_dimension)
+    _write_atomic(target, renderer.render_jpeg(page, Detections.coerce(record["detections"])))
+    return target
+
+
+def pdf_ready(job_dir: Path) -> bool:
+    """Whether every page of a lazy job is stored, so its PDF can be built."""
+    source = job_dir / SOURCE_PDF
+    if not source.exists():
+        return False
+    with fitz.open(source) as doc:
+        page_count = doc.page_count
+    return all(_detections_path(job_dir, index).exists() for index in range(1, page_count + 1))
+
+
+def render_pdf(job_dir: Path, renderer: "AnnotationRenderer", max_dimension: int, style: str = "vector") -> Path:
+    """
+    Annotated PDF of a lazy job, built on first use: the source PDF with
+    vector annotations, or ("raster") the (lazily rendered) page JPGs.
+    """
+    target = annotated_pdf_path(job_dir)
+    if target.exists():
+        return target
+
+    source = job_dir / SOURCE_PDF
+    with fitz.open(source) as doc:
+        page_count = doc.page_count
+
+    fd, tmp_path = tempfile.mkstemp(dir=job_dir, prefix=".annotated.pdf.")
+    os.close(fd)
+    try:
+        records = [
+            json.loads(_detections_path(job_dir, page_index).read_text())
+            for page_index in range(1, page_count + 1)
+        ]
+        if style == "vector":
+            write_vector_pdf(
+                source, [(r["page_size"], Detections.coerce(r["detections"])) for r in records], tmp_path
+            )
+        else:
+            with StreamingPdfWriter(tmp_path) as pdf_writer:
+                for page_index, record in enumerate(records, start=1):
+                    jpeg_bytes = render_page(job_dir, page_index, renderer, max_dimension).read_bytes()
+                    pdf_writer.add_jpeg(jpeg_bytes, record["page_size"]["width"], record["page_size"]["height"])
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return target
+
+
+def write_vector_pdf(
+    source: Union[bytes, str, Path],
+    pages: List[Tuple[Dict, Detections]],
+    output_path: Union[str, Path]
+):
+    """
+    Annotated copy of the original PDF: boxes and labels are drawn as vector
+    graphics over the original pages instead of re-rasterizing them.
+
+    They go into the page content rather than into annotation objects:
+    PyMuPDF's Annot.update() costs milliseconds per annotation, which made
+    this slower than the raster PDF.
+
+    Args:
+        source: The analyzed PDF, as bytes or a path
+        pages: (page_size, detections) per page, in raster pixels of a
+               rendering of width page_size["width"]
+        output_path: Where to write the annotated PDF
+    """
+    doc = fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source)
+    with doc:
+        for page, (page_size, detections) in zip(doc, pages):
+            if not len(detections):
+                continue
+            # Raster pixels → points of the page as displayed; drawing
+            # happens in unrotated page space
+            scale = page.rect.width / page_size["width"]
+            derotate = page.derotation_matrix
+            boxes = (detections.xyxy.astype(np.float64) * scale).tolist()
+
+            shape = page.new_shape()
+            for class_name, confidence, (x1, y1, x2, y2) in zip(
+                detections.classes, detections.confidence.tolist(), boxes
+            ):
+                color = tuple(c / 255 for c in CLASS_COLORS.get(class_name, DEFAULT_COLOR))
+                label = f"{class_name} {confidence:.0%}"
+
+                shape.draw_rect(fitz.Rect(x1, y1, x2, y2) * derotate)
+                shape.finish(color=color, width=BOX_BORDER_WIDTH)
+
+                # Label above the box, or inside it at the top of the page
+                width = fitz.get_text_length(label, fontname="helv", fontsize=LABEL_FONT_SIZE) + 4
+                height = LABEL_FONT_SIZE * 1.5
+                top = y1 - height if y1 >= height else y1
+                label_rect = fitz.Rect(x1, top, x1 + width, top + height) * derotate
+                shape.draw_rect(label_rect)
+                shape.finish(color=None, fill=color)
+                shape.insert_textbox(
+                    label_rect, label,
+                    fontname="helv", fontsize=LABEL_FONT_SIZE, color=(1, 1, 1),
+                    align=fitz.TEXT_ALIGN_CENTER, rotate=page.rotation
+                )
+            shape.commit()
+        doc.save(str(output_path), deflate=True)
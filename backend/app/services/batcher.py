@@ -0,0 +1,161 @@
+"""
+Request-coalescing inference scheduler.
+
+Pages submitted by concurrent /analyze and /batch-analyze jobs go into one
+queue. A dispatcher thread gathers them into batches of up to max_batch_size
+pages, waiting at most max_wait_ms for a batch to fill, runs the batch
+through the models and hands each page's detections back to its caller's
+future.
+
+Pages are whatever the detect function accepts; in the app that is
+DocumentInspector.detect_images, so RenderedPage objects, HxWx3 uint8 arrays
+or PIL images.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+from PIL import Image
+
+from app.services.detections import Detections
+from app.utils.pdf_tools import RenderedPage
+
+Page = Union[RenderedPage, Image.Image, np.ndarray]
+
+
+class _PendingPage:
+    __slots__ = ("page", "future", "enqueued_at")
+
+    def __init__(self, page: Page):
+        self.page = page
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class InferenceBatcher:
+    def __init__(
+        self,
+        detect_fn: Callable[[List[Page]], List[Detections]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        window: int = 1000
+    ):
+        """
+        Args:
+            detect_fn: Runs the models on a list of pages and returns their
+                       Detections, one per page and in the same order
+            max_batch_size: Upper bound on pages per dispatched batch
+            max_wait_ms: How long the first page of a batch may wait for
+                         others to join before the batch is dispatched anyway
+            window: Number of recent batches/pages kept for the wait and fill
+                    metrics
+        """
+        self.detect_fn = detect_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._pages = 0
+        self._recent_fill = deque(maxlen=window)
+        self._recent_wait_ms = deque(maxlen=window)
+
+    def submit(self, pages: List[Page]) -> List[Future]:
+        """Queue pages for inference; each future resolves to that page's detections."""
+        self._ensure_started()
+        pending = [_PendingPage(page) for page in pages]
+        for item in pending:
+            self._queue.put(item)
+        return [item.future for item in pending]
+
+    def infer(self, pages: List[Page]) -> List[Detections]:
+        """Blocking helper: submit pages and wait for all of their detections."""
+        return [future.result() for future in self.submit(pages)]
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="inference-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0].enqueued_at + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        # Past the deadline: take whatever is already queued
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[_PendingPage]):
+        dispatched_at = time.monotonic()
+        with self._stats_lock:
+            self._batches += 1
+            self._pages += len(batch)
+            self._recent_fill.append(len(batch) / self.max_batch_size)
+            self._recent_wait_ms.extend(
+                (dispatched_at - item.enqueued_at) * 1000.0 for item in batch
+            )
+
+        try:
+            results = list(self.detect_fn([item.page for item in batch]))
+            if len(results) != len(batch):
+                # zip() would leave the unmatched callers waiting forever
+                raise RuntimeError(f"detect_fn returned {len(results)} results for {len(batch)} pages")
+        except Exception as e:
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        for item, detections in zip(batch, results):
+            item.future.set_result(detections)
+
+    def get_statistics(self) -> Dict:
+        """Queue depth, batch fill ratio and queue wait times (recent window)."""
+        with self._stats_lock:
+            fill = list(self._recent_fill)
+            waits = sorted(self._recent_wait_ms)
+            batches = self._batches
+            pages = self._pages
+
+        def percentile(q: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(int(q * len(waits)), len(waits) - 1)]
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches_dispatched": batches,
+            "pages_dispatched": pages,
+            "avg_batch_size": pages / batches if batches else 0.0,
+            "avg_fill_ratio": sum(fill) / len(fill) if fill else 0.0,
+            "wait_ms": {
+                "avg": sum(waits) / len(waits) if waits else 0.0,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": waits[-1] if waits else 0.0
+            }
+        }
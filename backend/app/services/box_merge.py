@@ -0,0 +1,104 @@
+"""
+Merging overlapping detections of the same class.
+
+Used to combine a page's full-page detections with those of its tiles:
+overlapping tiles see the same object twice, and an object cut by a tile
+edge comes back as a fragment of the full box. Overlap is therefore
+measured as intersection over the smaller box ("ios") by default, which
+also catches such fragments; "iou" is the usual intersection over union.
+The inspector also uses it, with "iou", to drop boxes that several models
+report for the same object.
+
+All pairwise overlaps of one class are computed at once with numpy; only
+the greedy pass over the score-sorted boxes is a Python loop.
+"""
+from typing import List
+
+import numpy as np
+
+from app.services.detections import Detections
+
+MERGE_METHODS = ("nms", "wbf")
+
+
+def pairwise_overlap(boxes: np.ndarray, metric: str = "ios") -> np.ndarray:
+    """NxN overlap of xyxy boxes, as intersection over union or over the smaller box."""
+    x1 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    y1 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    x2 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+    y2 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    if metric == "ios":
+        denominator = np.minimum(areas[:, None], areas[None, :])
+    else:
+        denominator = areas[:, None] + areas[None, :] - inter
+    return inter / np.maximum(denominator, 1e-9)
+
+
+def _clusters(boxes: np.ndarray, scores: np.ndarray, threshold: float, metric: str) -> List[np.ndarray]:
+    """
+    Greedy clustering: the highest-scoring unassigned box takes every
+    unassigned box overlapping it by more than threshold. Returns index
+    arrays, each starting with its leading box, in descending score order.
+    """
+    order = np.argsort(-scores, kind="stable")
+    overlap = pairwise_overlap(boxes[order], metric) > threshold
+    assigned = np.zeros(len(order), dtype=bool)
+    clusters = []
+    for row in range(len(order)):
+        if assigned[row]:
+            continue
+        members = overlap[row] & ~assigned
+        members[row] = False
+        assigned |= members
+        assigned[row] = True
+        clusters.append(order[np.concatenate(([row], np.flatnonzero(members)))])
+    return clusters
+
+
+def merge_detections(
+    detections: Detections,
+    method: str = "nms",
+    threshold: float = 0.5,
+    metric: str = "ios"
+) -> Detections:
+    """
+    Merge same-class detections that overlap by more than threshold.
+
+    Args:
+        detections: One page's detections, possibly from several models
+                    or tiles
+        method: 'nms' keeps the highest-confidence box of each cluster;
+                'wbf' replaces the cluster by its confidence-weighted mean
+                box, with the cluster's highest confidence
+        threshold: Overlap above which two boxes are the same object
+        metric: 'ios' (intersection over the smaller box) or 'iou'
+
+    Returns:
+        The surviving detections, in their original order.
+    """
+    if method not in MERGE_METHODS:
+        raise ValueError(f"Unknown merge method {method!r}; expected one of {MERGE_METHODS}")
+    if len(detections) < 2:
+        return detections
+
+    boxes = detections.xyxy.astype(np.float64)
+    scores = detections.confidence.astype(np.float64)
+
+    keep = []
+    fused = boxes.copy()
+    for class_id in np.unique(detections.class_id):
+        indices = np.flatnonzero(detections.class_id == class_id)
+        for cluster in _clusters(boxes[indices], scores[indices], threshold, metric):
+            members = indices[cluster]
+            keep.append(members[0])
+            if method == "wbf" and len(members) > 1:
+                weights = scores[members]
+                fused[members[0]] = (boxes[members] * weights[:, None]).sum(axis=0) / max(weights.sum(), 1e-9)
+
+    keep = np.sort(np.array(keep))
+    merged = detections.select(keep)
+    if method == "wbf":
+        merged.xyxy = fused[keep].astype(np.float32)
+    return merged
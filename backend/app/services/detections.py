@@ -0,0 +1,211 @@
+"""
+Detections of one page, held as parallel NumPy arrays.
+
+A page can carry hundreds of candidate boxes (dense stamps, tiled mode), so
+they are never turned into one Python object per box on the way from the
+model to the response: the inspector, the box merge, the statistics and the
+result cache all work on the arrays. Dicts are only built where a response
+is assembled (see to_dicts and analysis._format_detections).
+
+Class and model names are stored once per page (class_names, model_names)
+and referenced by index (class_id, model_id).
+"""
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+
+class Detections:
+    __slots__ = ("xyxy", "confidence", "class_id", "model_id", "class_names", "model_names")
+
+    def __init__(
+        self,
+        xyxy: np.ndarray,
+        confidence: np.ndarray,
+        class_id: np.ndarray,
+        class_names: Sequence[str],
+        model_id: Optional[np.ndarray] = None,
+        model_names: Sequence[str] = ("",)
+    ):
+        """
+        Args:
+            xyxy: (N, 4) boxes in page pixels
+            confidence: (N,) scores
+            class_id: (N,) indices into class_names
+            class_names: Class name per index
+            model_id: (N,) indices into model_names (default all 0)
+            model_names: Model name per index
+        """
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.confidence = np.asarray(confidence, dtype=np.float32).reshape(-1)
+        self.class_id = np.asarray(class_id, dtype=np.int32).reshape(-1)
+        self.model_id = (
+            np.zeros(len(self.class_id), dtype=np.int32) if model_id is None
+            else np.asarray(model_id, dtype=np.int32).reshape(-1)
+        )
+        self.class_names = tuple(class_names)
+        self.model_names = tuple(model_names)
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(np.empty((0, 4)), [], [], ())
+
+    @classmethod
+    def from_result(cls, result, model_name: str, xyxy=None) -> "Detections":
+        """
+        Detections of one YOLO result, with one device→host copy per array.
+        xyxy replaces the result's own boxes (e.g. scaled back to the page).
+        """
+        boxes = result.boxes
+        xyxy = boxes.xyxy if xyxy is None else xyxy
+        return cls(
+            _to_numpy(xyxy),
+            _to_numpy(boxes.conf),
+            _to_numpy(boxes.cls),
+            [result.names[index] for index in range(len(result.names))],
+            model_names=(model_name,)
+        )
+
+    @classmethod
+    def from_dicts(cls, detections: List[Dict]) -> "Detections":
+        """From the {'class', 'confidence', 'bbox', 'model'} dict form."""
+        if not detections:
+            return cls.empty()
+        classes = [d["class"] for d in detections]
+        models = [d.get("model", "") for d in detections]
+        class_names = list(dict.fromkeys(classes))
+        model_names = list(dict.fromkeys(models))
+        return cls(
+            [d["bbox"] for d in detections],
+            [d["confidence"] for d in detections],
+            [class_names.index(name) for name in classes],
+            class_names,
+            [model_names.index(name) for name in models],
+            model_names
+        )
+
+    @classmethod
+    def from_json(cls, value: Dict) -> "Detections":
+        """Inverse of to_json."""
+        return cls(
+            np.asarray(value["xyxy"], dtype=np.float32),
+            value["confidence"],
+            value["class_id"],
+            value["class_names"],
+            value["model_id"],
+            value["model_names"]
+        )
+
+    @classmethod
+    def coerce(cls, value: Union["Detections", Dict, List[Dict]]) -> "Detections":
+        """Accept Detections, their to_json form or the list-of-dicts form (e.g. older cache entries)."""
+        if isinstance(value, Detections):
+            return value
+        if isinstance(value, dict):
+            return cls.from_json(value)
+        return cls.from_dicts(value)
+
+    @classmethod
+    def concatenate(cls, parts: Sequence["Detections"]) -> "Detections":
+        """One page's detections from several models (or tiles); name tables are merged."""
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+
+        class_names = list(dict.fromkeys(name for part in parts for name in part.class_names))
+        model_names = list(dict.fromkeys(name for part in parts for name in part.model_names))
+        class_index = {name: index for index, name in enumerate(class_names)}
+        model_index = {name: index for index, name in enumerate(model_names)}
+        return cls(
+            np.concatenate([part.xyxy for part in parts]),
+            np.concatenate([part.confidence for part in parts]),
+            np.concatenate([
+                np.array([class_index[name] for name in part.class_names], dtype=np.int32)[part.class_id]
+                for part in parts
+            ]),
+            class_names,
+            np.concatenate([
+                np.array([model_index[name] for name in part.model_names], dtype=np.int32)[part.model_id]
+                for part in parts
+            ]),
+            model_names
+        )
+
+    def __len__(self) -> int:
+        return len(self.confidence)
+
+    def __repr__(self) -> str:
+        return f"Detections({len(self)} boxes, classes={self.class_names}, models={self.model_names})"
+
+    def select(self, index) -> "Detections":
+        """Subset by boolean mask or index array; name tables are kept."""
+        return Detections(
+            self.xyxy[index], self.confidence[index], self.class_id[index],
+            self.class_names, self.model_id[index], self.model_names
+        )
+
+    def shift(self, dx: float, dy: float) -> "Detections":
+        """Boxes moved by (dx, dy), e.g. from tile to page coordinates."""
+        return Detections(
+            self.xyxy + np.array([dx, dy, dx, dy], dtype=np.float32), self.confidence, self.class_id,
+            self.class_names, self.model_id, self.model_names
+        )
+
+    def scale(self, sx: float, sy: float) -> "Detections":
+        """Boxes scaled by (sx, sy), e.g. from a downscaled raster to the full one."""
+        return Detections(
+            self.xyxy * np.array([sx, sy, sx, sy], dtype=np.float32), self.confidence, self.class_id,
+            self.class_names, self.model_id, self.model_names
+        )
+
+    def class_mask(self, class_name: str) -> np.ndarray:
+        if class_name not in self.class_names:
+            return np.zeros(len(self), dtype=bool)
+        return self.class_id == self.class_names.index(class_name)
+
+    @property
+    def classes(self) -> List[str]:
+        """Class name of every box."""
+        return [self.class_names[index] for index in self.class_id.tolist()]
+
+    @property
+    def models(self) -> List[str]:
+        """Model name of every box."""
+        return [self.model_names[index] for index in self.model_id.tolist()]
+
+    def xywh(self) -> np.ndarray:
+        """(N, 4) x, y, width, height in float64, as reported in responses."""
+        xyxy = self.xyxy.astype(np.float64)
+        return np.concatenate([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+    def class_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.class_id, minlength=len(self.class_names))
+        return {name: int(count) for name, count in zip(self.class_names, counts) if count}
+
+    def to_dicts(self) -> List[Dict]:
+        """The {'class', 'confidence', 'bbox', 'model'} dict form, one dict per box."""
+        return [
+            {"class": class_name, "confidence": confidence, "bbox": bbox, "model": model}
+            for class_name, confidence, bbox, model in zip(
+                self.classes, self.confidence.tolist(), self.xyxy.tolist(), self.models
+            )
+        ]
+
+    def to_json(self) -> Dict:
+        """Columnar, JSON-serializable form (used by the result cache)."""
+        return {
+            "xyxy": self.xyxy.tolist(),
+            "confidence": self.confidence.tolist(),
+            "class_id": self.class_id.tolist(),
+            "class_names": list(self.class_names),
+            "model_id": self.model_id.tolist(),
+            "model_names": list(self.model_names)
+        }
+
+
+def _to_numpy(values) -> np.ndarray:
+    if hasattr(values, "cpu"):
+        return values.cpu().numpy()
+    return np.asarray(values)
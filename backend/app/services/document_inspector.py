@@ -9,15 +9,91 @@ torch.serialization.add_safe_globals([
 ])
 
 from ultralytics import YOLO
-from PIL import Image, ImageDraw, ImageFont
+from ultralytics.data.augment import LetterBox
+from ultralytics.utils.ops import scale_boxes
+from PIL import Image
 import numpy as np
-from typing import List, Dict, Tuple
-from collections import Counter
+from typing import List, Dict, NamedTuple, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import math
+import threading
+import time
 
+from app.utils.page_regions import PageRegion
+from app.utils.pdf_tools import RenderedPage
+from app.services.annotation_renderer import AnnotationRenderer
+from app.services.box_merge import merge_detections
+from app.services.detections import Detections
+from app.services.metrics import DetectionStatistics, registry
+from app.services.model_export import select_model_path
+
+# A page can be handed over in any of these forms
+Page = Union[Image.Image, np.ndarray, RenderedPage]
+
+
+def _as_array(page: Page) -> np.ndarray:
+    """HxWx3 uint8 view of a page; only PIL input needs a conversion."""
+    if isinstance(page, RenderedPage):
+        return page.array
+    if isinstance(page, np.ndarray):
+        return page
+    return np.array(page)
+
+
+def _as_pil_copy(page: Page) -> Image.Image:
+    """PIL copy of a page that can be drawn on."""
+    if isinstance(page, RenderedPage):
+        return page.image
+    if isinstance(page, np.ndarray):
+        return Image.fromarray(page)
+    return page.copy()
+
+
+def tile_grid(height: int, width: int, tile_size: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """
+    (x1, y1, x2, y2) windows of at most tile_size covering a page, neighbours
+    overlapping by about `overlap` of a tile; the last row/column is aligned
+    with the page edge instead of running past it.
+    """
+    step = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, step)) + [length - tile_size]
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+
+class PageInspection(NamedTuple):
+    """Result for one page; unpacks as (detections, annotated_image)."""
+    detections: Detections
+    annotated_image: Optional[Image.Image]
+
+    @property
+    def statistics(self) -> DetectionStatistics:
+        return DetectionStatistics.from_pages([self.detections])
 
 
 class DocumentInspector:
-    def __init__(self, model_configs: List[Dict[str, any]], device: str = "cpu", imgsz: int = 1280):
+    def __init__(
+        self,
+        model_configs: List[Dict[str, any]],
+        device: str = "cpu",
+        imgsz: int = 1280,
+        max_map50_drop: float = 0.01,
+        max_recall_drop: float = 0.02,
+        concurrent_models: bool = False,
+        cascade_imgsz: Optional[int] = None,
+        cascade_conf: float = 0.05,
+        cross_model_iou: Optional[float] = None,
+        roi_imgsz: Optional[int] = None,
+        renderer: Optional[AnnotationRenderer] = None
+    ):
         """
         Initialize with multiple models using cropper-style inference.
         
@@ -26,8 +102,49 @@ class DocumentInspector:
                 - 'path': str, path to model file
                 - 'conf_threshold': float, confidence threshold (default 0.25)
                 - 'name': str, optional name for the model (for debugging)
+                - 'batch_size': int, pages per forward pass (default 8)
+                - 'backend': str, 'torch' (default), 'onnx' or 'openvino';
+                  the latter two load the graph exported next to 'path'
+                  (see app.services.model_export)
+                - 'precision': str, 'fp32' (default), 'int8' (onnx) or
+                  'fp16' (openvino); only used when the variant passes
+                  the accuracy gate below
+                - 'tile_size': int, enable tiled inference: pages larger
+                  than imgsz are also cut into overlapping tiles of this
+                  many pixels, run at native resolution and merged with
+                  the full-page detections (default None: full page only;
+                  best kept a multiple of 32)
+                - 'tile_overlap': float, share of a tile its neighbours
+                  overlap (default 0.2)
+                - 'tile_merge': str, 'nms' (default) or 'wbf', how
+                  duplicates from tiles and the full page are merged
+                - 'tile_merge_threshold': float, overlap (intersection
+                  over the smaller box) above which two boxes of the
+                  same class are merged (default 0.5)
             device: Device to run inference on ('cpu', 'cuda', '0', etc.)
             imgsz: Inference image size for 'slight zoom' effect (default 1280)
+            max_map50_drop: Largest mAP@0.5 loss vs. FP32 for which a
+                            quantized variant is accepted
+            max_recall_drop: Largest recall loss vs. FP32 for which a
+                             quantized variant is accepted
+            concurrent_models: Run the models side by side on the shared
+                               input (one thread each; separate CUDA
+                               streams on GPU) instead of one after another
+            cascade_imgsz: Enable the cascade: every model first runs at this
+                           (lower) size, and the full imgsz pass only runs
+                           on the pages where that pre-pass found something.
+                           None always runs the full pass.
+            cascade_conf: Confidence a pre-pass box needs to send its page to
+                          the full pass; keep it well below conf_threshold,
+                          since misses here are misses in the result
+            cross_model_iou: Drop a box when a higher-confidence box of the
+                             same class from any model overlaps it by more
+                             than this IoU. None keeps every model's boxes.
+            roi_imgsz: Enable ROI mode: rendered pages that carry regions
+                       (RenderedPage.regions, see app.utils.page_regions)
+                       run the models on those crops at this size instead
+                       of on the whole page. None inspects whole pages.
+            renderer: Draws annotated pages (default: a renderer of its own)
         
         Example:
             model_configs = [
@@ -38,132 +155,402 @@ class DocumentInspector:
         self.models = []
         self.device = device if device else "cpu"
         self.imgsz = imgsz
+        self.cascade_imgsz = cascade_imgsz
+        self.cascade_conf = cascade_conf
+        self.cross_model_iou = cross_model_iou
+        self.roi_imgsz = roi_imgsz
+        self.renderer = renderer or AnnotationRenderer()
         
         for config in model_configs:
-            model_path = config["path"]
-            conf_threshold = config.get("conf_threshold", 0.25)
-            model_name = config.get("name", model_path)
-            
-            model = YOLO(model_path)
-            model.to(self.device)
-            
-            self.models.append({
-                "model": model,
-                "conf_threshold": conf_threshold,
-                "name": model_name
-            })
+            self.models.append(self._load_model(config, select_model_path(config, max_map50_drop, max_recall_drop)))
+        self.stride = self._model_stride()
         
-        # Statistics tracking
-        self.total_detections = 0
-        self.class_statistics = Counter()
+        self._model_pool = None
+        if concurrent_models and len(self.models) > 1:
+            self._model_pool = ThreadPoolExecutor(
+                max_workers=len(self.models), thread_name_prefix="inspector-model"
+            )
+            if str(self.device).startswith("cuda") and torch.cuda.is_available():
+                for info in self.models:
+                    info["stream"] = torch.cuda.Stream(device=self.device)
 
-    def detect_image(self, pil_image: Image.Image) -> Tuple[List[Dict], Image.Image]:
+    @classmethod
+    def for_model_file(cls, config: Dict[str, any], model_path: str, **kwargs) -> "DocumentInspector":
+        """
+        An inspector running one MODEL_CONFIGS entry from the given model
+        file, without the accuracy gate, e.g. to evaluate a quantized variant
+        through the same preprocessing and prediction as production.
+        kwargs are as for the constructor.
+        """
+        inspector = cls([], **kwargs)
+        inspector.models.append(inspector._load_model(config, model_path))
+        inspector.stride = inspector._model_stride()
+        return inspector
+    
+    def _load_model(self, config: Dict[str, any], model_path: str) -> Dict:
+        """The self.models entry of a MODEL_CONFIGS entry, loaded from model_path."""
+        backend = config.get("backend", "torch")
+        model = YOLO(model_path, task="detect")
+        if backend == "torch":
+            model.to(self.device)
+        
+        return {
+            "model": model,
+            "conf_threshold": config.get("conf_threshold", 0.25),
+            "name": config.get("name", config["path"]),
+            "batch_size": config.get("batch_size", 8),
+            "backend": backend,
+            "tile_size": config.get("tile_size"),
+            "tile_overlap": config.get("tile_overlap", 0.2),
+            "tile_merge": config.get("tile_merge", "nms"),
+            "tile_merge_threshold": config.get("tile_merge_threshold", 0.5),
+            # YOLO predictors keep per-call state and are not thread-safe,
+            # so concurrent callers take turns on each model
+            "lock": threading.Lock(),
+            "stream": None
+        }
+    
+    def _model_stride(self) -> int:
+        # Pages are letterboxed once for all models, so they must agree on
+        # the stride; exported graphs carry no stride before their first call
+        strides = [
+            int(info["model"].model.stride.max())
+            for info in self.models if info["backend"] == "torch"
+        ]
+        return max(strides, default=32)
+    
+    def _stride_size(self, size: int) -> int:
+        # Tensor input skips the predictor's own size check, which would
+        # round imgsz up to the stride (with a warning); round it here once
+        return math.ceil(size / self.stride) * self.stride
+    
+    def detect_image(self, pil_image: Image.Image) -> PageInspection:
         """
         Run YOLO inference on a PIL image using all loaded models with cropper parameters.
         Merges detections from all models using native YOLO prediction.
         
         Returns:
-            - detections: List of detection dicts with merged results from all models
+            - detections: Detections with merged results from all models
             - annotated_pil_image: PIL.Image with all detections visualized
         """
-        img_np = np.array(pil_image)
-        all_detections = []
+        return self.detect_images([pil_image])[0]
+
+    def detect_images(
+        self,
+        pages: List[Page],
+        batch_size: Optional[int] = None,
+        annotate: bool = True
+    ) -> List[PageInspection]:
+        """
+        Run all loaded models over several pages, sending them through each
+        model in batches instead of one forward pass per page.
         
-        # Run inference with each model using cropper-style parameters
-        for model_info in self.models:
-            model = model_info["model"]
-            conf_threshold = model_info["conf_threshold"]
-            model_name = model_info["name"]
-            
-            # Use native YOLO prediction with cropper parameters
-            results = model.predict(
-                source=img_np,
-                imgsz=self.imgsz,      # 'Slight zoom' effect from cropper
-                conf=conf_threshold,
-                iou=0.5,               # IOU threshold from cropper (don't change)
-                device=self.device,
-                verbose=False,
-                stream=False
-            )
-            result = results[0]
-            
-            # Extract detections from this model
-            for box in result.boxes:
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                
-                class_name = result.names[cls]
-                
-                all_detections.append({
-                    "class": class_name,
-                    "confidence": conf,
-                    "bbox": [x1, y1, x2, y2],
-                    "model": model_name
-                })
-                
-                # Update statistics
-                self.class_statistics[class_name] += 1
+        Args:
+            pages: Pages to inspect (may come from different PDFs), as PIL
+                   images, HxWx3 uint8 arrays or RenderedPage objects. Arrays
+                   and rendered pages are fed to the models without a copy.
+            batch_size: Pages per forward pass; overrides the per-model
+                        'batch_size' from the config when given
+            annotate: Draw detections on a copy of each page. The annotated
+                      image is None when False.
+        
+        Returns:
+            One PageInspection (detections, annotated_pil_image) per input
+            page, in order. Nothing is accumulated on the inspector; callers
+            tally their own pages (see DetectionStatistics).
+        """
+        if not pages:
+            return []
+        
+        arrays = [_as_array(page) for page in pages]
+        regions = [
+            page.regions if self.roi_imgsz and isinstance(page, RenderedPage) else None
+            for page in pages
+        ]
+        
+        # ROI pages run on their crops, the others (e.g. scans) whole
+        page_detections = [None] * len(arrays)
+        whole = [index for index, page_regions in enumerate(regions) if page_regions is None]
+        cropped = [index for index, page_regions in enumerate(regions) if page_regions is not None]
+        if whole:
+            results = self._detect_pages([arrays[index] for index in whole], batch_size)
+            for index, detections in zip(whole, results):
+                page_detections[index] = detections
+        if cropped:
+            results = self._detect_regions([regions[index] for index in cropped], batch_size)
+            for index, detections in zip(cropped, results):
+                page_detections[index] = detections
+        
+        if self.cross_model_iou is not None and len(self.models) > 1:
+            page_detections = [
+                merge_detections(detections, method="nms", threshold=self.cross_model_iou, metric="iou")
+                for detections in page_detections
+            ]
         
-        self.total_detections += len(all_detections)
+        for detections in page_detections:
+            registry.record_page(detections)
         
-        # Draw all detections on the image
-        annotated_pil = self._draw_all_detections(pil_image.copy(), all_detections)
+        # Draw all detections on the images
+        if not annotate:
+            return [PageInspection(detections, None) for detections in page_detections]
+        annotated = self.renderer.draw_batch(pages, page_detections)
+        return [
+            PageInspection(detections, Image.fromarray(array))
+            for detections, array in zip(page_detections, annotated)
+        ]
+    
+    def _detect_pages(self, arrays: List[np.ndarray], batch_size: Optional[int]) -> List[Detections]:
+        """All models over whole pages; one Detections per page."""
+        if self.cascade_imgsz is not None:
+            per_model = self._cascade(arrays, batch_size)
+        else:
+            # Letterbox, stack and transfer once; every model reads this tensor
+            imgsz = self._stride_size(self.imgsz)
+            batch = self._timed_preprocess(arrays, imgsz)
+            per_model = self._map_models(lambda model_info: self._detect(
+                model_info, batch, arrays, batch_size or model_info["batch_size"], imgsz
+            ))
         
-        return all_detections, annotated_pil
+        # Merge in model order, as the per-model loop did
+        return [
+            Detections.concatenate([model_detections[index] for model_detections in per_model])
+            for index in range(len(arrays))
+        ]
     
-    def get_statistics(self) -> Dict:
-        """Get detection statistics across all processed images."""
-        return {
-            "total_detections": self.total_detections,
-            "class_statistics": dict(self.class_statistics)
-        }
+    def _detect_regions(self, page_regions: List[List[PageRegion]], batch_size: Optional[int]) -> List[Detections]:
+        """
+        ROI mode: all models over the regions of several pages instead of
+        the pages. Regions of all pages share the forward passes and are
+        letterboxed once for all models, a chunk at a time; boxes are mapped
+        back to page coordinates. A page without regions gets no detections.
+        """
+        roi_imgsz = self._stride_size(self.roi_imgsz)
+        crops = [(index, region) for index, regions in enumerate(page_regions) for region in regions]
+        registry.increment("roi:pages", len(page_regions))
+        registry.increment("roi:regions", len(crops))
+        
+        # pieces[page][model]: that model's detections in each of the page's regions
+        pieces = [[[] for _ in self.models] for _ in page_regions]
+        chunk_size = batch_size or max(model_info["batch_size"] for model_info in self.models)
+        for start in range(0, len(crops), chunk_size):
+            chunk = crops[start:start + chunk_size]
+            arrays = [region.array for _, region in chunk]
+            batch = self._timed_preprocess(arrays, roi_imgsz)
+            per_model = self._map_models(lambda model_info: self._predict(
+                model_info, batch, arrays, batch_size or model_info["batch_size"], imgsz=roi_imgsz, stage="roi"
+            ))
+            for model_index, results in enumerate(per_model):
+                for (index, region), detections in zip(chunk, results):
+                    pieces[index][model_index].append(
+                        detections.scale(region.scale, region.scale).shift(region.x, region.y)
+                    )
+        
+        # In model order, as for whole pages
+        return [
+            Detections.concatenate([detections for model_pieces in page_pieces for detections in model_pieces])
+            for page_pieces in pieces
+        ]
     
-    def reset_statistics(self):
-        """Reset detection statistics."""
-        self.total_detections = 0
-        self.class_statistics.clear()
+    def _map_models(self, fn) -> List:
+        """fn(model_info) for every model, in config order; side by side if enabled."""
+        if self._model_pool is not None:
+            return list(self._model_pool.map(fn, self.models))
+        return [fn(model_info) for model_info in self.models]
     
-    def _draw_all_detections(self, image: Image.Image, detections: List[Dict]) -> Image.Image:
-        """Draw all detections from all models on the image with labels showing percentages."""
-        draw = ImageDraw.Draw(image)
-        
-        # Try to load a larger, bold font
-        try:
-            font = ImageFont.truetype("arial.ttf", 32)  # Larger font size
-        except:
-            try:
-                font = ImageFont.truetype("Arial Bold.ttf", 32)
-            except:
-                font = ImageFont.load_default()
-        
-        # Define colors for different classes
-        colors = {
-            "qr_code": (0, 0, 255),      # Blue
-            "signature": (255, 0, 0),     # Red
-            "stamp": (0, 255, 0),         # Green
-        }
-        default_color = (255, 165, 0)  # Orange for unknown classes
+    def _cascade(self, arrays: List[np.ndarray], batch_size: Optional[int]) -> List[List[Detections]]:
+        """
+        Low-resolution pre-pass per model, then the full pass for each model
+        on only the pages its pre-pass flagged. Pages a model skips get no
+        detections from it.
+        """
+        cascade_imgsz = self._stride_size(self.cascade_imgsz)
+        low = self._timed_preprocess(arrays, cascade_imgsz)
+        flagged = self._map_models(lambda model_info: [
+            index for index, detections in enumerate(self._predict(
+                model_info, low, arrays, batch_size or model_info["batch_size"],
+                conf=self.cascade_conf, imgsz=cascade_imgsz, stage="cascade"
+            ))
+            if detections
+        ])
+        del low
         
-        for detection in detections:
-            class_name = detection["class"]
-            confidence = detection["confidence"]
-            x1, y1, x2, y2 = detection["bbox"]
-            
-            # Get color for this class
-            color = colors.get(class_name, default_color)
+        for model_info, pages in zip(self.models, flagged):
+            registry.increment(f"cascade:{model_info['name']}:pages", len(arrays))
+            registry.increment(f"cascade:{model_info['name']}:passed", len(pages))
+        
+        per_model = [[Detections.empty() for _ in arrays] for _ in self.models]
+        needed = sorted(set().union(*flagged))
+        if not needed:
+            return per_model
+        
+        # Full-resolution input for every flagged page, shared by the models
+        imgsz = self._stride_size(self.imgsz)
+        high = self._timed_preprocess([arrays[index] for index in needed], imgsz)
+        row_of = {index: row for row, index in enumerate(needed)}
+        
+        def full_pass(item):
+            model_index, pages = item
+            if not pages:
+                return
+            model_info = self.models[model_index]
+            rows = torch.tensor([row_of[index] for index in pages], device=high.device)
+            detections = self._detect(
+                model_info, high.index_select(0, rows), [arrays[index] for index in pages],
+                batch_size or model_info["batch_size"], imgsz
+            )
+            for index, page_detections in zip(pages, detections):
+                per_model[model_index][index] = page_detections
+        
+        items = list(enumerate(flagged))
+        if self._model_pool is not None:
+            list(self._model_pool.map(full_pass, items))
+        else:
+            for item in items:
+                full_pass(item)
+        return per_model
+    
+    def _detect(
+        self,
+        model_info: Dict,
+        batch: torch.Tensor,
+        arrays: List[np.ndarray],
+        model_batch: int,
+        imgsz: int
+    ) -> List[Detections]:
+        """Full pass of one model: the shared input (letterboxed to imgsz), plus its tiles if it is tiled."""
+        detections = self._predict(model_info, batch, arrays, model_batch, imgsz=imgsz)
+        if not model_info["tile_size"]:
+            return detections
+        
+        tiled = self._predict_tiles(model_info, arrays, model_batch)
+        return [
+            merge_detections(
+                Detections.concatenate([page_detections, *tile_detections]),
+                method=model_info["tile_merge"],
+                threshold=model_info["tile_merge_threshold"]
+            ) if tile_detections else page_detections
+            for page_detections, tile_detections in zip(detections, tiled)
+        ]
+    
+    def _predict_tiles(self, model_info: Dict, arrays: List[np.ndarray], model_batch: int) -> List[List[Detections]]:
+        """
+        Run one model over overlapping tiles of every page larger than imgsz
+        (smaller pages already reach the full pass undownscaled). Tiles of
+        all pages share the forward passes, model_batch at a time, and are
+        crops (views) of the page arrays, so only each chunk is copied.
+        Returns the detections of each page's tiles, in page coordinates.
+        """
+        tile_size = model_info["tile_size"]
+        tile_imgsz = self._stride_size(tile_size)
+        
+        tiles = [
+            (index, x1, y1, array[y1:y2, x1:x2])
+            for index, array in enumerate(arrays) if max(array.shape[:2]) > self.imgsz
+            for x1, y1, x2, y2 in tile_grid(*array.shape[:2], tile_size, model_info["tile_overlap"])
+        ]
+        registry.increment(f"tiles:{model_info['name']}", len(tiles))
+        
+        page_detections = [[] for _ in arrays]
+        for start in range(0, len(tiles), model_batch):
+            chunk = tiles[start:start + model_batch]
+            crops = [crop for _, _, _, crop in chunk]
+            batch = self._timed_preprocess(crops, tile_imgsz)
+            results = self._predict(model_info, batch, crops, model_batch, imgsz=tile_imgsz, stage="tiles")
             
-            # Draw bounding box with thicker lines (width=5 for bolder appearance)
-            draw.rectangle([x1, y1, x2, y2], outline=color, width=5)
+            for (index, x1, y1, _), detections in zip(chunk, results):
+                page_detections[index].append(detections.shift(x1, y1))
+        return page_detections
+    
+    def _timed_preprocess(self, arrays: List[np.ndarray], imgsz: int) -> torch.Tensor:
+        started = time.perf_counter()
+        batch = self._preprocess(arrays, imgsz)
+        registry.record_timing("preprocess", time.perf_counter() - started)
+        return batch
+    
+    def _preprocess(self, arrays: List[np.ndarray], imgsz: Optional[int] = None) -> torch.Tensor:
+        """
+        Letterbox pages the way the YOLO predictor would (minimal padding
+        when all pages share a shape, square imgsz otherwise) and return them
+        as one uint8 BCHW RGB tensor on the inference device. Kept as uint8
+        until each model's chunk is converted, which is 4x less to move and
+        hold than float.
+        """
+        same_shapes = len({array.shape for array in arrays}) == 1
+        letterbox = LetterBox(imgsz or self._stride_size(self.imgsz), auto=same_shapes, stride=self.stride)
+        letterboxed = np.stack([letterbox(image=array) for array in arrays])
+        
+        tensor = torch.from_numpy(letterboxed).to(self.device)
+        # BHWC to BCHW; channels reversed exactly as the predictor does for arrays
+        return tensor.permute(0, 3, 1, 2).flip(1).contiguous()
+    
+    def _predict(
+        self,
+        model_info: Dict,
+        batch: torch.Tensor,
+        arrays: List[np.ndarray],
+        model_batch: int,
+        conf: Optional[float] = None,
+        imgsz: Optional[int] = None,
+        stage: str = "model"
+    ) -> List[Detections]:
+        """
+        Run one model over the shared input; detections per page in page
+        coordinates. conf/imgsz default to the model's threshold and the
+        inspector's imgsz (rounded up to the stride); the time goes to the "<stage>:<model name>" timing.
+        """
+        model = model_info["model"]
+        input_shape = tuple(batch.shape[2:])
+        stream = model_info["stream"]
+        page_detections = []
+        
+        started = time.perf_counter()
+        with model_info["lock"], (torch.cuda.stream(stream) if stream is not None else nullcontext()):
+            if stream is not None:
+                # The shared input was written on the default stream
+                stream.wait_stream(torch.cuda.default_stream(stream.device))
             
-            # Draw label with percentage
-            label = f"{class_name} {confidence:.0%}"  # Shows as "qr_code 95%"
+            for start in range(0, len(arrays), model_batch):
+                source = batch[start:start + model_batch].float().div_(255)
+                
+                # Use native YOLO prediction with cropper parameters
+                results = model.predict(
+                    source=source,
+                    imgsz=imgsz or self._stride_size(self.imgsz),  # 'Slight zoom' effect from cropper
+                    conf=model_info["conf_threshold"] if conf is None else conf,
+                    iou=0.5,               # IOU threshold from cropper (don't change)
+                    device=self.device,
+                    verbose=False,
+                    stream=False
+                )
+                
+                for offset, result in enumerate(results):
+                    page_detections.append(self._extract_detections(
+                        result, model_info["name"], input_shape, arrays[start + offset].shape
+                    ))
             
-            # Calculate text size and draw background
-            bbox = draw.textbbox((x1, y1 - 40), label, font=font)
-            draw.rectangle(bbox, fill=color)
-            draw.text((x1, y1 - 40), label, fill="white", font=font)
+            if stream is not None:
+                stream.synchronize()
+        registry.record_timing(f"{stage}:{model_info['name']}", time.perf_counter() - started)
         
-        return image
-
-
+        return page_detections
+    
+    def annotate(self, page: Page, detections: Detections) -> Image.Image:
+        """Return a PIL copy of the page with the detections drawn on it."""
+        return Image.fromarray(self.renderer.draw(page, detections))
+    
+    @staticmethod
+    def _extract_detections(
+        result,
+        model_name: str,
+        input_shape: Optional[Tuple[int, int]] = None,
+        page_shape: Optional[Tuple[int, ...]] = None
+    ) -> Detections:
+        """
+        Convert one YOLO result into Detections. Results of a preprocessed
+        (letterboxed) input come with its input_shape and are mapped back
+        onto the page_shape.
+        """
+        xyxy = result.boxes.xyxy
+        if input_shape is not None and len(xyxy):
+            xyxy = scale_boxes(input_shape, xyxy.clone(), page_shape[:2])
+        return Detections.from_result(result, model_name, xyxy)
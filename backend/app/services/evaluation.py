@@ -0,0 +1,238 @@
+"""
+Accuracy/speed evaluation of quantized model variants against FP32.
+
+A labeled page set is a directory of page images (.png/.jpg) with a JSON
+file of the same name next to each one, holding the expected boxes in the
+same form the inspector reports them:
+
+    [{"class": "stamp", "bbox": [x1, y1, x2, y2]}, ...]
+
+Run from the backend directory:
+    python -m app.services.evaluation --dataset data/labeled --variants onnx:int8 openvino:fp16
+
+For every MODEL_CONFIGS entry and variant this prints mAP@0.5, recall at the
+model's conf_threshold and pages/sec for FP32 PyTorch and the variant, and
+stores the report next to the variant. Pages go through the inspector's own
+letterboxing and prediction, as in production. The inspector reads that
+report to decide whether the variant may be used (see
+model_export.select_model_path).
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from app.services.detections import Detections
+from app.services.model_export import backend_model_path, evaluation_report_path
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg")
+
+# Detections down to this confidence go into the precision/recall curve
+EVAL_CONF = 0.001
+
+
+def load_labeled_pages(directory: str) -> Tuple[List[np.ndarray], List[List[Dict]]]:
+    """Return (pages as HxWx3 uint8 arrays, expected detections per page)."""
+    pages, labels = [], []
+    for image_path in sorted(Path(directory).iterdir()):
+        if image_path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        label_path = image_path.with_suffix(".json")
+        pages.append(np.array(Image.open(image_path).convert("RGB")))
+        labels.append(json.loads(label_path.read_text()) if label_path.exists() else [])
+    if not pages:
+        raise ValueError(f"No labeled pages found in {directory}")
+    return pages, labels
+
+
+def _iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def _match(predictions: List[Detections], labels: List[Detections], class_name: str, iou_threshold: float):
+    """
+    Greedily match one class's predictions (highest confidence first) to
+    unmatched labels. Returns (confidences, true-positive flags, label count).
+    """
+    truth = [page.xyxy[page.class_mask(class_name)].astype(float) for page in labels]
+    used = [np.zeros(len(boxes), dtype=bool) for boxes in truth]
+
+    masks = [page.class_mask(class_name) for page in predictions]
+    confidences = np.concatenate([page.confidence[mask] for page, mask in zip(predictions, masks)]).astype(float)
+    page_index = np.concatenate([np.full(int(mask.sum()), index) for index, mask in enumerate(masks)]).astype(int)
+    boxes = np.concatenate([page.xyxy[mask] for page, mask in zip(predictions, masks)]).astype(float)
+    order = np.argsort(-confidences, kind="stable")
+
+    hits = np.zeros(len(order), dtype=bool)
+    for rank, row in enumerate(order):
+        index = page_index[row]
+        if len(truth[index]):
+            ious = _iou(boxes[row], truth[index])
+            ious[used[index]] = 0.0
+            best = int(np.argmax(ious))
+            if ious[best] >= iou_threshold:
+                used[index][best] = True
+                hits[rank] = True
+    return confidences[order], hits, sum(len(boxes) for boxes in truth)
+
+
+def average_precision(hits: np.ndarray, num_labels: int) -> float:
+    """All-point interpolated AP from hit flags sorted by descending confidence."""
+    if num_labels == 0:
+        return 0.0
+    tp = np.cumsum(hits)
+    fp = np.cumsum(~hits)
+    recall = np.concatenate(([0.0], tp / num_labels, [1.0]))
+    precision = np.concatenate(([1.0], tp / np.maximum(tp + fp, 1), [0.0]))
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    steps = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def score(
+    predictions: List[Union[Detections, List[Dict]]],
+    labels: List[Union[Detections, List[Dict]]],
+    classes: List[str],
+    conf_threshold: float,
+    iou_threshold: float = 0.5
+) -> Dict:
+    """
+    mAP@iou_threshold over the classes that have labels, and recall counting
+    only predictions at or above conf_threshold. Pages are Detections or
+    lists of detection dicts (as in the label files).
+    """
+    predictions = [Detections.coerce(page) for page in predictions]
+    labels = [Detections.coerce(page) for page in labels]
+    per_class = {}
+    found = total = 0
+    for class_name in classes:
+        confidences, hits, num_labels = _match(predictions, labels, class_name, iou_threshold)
+        if num_labels == 0:
+            continue
+        per_class[class_name] = average_precision(hits, num_labels)
+        found += int(np.sum(hits & (confidences >= conf_threshold)))
+        total += num_labels
+    return {
+        "map50": float(np.mean(list(per_class.values()))) if per_class else 0.0,
+        "recall": found / total if total else 0.0,
+        "per_class_ap50": per_class
+    }
+
+
+def evaluate_model(
+    model_path: str,
+    pages: List[np.ndarray],
+    labels: List[Union[Detections, List[Dict]]],
+    conf_threshold: float,
+    imgsz: int,
+    device: str = "cpu",
+    batch_size: int = 8,
+    config: Optional[Dict] = None
+) -> Dict:
+    """
+    Run one model file over the labeled pages; accuracy plus pages/sec.
+    config is the MODEL_CONFIGS entry whose options (backend, tiling) apply
+    to the model file; the default is a plain PyTorch model.
+    """
+    from app.services.document_inspector import DocumentInspector
+
+    # Through the inspector's own letterboxing and prediction, so results
+    # (and speed) match production
+    model_config = {
+        **(config or {}),
+        "path": model_path,
+        "name": model_path,
+        "conf_threshold": EVAL_CONF,
+        "batch_size": batch_size
+    }
+    inspector = DocumentInspector.for_model_file(model_config, model_path, device=device, imgsz=imgsz)
+    inspector.detect_images(pages[:1], annotate=False)   # Warm-up, not timed
+
+    start = time.perf_counter()
+    predictions = [detections for detections, _ in inspector.detect_images(pages, annotate=False)]
+    elapsed = time.perf_counter() - start
+
+    return {
+        **score(predictions, labels, list(inspector.models[0]["model"].names.values()), conf_threshold),
+        "pages_per_sec": len(pages) / elapsed
+    }
+
+
+def compare_variant(
+    config: Dict,
+    backend: str,
+    precision: str,
+    pages: List[np.ndarray],
+    labels: List[Union[Detections, List[Dict]]],
+    imgsz: int,
+    device: str = "cpu"
+) -> Dict:
+    """Evaluate FP32 PyTorch and one variant of a MODEL_CONFIGS entry on the same pages."""
+    conf_threshold = config.get("conf_threshold", 0.25)
+    baseline = evaluate_model(
+        config["path"], pages, labels, conf_threshold, imgsz, device,
+        config={**config, "backend": "torch", "precision": "fp32"}
+    )
+    variant_path = backend_model_path(config["path"], backend, precision)
+    candidate = evaluate_model(
+        variant_path, pages, labels, conf_threshold, imgsz, device,
+        config={**config, "backend": backend, "precision": precision}
+    )
+    return {
+        "model": config.get("name", config["path"]),
+        "variant": {"backend": backend, "precision": precision, "path": variant_path},
+        "pages": len(pages),
+        "imgsz": imgsz,
+        "baseline": baseline,
+        "candidate": candidate,
+        "delta": {
+            "map50": candidate["map50"] - baseline["map50"],
+            "recall": candidate["recall"] - baseline["recall"]
+        },
+        "speedup": candidate["pages_per_sec"] / baseline["pages_per_sec"]
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.config import MODEL_CONFIGS, INFERENCE_IMGSZ, QUANT_MAX_MAP50_DROP, QUANT_MAX_RECALL_DROP
+    from app.services.model_export import passes_accuracy_gate
+
+    parser = argparse.ArgumentParser(description="Evaluate quantized variants against FP32")
+    parser.add_argument("--dataset", required=True, help="Directory of page images with JSON labels")
+    parser.add_argument("--variants", nargs="+", default=["onnx:int8", "openvino:fp16"],
+                        help="backend:precision pairs")
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--dry-run", action="store_true", help="Print only; do not store reports")
+    args = parser.parse_args(argv)
+
+    pages, labels = load_labeled_pages(args.dataset)
+    for config in MODEL_CONFIGS:
+        for variant in args.variants:
+            backend, precision = variant.split(":")
+            report = compare_variant(config, backend, precision, pages, labels, args.imgsz, args.device)
+            accepted = passes_accuracy_gate(report, QUANT_MAX_MAP50_DROP, QUANT_MAX_RECALL_DROP)
+            print(
+                f"{report['model']} {variant}: "
+                f"mAP50 {report['baseline']['map50']:.3f} → {report['candidate']['map50']:.3f}, "
+                f"recall {report['baseline']['recall']:.3f} → {report['candidate']['recall']:.3f}, "
+                f"speedup {report['speedup']:.2f}x — {'accepted' if accepted else 'rejected'}"
+            )
+            if not args.dry_run:
+                with open(evaluation_report_path(report["variant"]["path"]), "w") as f:
+                    json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Bounded execution layer for blocking PDF and inference work.
+
+The API handlers are ``async def``; everything CPU/GPU heavy (rasterization,
+YOLO inference, JPG/PDF writing) is submitted here so the event loop stays
+free for health checks, static files and other requests.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int, max_queue: int):
+        """
+        Thread pool with an admission limit.
+
+        Args:
+            max_workers: Number of jobs that run at the same time
+            max_queue: Number of jobs allowed to wait for a free worker.
+                       Submissions beyond max_workers + max_queue are rejected
+                       with ExecutorSaturatedError (mapped to HTTP 429).
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inspector")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._rejected = 0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool and await its result."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> asyncio.Future:
+        """
+        Admit fn(*args, **kwargs) and return an awaitable for its result.
+
+        Admission is decided here, synchronously, so a caller that streams
+        its response can still answer 429 before sending anything.
+        """
+        return asyncio.wrap_future(self.submit_background(fn, *args, **kwargs))
+
+    def submit_background(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Admit fn(*args, **kwargs) as submit does, for work no request awaits
+        (e.g. background jobs); returns the concurrent.futures.Future.
+        """
+        with self._lock:
+            if self._admitted >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturatedError("Inference queue is full")
+            self._admitted += 1
+
+        try:
+            future = self._pool.submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+
+        # Release the slot when the work finishes, not when the caller stops
+        # waiting: a disconnected client must not free a slot that is still busy.
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self._admitted -= 1
+
+    def get_statistics(self) -> Dict:
+        """Current pool occupancy."""
+        with self._lock:
+            admitted = self._admitted
+            rejected = self._rejected
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(admitted, self.max_workers),
+            "queued": max(admitted - self.max_workers, 0),
+            "rejected": rejected,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
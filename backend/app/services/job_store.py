@@ -0,0 +1,324 @@
+"""
+Background analysis jobs.
+
+POST /jobs stores the upload, records the job and returns its id right away;
+a JobRunner then runs the same analyze_pdf / batch_analyze_zip bodies as the
+synchronous endpoints, on their bounded executor (so jobs count against the
+same worker and queue limits, and are refused with HTTP 429 alike), and writes
+status, progress and the final output into a JobStore, which GET
+/jobs/{job_id} reads.
+
+The in-memory store is private to one process. SQLiteJobStore keeps jobs in a
+local database file so every uvicorn worker can answer status requests for a
+job, whichever worker accepted and runs it.
+
+Finished jobs (completed or failed) are kept for retention_seconds after they
+finish, and at most max_retained of them; both stores drop the rest whenever
+a job is created or read. Queued and running jobs are never dropped.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from copy import deepcopy
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from app.services import analysis
+from app.services.executor import BoundedExecutor, ExecutorSaturatedError
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_FIELDS = ("kind", "filename", "status", "progress", "result", "error")
+FINISHED = (COMPLETED, FAILED)
+
+
+class JobStore(ABC):
+    """Job records: job_id → {kind, filename, status, progress, result, error, timestamps}."""
+
+    def __init__(self, retention_seconds: Optional[float] = None, max_retained: Optional[int] = None):
+        """
+        Args:
+            retention_seconds: Finished jobs are dropped this long after they
+                               finished; None keeps them
+            max_retained: Most finished jobs kept; the ones that finished
+                          first are dropped beyond it. None: no limit.
+        """
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+
+    @abstractmethod
+    def create(self, job_id: str, kind: str, filename: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        raise NotImplementedError
+
+
+def _new_record(job_id: str, kind: str, filename: str) -> Dict:
+    now = time.time()
+    return {
+        "job_id": job_id,
+        "kind": kind,
+        "filename": filename,
+        "status": QUEUED,
+        "progress": {"pages_done": 0, "files": {}},
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self, retention_seconds: Optional[float] = None, max_retained: Optional[int] = None):
+        super().__init__(retention_seconds, max_retained)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, kind: str, filename: str):
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = _new_record(job_id, kind, filename)
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            record = self._jobs[job_id]
+            record.update(deepcopy(fields))
+            record["updated_at"] = time.time()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._prune()
+            record = self._jobs.get(job_id)
+            return deepcopy(record) if record is not None else None
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        # Caller holds the lock
+        finished = sorted(
+            (record["updated_at"], job_id)
+            for job_id, record in self._jobs.items() if record["status"] in FINISHED
+        )
+        drop = 0
+        if self.retention_seconds is not None:
+            cutoff = time.time() - self.retention_seconds
+            drop = sum(1 for finished_at, _ in finished if finished_at < cutoff)
+        if self.max_retained is not None:
+            drop = max(drop, len(finished) - self.max_retained)
+        for _, job_id in finished[:drop]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore(JobStore):
+    def __init__(self, path: str, retention_seconds: Optional[float] = None, max_retained: Optional[int] = None):
+        """
+        Args:
+            path: Database file; created on first use. Every uvicorn worker
+                  pointing at the same file sees the same jobs.
+            retention_seconds, max_retained: As for JobStore
+        """
+        super().__init__(retention_seconds, max_retained)
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            # WAL lets status reads proceed while a worker writes progress
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " filename TEXT,"
+                " status TEXT NOT NULL,"
+                " progress TEXT,"
+                " result TEXT,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, updated_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation: safe across threads and processes
+        return sqlite3.connect(self.path, timeout=30)
+
+    def create(self, job_id: str, kind: str, filename: str):
+        record = _new_record(job_id, kind, filename)
+        with self._connect() as conn:
+            self._prune(conn)
+            conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, kind, filename, record["status"], json.dumps(record["progress"]),
+                    None, None, record["created_at"], record["updated_at"]
+                )
+            )
+
+    def update(self, job_id: str, **fields):
+        columns = [name for name in fields if name in _FIELDS]
+        values = [
+            json.dumps(fields[name]) if name in ("progress", "result") else fields[name]
+            for name in columns
+        ]
+        assignments = ", ".join(f"{name} = ?" for name in columns + ["updated_at"])
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                (*values, time.time(), job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            self._prune(conn)
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        for name in ("progress", "result"):
+            if record[name] is not None:
+                record[name] = json.loads(record[name])
+        return record
+
+    def delete(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def _prune(self, conn: sqlite3.Connection):
+        if self.retention_seconds is not None:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (*FINISHED, time.time() - self.retention_seconds)
+            )
+        if self.max_retained is not None:
+            conn.execute(
+                "DELETE FROM jobs WHERE job_id IN ("
+                " SELECT job_id FROM jobs WHERE status IN (?, ?)"
+                " ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (*FINISHED, self.max_retained)
+            )
+
+
+def create_job_store(
+    kind: str,
+    sqlite_path: str = None,
+    retention_seconds: Optional[float] = None,
+    max_retained: Optional[int] = None
+) -> JobStore:
+    """Build the store named in JOBS_STORE ("memory" or "sqlite")."""
+    if kind == "memory":
+        return InMemoryJobStore(retention_seconds, max_retained)
+    if kind == "sqlite":
+        return SQLiteJobStore(sqlite_path, retention_seconds, max_retained)
+    raise ValueError(f"Unknown job store: {kind}")
+
+
+class JobRunner:
+    def __init__(self, store: JobStore, executor: BoundedExecutor, upload_dir: str, progress_interval: float = 1.0):
+        """
+        Args:
+            store: Where job status, progress and results are recorded
+            executor: Runs the jobs; shared with the synchronous endpoints
+            upload_dir: Uploads wait here until their job runs
+            progress_interval: Seconds between progress writes for page
+                               events; a file starting, finishing or failing
+                               and the job's end are always written
+        """
+        self.store = store
+        self.executor = executor
+        self.progress_interval = progress_interval
+        self.upload_dir = Path(upload_dir)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+
+    def submit(self, kind: str, filename: str, upload_path: Path) -> str:
+        """
+        Record a job and queue it.
+
+        Args:
+            kind: "pdf" (like /analyze) or "zip" (like /batch-analyze)
+            filename: Uploaded file name
+            upload_path: The spooled upload, in upload_dir; the job
+                         deletes it when done
+
+        Returns:
+            The job id, also used for the annotated output directory
+
+        Raises:
+            ExecutorSaturatedError: The executor's queue is full; no job is
+                                    recorded
+        """
+        job_id = uuid.uuid4().hex
+
+        self.store.create(job_id, kind, filename)
+        try:
+            self.executor.submit_background(self._run, job_id, kind, filename, upload_path)
+        except ExecutorSaturatedError:
+            self.store.delete(job_id)
+            raise
+        return job_id
+
+    def _run(self, job_id: str, kind: str, filename: str, upload_path: Path):
+        progress = {"pages_done": 0, "files": {}}
+        last_write = time.monotonic()
+
+        def on_event(event: Dict):
+            nonlocal last_write
+            name = event["file"]
+            if event["event"] == "file_started":
+                progress["files"][name] = {"status": RUNNING, "pages_done": 0}
+            elif event["event"] == "page":
+                progress["files"].setdefault(name, {"status": RUNNING, "pages_done": 0})
+                progress["files"][name]["pages_done"] += 1
+                progress["pages_done"] += 1
+            elif event["event"] == "file_completed":
+                progress["files"][name]["status"] = COMPLETED
+            elif event["event"] == "file_failed":
+                progress["files"][name] = {
+                    **progress["files"].get(name, {"pages_done": 0}),
+                    "status": FAILED,
+                    "error": event["error"]
+                }
+            # Every write is a store round trip (a transaction for SQLite):
+            # pages only bring the status up to date every progress_interval
+            now = time.monotonic()
+            if event["event"] != "page" or now - last_write >= self.progress_interval:
+                self.store.update(job_id, progress=progress)
+                last_write = now
+
+        try:
+            self.store.update(job_id, status=RUNNING)
+            if kind == "pdf":
+                output = analysis.analyze_pdf(upload_path, filename, job_id=job_id, on_event=on_event)
+            else:
+                output = analysis.batch_analyze_zip(upload_path, filename, job_id=job_id, on_event=on_event)
+            self.store.update(job_id, status=COMPLETED, progress=progress, result=output)
+        except HTTPException as e:
+            self.store.update(job_id, status=FAILED, progress=progress, error=str(e.detail))
+        except Exception as e:
+            self.store.update(job_id, status=FAILED, progress=progress, error=f"Job failed: {e}")
+        finally:
+            try:
+                os.remove(upload_path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,104 @@
+"""
+Detection statistics.
+
+DetectionStatistics is a plain per-job tally: each /analyze, /batch-analyze
+or background job builds its own from the detections of its pages, so
+concurrent jobs never see (or reset) each other's numbers. It also counts
+the pages that skipped the models as blank (app.utils.page_triage).
+
+MetricsRegistry holds the process-wide cumulative counters and stage
+timings reported by /metrics. It is shared by every worker thread and
+guarded by a lock.
+"""
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Union
+
+from app.services.detections import Detections
+
+
+class DetectionStatistics:
+    def __init__(self):
+        self.total_detections = 0
+        self.class_statistics = Counter()
+        self.pages = 0
+        self.triaged_pages = 0
+
+    def add(self, detections: Union[Detections, List[Dict]], triaged: bool = False):
+        """Count the detections of one page; triaged pages were found blank and not inferred."""
+        detections = Detections.coerce(detections)
+        self.class_statistics.update(detections.class_counts())
+        self.total_detections += len(detections)
+        self.pages += 1
+        self.triaged_pages += triaged
+
+    def merge(self, other: "DetectionStatistics"):
+        self.total_detections += other.total_detections
+        self.class_statistics.update(other.class_statistics)
+        self.pages += other.pages
+        self.triaged_pages += other.triaged_pages
+
+    def to_dict(self) -> Dict:
+        return {
+            "total_detections": self.total_detections,
+            "class_statistics": dict(self.class_statistics),
+            "triage": {
+                "pages": self.pages,
+                "triaged": self.triaged_pages,
+                "rate": self.triaged_pages / self.pages if self.pages else 0.0
+            }
+        }
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Union[Detections, List[Dict]]]) -> "DetectionStatistics":
+        statistics = cls()
+        for detections in pages:
+            statistics.add(detections)
+        return statistics
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Thread-safe cumulative counters since process start."""
+        self._lock = threading.Lock()
+        self._pages = Counter()         # source ("inferred", "cached", "triaged") -> pages
+        self._detections = DetectionStatistics()
+        self._timings = {}              # stage -> [calls, total seconds]
+        self._counters = Counter()      # free-form counters, e.g. cascade gate rates
+
+    def record_page(self, detections: Union[Detections, List[Dict]], source: str = "inferred"):
+        """Count one page's detections; source tells inferred and cached pages apart."""
+        with self._lock:
+            self._pages[source] += 1
+            self._detections.add(detections, triaged=source == "triaged")
+
+    def record_timing(self, stage: str, seconds: float):
+        """Add one timed call of a pipeline stage, e.g. "preprocess" or "model:<name>"."""
+        with self._lock:
+            timing = self._timings.setdefault(stage, [0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+
+    def increment(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def get_statistics(self) -> Dict:
+        with self._lock:
+            return {
+                "pages": dict(self._pages),
+                "counters": dict(self._counters),
+                **self._detections.to_dict(),
+                "timings": {
+                    stage: {
+                        "calls": calls,
+                        "total_ms": total * 1000.0,
+                        "avg_ms": total * 1000.0 / calls
+                    }
+                    for stage, (calls, total) in self._timings.items()
+                }
+            }
+
+
+# Process-wide registry
+registry = MetricsRegistry()
@@ -0,0 +1,183 @@
+"""
+Export of the MODEL_CONFIGS weights to CPU inference runtimes.
+
+Run from the backend directory:
+    python -m app.services.model_export --formats onnx openvino
+    python -m app.services.model_export --formats onnx openvino --precisions int8 fp16
+
+Each .pt file gets its exports next to it (model.onnx, model_openvino_model/,
+model_int8.onnx, model_fp16_openvino_model/). Setting "backend" (and
+optionally "precision") on a model in MODEL_CONFIGS makes the inspector load
+the exported graph instead of the PyTorch weights. Exports use dynamic input
+shapes, so batching and the rectangular letterbox behave exactly as with
+PyTorch.
+
+Quantized variants are only loaded once app.services.evaluation has
+measured them against FP32 on a labeled page set and the accuracy loss is
+within QUANT_MAX_MAP50_DROP / QUANT_MAX_RECALL_DROP (see select_model_path).
+"""
+import argparse
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Values of the per-model "backend" option
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Precisions available per backend: dynamic INT8 through ONNX Runtime's
+# quantizer, FP16 through OpenVINO's compressed weights
+PRECISIONS = {
+    "torch": ("fp32",),
+    "onnx": ("fp32", "int8"),
+    "openvino": ("fp32", "fp16"),
+}
+
+
+def backend_model_path(model_path: str, backend: str, precision: str = "fp32") -> str:
+    """
+    Where the model for a backend lives, following the ultralytics export
+    naming: ./models/qrcode.pt → ./models/qrcode.onnx, ./models/qrcode_openvino_model/,
+    and for quantized variants ./models/qrcode_int8.onnx, ./models/qrcode_fp16_openvino_model/
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    if precision not in PRECISIONS[backend]:
+        raise ValueError(f"Precision {precision} is not available for backend {backend}")
+
+    path = Path(model_path)
+    stem = path.stem if precision == "fp32" else f"{path.stem}_{precision}"
+    if backend == "torch":
+        return str(path)
+    if backend == "onnx":
+        return str(path.with_name(f"{stem}.onnx"))
+    return str(path.with_name(f"{stem}_openvino_model"))
+
+
+def evaluation_report_path(variant_path: str) -> str:
+    """Evaluation results of a model variant are stored next to it."""
+    return f"{variant_path}.eval.json"
+
+
+def export_model(model_path: str, backend: str, imgsz: int, precision: str = "fp32") -> str:
+    """
+    Export one .pt file for a backend.
+
+    Args:
+        model_path: PyTorch weights
+        backend: "onnx" or "openvino"
+        imgsz: Reference input size; the exported graph accepts other sizes
+        precision: "fp32", "int8" (onnx) or "fp16" (openvino)
+
+    Returns:
+        Path of the exported model
+    """
+    from ultralytics import YOLO
+
+    if backend not in ("onnx", "openvino"):
+        raise ValueError(f"Nothing to export for backend: {backend}")
+    target = backend_model_path(model_path, backend, precision)
+
+    if precision == "int8":
+        return _quantize_onnx_int8(model_path, imgsz, target)
+
+    source = model_path
+    if precision == "fp16":
+        # ultralytics names the export after the weights file, so export a
+        # copy named after the variant
+        source = str(Path(model_path).with_name(f"{Path(model_path).stem}_fp16.pt"))
+        shutil.copyfile(model_path, source)
+
+    options = {"half": True} if precision == "fp16" else {}
+    try:
+        exported = YOLO(source).export(
+            format=backend,
+            imgsz=imgsz,
+            dynamic=True,          # Any batch size and page shape
+            simplify=True,
+            device="cpu",
+            **options
+        )
+    finally:
+        if source != model_path:
+            Path(source).unlink(missing_ok=True)
+    return str(exported)
+
+
+def _quantize_onnx_int8(model_path: str, imgsz: int, target: str) -> str:
+    """Dynamic INT8 quantization of the FP32 ONNX export (weights only, no calibration set)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    fp32_path = backend_model_path(model_path, "onnx")
+    if not Path(fp32_path).exists():
+        export_model(model_path, "onnx", imgsz)
+    quantize_dynamic(fp32_path, target, weight_type=QuantType.QUInt8)
+    return target
+
+
+def load_evaluation(variant_path: str) -> Optional[Dict]:
+    try:
+        with open(evaluation_report_path(variant_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def passes_accuracy_gate(report: Optional[Dict], max_map50_drop: float, max_recall_drop: float) -> bool:
+    """True when an evaluation report shows an acceptable loss against FP32."""
+    if report is None:
+        return False
+    delta = report["delta"]
+    return -delta["map50"] <= max_map50_drop and -delta["recall"] <= max_recall_drop
+
+
+def select_model_path(config: Dict, max_map50_drop: float, max_recall_drop: float) -> str:
+    """
+    Model file the inspector should load for a MODEL_CONFIGS entry.
+
+    A quantized "precision" is honoured only when its evaluation report
+    passes the accuracy gate; otherwise the FP32 model of the same backend
+    is used and a warning is logged.
+    """
+    backend = config.get("backend", "torch")
+    precision = config.get("precision", "fp32")
+    if precision == "fp32":
+        return backend_model_path(config["path"], backend)
+
+    variant_path = backend_model_path(config["path"], backend, precision)
+    report = load_evaluation(variant_path)
+    if passes_accuracy_gate(report, max_map50_drop, max_recall_drop):
+        return variant_path
+
+    reason = "no evaluation report" if report is None else f"accuracy delta {report['delta']}"
+    logger.warning(
+        "Not using %s for %s (%s); falling back to fp32",
+        variant_path, config.get("name", config["path"]), reason
+    )
+    return backend_model_path(config["path"], backend)
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.config import MODEL_CONFIGS, INFERENCE_IMGSZ
+
+    parser = argparse.ArgumentParser(description="Export MODEL_CONFIGS weights to ONNX / OpenVINO")
+    parser.add_argument("--formats", nargs="+", choices=("onnx", "openvino"), default=["onnx"])
+    parser.add_argument("--precisions", nargs="+", choices=("fp32", "int8", "fp16"), default=["fp32"],
+                        help="Combinations a backend does not support are skipped")
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    args = parser.parse_args(argv)
+
+    for config in MODEL_CONFIGS:
+        for backend in args.formats:
+            for precision in args.precisions:
+                if precision not in PRECISIONS[backend]:
+                    continue
+                exported = export_model(config["path"], backend, args.imgsz, precision)
+                print(f"{config.get('name', config['path'])}: {backend}/{precision} → {exported}")
+
+
+if __name__ == "__main__":
+    main()
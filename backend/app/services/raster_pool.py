@@ -0,0 +1,397 @@
+"""
+Multi-process PDF rasterization.
+
+PyMuPDF renders on a single core per document. RasterPool spreads the work
+over worker processes: each document is staged once to a temp file, and each
+worker opens it from that path and renders a range of pages. Pages come back
+in document order (pixels are handed back through shared memory), so the
+inference stage downstream sees the same stream as with in-process
+rendering. At most a small window of page ranges is in flight at a time,
+which keeps memory bounded.
+
+Documents may also be given as a path, which is then used as the staged
+copy instead of writing one. iter_pages only reads the file (e.g. an upload
+the job still owns); iter_documents takes it over (e.g. a PDF extracted
+from a ZIP) and deletes it once the document is rendered, so at most a
+window's worth of documents is on disk at once.
+
+If a worker dies (e.g. killed for memory), the document being waited on
+fails and the next task starts a new pool.
+
+Both may render below max_dimension (e.g. at the model input size, which is
+all inference uses); such pages carry the size of the max_dimension raster
+as RenderedPage.output_size, the space detections are reported in.
+"""
+from pathlib import Path
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Hashable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import fitz
+import numpy as np
+
+from app.utils.page_regions import PageRegion, RegionExtractor
+from app.utils.page_triage import PageTriage
+from app.utils.pdf_tools import PdfRenderError, RenderedPage, iter_pdf_pages, render_page_range
+
+# (key, page_index, page) for every page (page_index starts at 1),
+# (key, None, None) once a document is complete,
+# (key, None, PdfRenderError) if a document fails; no more events follow for it
+RasterEvent = Tuple[Hashable, Optional[int], Union[RenderedPage, PdfRenderError, None]]
+
+# PDF bytes, or the path of a PDF file the pool takes over
+PdfSource = Union[bytes, str, Path]
+
+
+class RasterPool:
+    def __init__(
+        self,
+        workers: int,
+        chunk_pages: int = 4,
+        min_pool_pages: int = 8,
+        max_dimension: int = 2048,
+        triage: Optional[PageTriage] = None,
+        regions: Optional[RegionExtractor] = None
+    ):
+        """
+        Args:
+            workers: Number of rendering processes. 0 renders in the calling
+                     thread (no processes are started).
+            chunk_pages: Pages per task handed to a worker
+            min_pool_pages: Single documents shorter than this render in the
+                            calling thread, where the hand-off costs more
+                            than it saves
+            max_dimension: Maximum rendered width/height in pixels
+            triage: Blank page checks run on every rendered page (sets
+                    RenderedPage.triage); None skips them
+            regions: Extracts the ROI crops of every page that is not blank
+                     (sets RenderedPage.regions); None leaves pages whole
+        """
+        self.workers = workers
+        self.chunk_pages = chunk_pages
+        self.min_pool_pages = min_pool_pages
+        self.max_dimension = max_dimension
+        self.triage = triage
+        self.regions = regions
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def iter_pages(self, source: PdfSource, render_dimension: Optional[int] = None) -> Iterator[RenderedPage]:
+        """
+        Render one document (bytes, or a path that is left in place),
+        yielding its pages in order.
+
+        Args:
+            source: The document
+            render_dimension: Longest page side to render, if below
+                              max_dimension
+
+        Raises:
+            PdfRenderError: Immediately if the document cannot be opened,
+                            or while iterating if a page fails to render
+        """
+        if self.workers <= 0:
+            return iter_pdf_pages(source, *self._dimensions(render_dimension), self.triage, self.regions)
+
+        owned = isinstance(source, bytes)
+        staged = self._stage(source, owned)
+        path, page_count = staged
+        if page_count < self.min_pool_pages:
+            if owned:
+                _remove(path)
+            return iter_pdf_pages(source, *self._dimensions(render_dimension), self.triage, self.regions)
+        return self._iter_single(staged, owned, render_dimension)
+
+    def _iter_single(self, staged, owned: bool, render_dimension: Optional[int]) -> Iterator[RenderedPage]:
+        for _, page_index, page in self._iter_staged([(None, staged)], render_dimension, remove_staged=owned):
+            if isinstance(page, PdfRenderError):
+                raise page
+            if page is not None:
+                yield page
+
+    def iter_documents(
+        self,
+        documents: Iterable[Tuple[Hashable, PdfSource]],
+        render_dimension: Optional[int] = None
+    ) -> Iterator[RasterEvent]:
+        """
+        Render several documents, e.g. the PDFs of a ZIP. With workers > 0,
+        different documents (and page ranges of the same document) render in
+        parallel; events still arrive in document and page order. Documents
+        are pulled from the iterable only as the window has room for them;
+        files given by path are deleted once rendered. render_dimension is
+        as for iter_pages.
+        """
+        if self.workers <= 0:
+            return self._iter_documents_in_process(documents, render_dimension)
+
+        def staged_documents():
+            for key, source in documents:
+                try:
+                    yield key, self._stage(source)
+                except PdfRenderError as e:
+                    yield key, e
+
+        return self._iter_staged(staged_documents(), render_dimension)
+
+    def _dimensions(self, render_dimension: Optional[int]) -> Tuple[int, Optional[int]]:
+        # (max_dimension, output_dimension) for the renderer
+        if render_dimension is None or render_dimension >= self.max_dimension:
+            return self.max_dimension, None
+        return render_dimension, self.max_dimension
+
+    def _iter_documents_in_process(self, documents, render_dimension: Optional[int]) -> Iterator[RasterEvent]:
+        dimensions = self._dimensions(render_dimension)
+        for key, source in documents:
+            try:
+                for page_index, page in enumerate(iter_pdf_pages(source, *dimensions, self.triage, self.regions), start=1):
+                    yield key, page_index, page
+            except PdfRenderError as e:
+                yield key, None, e
+                continue
+            finally:
+                if not isinstance(source, bytes):
+                    _remove(str(source))
+            yield key, None, None
+
+    def _iter_staged(
+        self,
+        staged_documents,
+        render_dimension: Optional[int],
+        remove_staged: bool = True
+    ) -> Iterator[RasterEvent]:
+        dimensions = self._dimensions(render_dimension)
+        window = self.workers * 2
+        tasks = self._plan(staged_documents)
+        pending = deque()   # (task, future or None, pool it was submitted to)
+        failed = set()
+
+        def submit(task):
+            _, _, path, start, stop = task
+            return self._submit(
+                _render_chunk_to_shared_memory, path, start, stop, *dimensions, self.triage, self.regions
+            )
+
+        def fill():
+            # Keep the workers busy with the next page ranges, in order
+            while sum(1 for _, future, _ in pending if future is not None) < window:
+                task = next(tasks, None)
+                if task is None:
+                    return
+                if task[0] != "chunk":
+                    pending.append((task, None, None))
+                elif task[1] not in failed:
+                    pending.append((task, *submit(task)))
+
+        try:
+            fill()
+            while pending:
+                task, future, pool = pending.popleft()
+                kind, key = task[0], task[1]
+
+                if kind == "error":
+                    yield key, None, task[2]
+                elif kind == "chunk":
+                    if key in failed:
+                        _discard(future)
+                        fill()
+                        continue
+                    try:
+                        pages = _pages_from_shared_memory(self._result(task, future, pool, submit))
+                    except Exception as e:
+                        failed.add(key)
+                        fill()
+                        # Keeps subclasses such as OversizedPdfError
+                        yield key, None, e if isinstance(e, PdfRenderError) else PdfRenderError(str(e))
+                        continue
+                    fill()
+                    for offset, page in enumerate(pages):
+                        yield key, task[3] + offset + 1, page
+                else:
+                    if remove_staged:
+                        _remove(task[2])
+                    if key not in failed:
+                        yield key, None, None
+                fill()
+        finally:
+            for task, future, _ in pending:
+                if future is not None:
+                    _discard(future)
+                if task[0] == "end" and remove_staged:
+                    _remove(task[2])
+
+    def _result(self, task, future: Future, pool: ProcessPoolExecutor, submit) -> list:
+        """
+        The shared memory blocks of a chunk. A worker that dies (killed for
+        memory, or a crash in MuPDF) breaks the whole pool: the chunk that is
+        waited on at the time fails its document, and the pool is replaced.
+        Chunks that were only caught up in it are rendered again on the new
+        pool.
+        """
+        while True:
+            try:
+                return future.result()
+            except BrokenProcessPool as e:
+                if pool is self._pool:
+                    self._reset_pool(pool)
+                    raise PdfRenderError(f"Rendering process died: {e}") from e
+                future, pool = submit(task)
+
+    def _plan(self, staged_documents):
+        for key, staged in staged_documents:
+            if isinstance(staged, PdfRenderError):
+                yield ("error", key, staged)
+                continue
+            path, page_count = staged
+            for start in range(0, page_count, self.chunk_pages):
+                yield ("chunk", key, path, start, min(start + self.chunk_pages, page_count))
+            yield ("end", key, path)
+
+    def _stage(self, source: PdfSource, owned: bool = True) -> Tuple[str, int]:
+        """
+        Write the document to a temp file the workers can open (a path is
+        used as it is, and deleted on failure if owned); return (path, page
+        count).
+        """
+        if isinstance(source, bytes):
+            fd, path = tempfile.mkstemp(prefix="raster-", suffix=".pdf")
+        else:
+            fd, path = None, str(source)
+        try:
+            if fd is not None:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(source)
+            with fitz.open(path, filetype="pdf") as pdf:
+                return path, len(pdf)
+        except Exception as e:
+            if owned:
+                _remove(path)
+            raise PdfRenderError(str(e)) from e
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn, not fork: the parent holds torch/CUDA state and threads
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._pool
+
+    def _submit(self, fn, *args) -> Tuple[Future, ProcessPoolExecutor]:
+        # (future, pool); a pool found broken is replaced once
+        pool = self._get_pool()
+        try:
+            return pool.submit(fn, *args), pool
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            pool = self._get_pool()
+            return pool.submit(fn, *args), pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        # Drop a broken pool; the next _get_pool starts a new one
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _render_chunk_to_shared_memory(
+    pdf_path: str,
+    start: int,
+    stop: int,
+    max_dimension: int,
+    output_dimension: Optional[int] = None,
+    triage: Optional[PageTriage] = None,
+    regions: Optional[RegionExtractor] = None
+):
+    """
+    Worker side: render a page range and hand the pixels over in shared memory
+    blocks instead of pickling several MB per page through the result pipe.
+    The parent takes ownership of (and unlinks) every block. ROI crops are
+    small and travel with the block's description.
+    """
+    blocks = []
+    try:
+        for page in render_page_range(pdf_path, start, stop, max_dimension, output_dimension, triage, regions):
+            shm = shared_memory.SharedMemory(create=True, size=page.array.nbytes)
+            np.ndarray(page.array.shape, dtype=np.uint8, buffer=shm.buf)[:] = page.array
+            # Not this process's to clean up once handed over
+            resource_tracker.unregister(shm._name, "shared_memory")
+            shm.close()
+            blocks.append((shm.name, page.array.shape, page.output_size, page.triage, page.regions))
+    except BaseException:
+        # A page failed: nobody will take the blocks of the ones before it
+        _unlink_blocks(blocks)
+        raise
+    return blocks
+
+
+def _pages_from_shared_memory(blocks: list) -> List[RenderedPage]:
+    pages = []
+    try:
+        for block in blocks:
+            pages.append(_page_from_shared_memory(*block))
+    finally:
+        _unlink_blocks(blocks[len(pages) + 1:])
+    return pages
+
+
+def _page_from_shared_memory(
+    name: str,
+    shape,
+    output_size: Tuple[int, int],
+    triage: Optional[str],
+    regions: Optional[List[PageRegion]]
+) -> RenderedPage:
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        array = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return RenderedPage(array, output_size, triage, regions)
+
+
+def _unlink_blocks(blocks: list):
+    for name, *_ in blocks:
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        shm.unlink()
+
+
+def _release_blocks(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        _unlink_blocks(future.result())
+
+
+def _discard(future: Future):
+    """
+    Give up on a chunk. One that already started cannot be cancelled; its
+    blocks are unlinked once it finishes, as no one else ever will (workers
+    hand their ownership over).
+    """
+    if not future.cancel():
+        future.add_done_callback(_release_blocks)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,365 @@
+"""
+Content-addressed cache for inference results.
+
+Documents are keyed by a hash of the PDF bytes and pages by a hash of the
+rendered raster, both combined with a fingerprint of everything that changes
+model output: the contents of the model file the inspector loads (the
+weights, or the exported graph select_model_path picks, along with the
+evaluation report its accuracy gate read), confidence thresholds, imgsz and
+render settings. Replacing a model file, re-exporting one or re-running its
+evaluation changes the fingerprint, so stale entries simply stop matching
+and age out of the backends.
+"""
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.model_export import backend_model_path, evaluation_report_path, select_model_path
+from app.utils.page_regions import PageRegion
+
+
+class CacheBackend(ABC):
+    """Byte-budgeted key → JSON value store."""
+
+    name = "backend"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_statistics(self) -> Dict:
+        raise NotImplementedError
+
+
+class MemoryLRUBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_bytes: int):
+        """
+        In-process LRU. Values are stored serialized, so the byte budget is
+        exact and callers can never mutate a cached entry.
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> serialized bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(data)
+
+    def set(self, key: str, value: Any):
+        data = json.dumps(value).encode()
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_statistics(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+class DiskBackend(CacheBackend):
+    name = "disk"
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        One JSON file per entry under directory. Least recently used files
+        are deleted once the total size exceeds max_bytes; recency survives
+        restarts through the files' modification times.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Rebuild the LRU index from what is already on disk
+        files = sorted(self.directory.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+        self._index = OrderedDict((p.stem, p.stat().st_size) for p in files)
+        self._bytes = sum(self._index.values())
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                if self._index.pop(key, None) is not None:
+                    self._bytes = sum(self._index.values())
+            return None
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return json.loads(data)
+
+    def set(self, key: str, value: Any):
+        data = json.dumps(value).encode()
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and self._index:
+                evicted_key, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                try:
+                    self._path(evicted_key).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            for key in self._index:
+                try:
+                    self._path(key).unlink()
+                except FileNotFoundError:
+                    pass
+            self._index.clear()
+            self._bytes = 0
+
+    def get_statistics(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+class ResultCache:
+    def __init__(
+        self,
+        backends: List[CacheBackend],
+        model_configs: List[Dict],
+        imgsz: int,
+        render_settings: Dict = None,
+        max_map50_drop: float = 0.01,
+        max_recall_drop: float = 0.02
+    ):
+        """
+        Args:
+            backends: Tiers to consult in order, e.g. [memory, disk]. A hit in
+                      a later tier is copied into the earlier ones.
+            model_configs: MODEL_CONFIGS; model files and thresholds go
+                           into the fingerprint
+            imgsz: Inference image size
+            render_settings: Anything else that changes the raster (e.g.
+                             max_dimension)
+            max_map50_drop: Largest mAP@0.5 loss vs. FP32 for which a
+                            quantized variant is accepted; as passed to
+                            the inspector, to fingerprint the model it loads
+            max_recall_drop: Largest recall loss vs. FP32 for which a
+                             quantized variant is accepted; likewise
+        """
+        self.backends = backends
+        self.model_configs = model_configs
+        self.imgsz = imgsz
+        self.render_settings = render_settings or {}
+        self.max_map50_drop = max_map50_drop
+        self.max_recall_drop = max_recall_drop
+
+        self._lock = threading.Lock()
+        self._weights_stats = None
+        self._fingerprint = None
+        self.hits = {"document": 0, "page": 0}
+        self.misses = {"document": 0, "page": 0}
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Hash of the model configuration. Model files are only re-hashed (and
+        the model file to load only re-selected) when the size or mtime of
+        one that could be loaded, or of an evaluation report, changes; when
+        the fingerprint does, the memory tier is dropped since none of its
+        entries can match any more.
+        """
+        stats = tuple(_path_stat(path) for config in self.model_configs for path in _model_files(config))
+        with self._lock:
+            if stats != self._weights_stats:
+                digest = hashlib.sha256()
+                for config in self.model_configs:
+                    model_path = select_model_path(config, self.max_map50_drop, self.max_recall_drop)
+                    digest.update(Path(model_path).name.encode())
+                    digest.update(_path_sha256(model_path).encode())
+                    if config.get("precision", "fp32") != "fp32":
+                        variant_path = backend_model_path(
+                            config["path"], config.get("backend", "torch"), config["precision"]
+                        )
+                        digest.update(_path_sha256(evaluation_report_path(variant_path)).encode())
+                    digest.update(json.dumps(
+                        {k: v for k, v in config.items() if k not in ("path", "name", "batch_size")},
+                        sort_keys=True
+                    ).encode())
+                digest.update(json.dumps({"imgsz": self.imgsz, **self.render_settings}, sort_keys=True).encode())
+
+                fingerprint = digest.hexdigest()[:16]
+                if self._fingerprint not in (None, fingerprint):
+                    for backend in self.backends:
+                        if isinstance(backend, MemoryLRUBackend):
+                            backend.clear()
+                self._fingerprint = fingerprint
+                self._weights_stats = stats
+            return self._fingerprint
+
+    def document_key(self, pdf_bytes: bytes) -> str:
+        return self.document_key_for_digest(hashlib.sha256(pdf_bytes).hexdigest())
+
+    def document_key_for_digest(self, sha256_hex: str) -> str:
+        """document_key of a document hashed elsewhere, e.g. while it was written to disk."""
+        return f"doc-{self.fingerprint}-{sha256_hex}"
+
+    def page_key(
+        self,
+        array: np.ndarray,
+        output_size: Optional[Tuple[int, int]] = None,
+        regions: Optional[List[PageRegion]] = None
+    ) -> str:
+        """
+        Key of a page's detections. Besides the raster, covers everything
+        they depend on: the output_size they are scaled to and, in ROI mode,
+        the regions the models ran on instead of the raster.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((array.shape, output_size)).encode())
+        digest.update(np.ascontiguousarray(array).data)
+        for region in regions or ():
+            digest.update(repr((region.array.shape, region.x, region.y, region.scale)).encode())
+            digest.update(np.ascontiguousarray(region.array).data)
+        return f"page-{self.fingerprint}-{digest.hexdigest()}"
+
+    def get(self, key: str) -> Optional[Any]:
+        kind = "document" if key.startswith("doc-") else "page"
+        for index, backend in enumerate(self.backends):
+            value = backend.get(key)
+            if value is not None:
+                for earlier in self.backends[:index]:
+                    earlier.set(key, value)
+                with self._lock:
+                    self.hits[kind] += 1
+                return value
+        with self._lock:
+            self.misses[kind] += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        for backend in self.backends:
+            backend.set(key, value)
+
+    def get_statistics(self) -> Dict:
+        with self._lock:
+            hits = dict(self.hits)
+            misses = dict(self.misses)
+        return {
+            "fingerprint": self._fingerprint,
+            "hits": hits,
+            "misses": misses,
+            "backends": {backend.name: backend.get_statistics() for backend in self.backends}
+        }
+
+
+def _model_files(config: Dict) -> List[str]:
+    """Every file select_model_path may load or read for a MODEL_CONFIGS entry."""
+    backend = config.get("backend", "torch")
+    precision = config.get("precision", "fp32")
+    paths = [config["path"], backend_model_path(config["path"], backend)]
+    if precision != "fp32":
+        variant_path = backend_model_path(config["path"], backend, precision)
+        paths += [variant_path, evaluation_report_path(variant_path)]
+    return paths
+
+
+def _path_stat(path: str):
+    """(size, mtime) of a file, or of every file in a directory (e.g. an OpenVINO export)."""
+    if os.path.isdir(path):
+        return tuple(
+            (str(file.relative_to(path)), *_path_stat(str(file)))
+            for file in sorted(Path(path).rglob("*")) if file.is_file()
+        )
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _path_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for file in sorted(Path(path).rglob("*")):
+            if file.is_file():
+                digest.update(str(file.relative_to(path)).encode())
+                digest.update(_path_sha256(str(file)).encode())
+        return digest.hexdigest()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return "missing"
+    return digest.hexdigest()
@@ -0,0 +1,82 @@
+"""
+Shared fixtures for the API tests.
+
+The real YOLO weights are not available in CI, so the router tests swap the
+global inspector for a fake that sleeps like a model would.
+"""
+import time
+
+import fitz
+import pytest
+
+from app.services.detections import Detections
+from app.services.document_inspector import _as_pil_copy
+
+
+def make_pdf(num_pages: int = 1, text: str = "Document") -> bytes:
+    """Build a small in-memory PDF with some text on every page."""
+    doc = fitz.open()
+    for index in range(num_pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 72), f"{text} page {index + 1}", fontsize=14)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class FakeInspector:
+    """Stand-in for DocumentInspector that spends `delay` seconds per forward pass."""
+
+    def __init__(self, delay: float = 0.0, detections=None):
+        self.delay = delay
+        self.detections = detections or []   # Reported for every page
+        self.calls = 0
+
+    def detect_image(self, page):
+        return self.detect_images([page])[0]
+
+    def detect_images(self, pages, batch_size=None, annotate=True):
+        time.sleep(self.delay)
+        self.calls += 1
+        return [
+            (Detections.from_dicts(self.detections), self.annotate(page, Detections.empty()) if annotate else None)
+            for page in pages
+        ]
+
+    def annotate(self, page, detections):
+        return _as_pil_copy(page)
+
+
+@pytest.fixture(scope="session")
+def tiny_model_path(tmp_path_factory):
+    """
+    Randomly initialised YOLOv8n weights, so inference runs without real models.
+    Conv weights are re-initialised so the head produces varied boxes.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    torch.manual_seed(0)
+    model = YOLO("yolov8n.yaml")
+    for module in model.model.modules():
+        if isinstance(module, torch.nn.Conv2d):
+            torch.nn.init.kaiming_normal_(module.weight)
+    for head in model.model.model[-1].cv3:
+        head[-1].bias.data.fill_(0.0)
+
+    path = tmp_path_factory.mktemp("models") / "tiny.pt"
+    model.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def fake_inspector(monkeypatch):
+    from app.services import analysis
+
+    inspector = FakeInspector()
+    monkeypatch.setattr(analysis, "_inspector", inspector)
+    # Results from earlier tests must not short-circuit inference
+    monkeypatch.setattr(analysis, "result_cache", None)
+    # Neither may triage: make_pdf pages hold a single line of text
+    monkeypatch.setattr(analysis.raster_pool, "triage", None)
+    return inspector
@@ -0,0 +1,94 @@
+"""
+AnnotationRenderer: fonts loaded once, labels scaled to the page, drawing on
+a copy of the page buffer and JPEG encoding on the pool.
+"""
+import io
+
+import numpy as np
+from PIL import Image, ImageFont
+
+from app.services import annotation_renderer
+from app.services.annotation_renderer import AnnotationRenderer
+from app.services.detections import Detections
+from app.services.metrics import MetricsRegistry
+
+STAMP_GREEN = (0, 255, 0)
+
+
+def _stamp(box, confidence=0.9):
+    return Detections(np.array([box], dtype=np.float32), np.array([confidence]), np.array([0]), ("stamp",))
+
+
+def test_font_is_loaded_once(monkeypatch):
+    loads = []
+    truetype = ImageFont.truetype
+
+    def counting_truetype(font, size, *args, **kwargs):
+        loads.append(font)
+        return truetype(font, size, *args, **kwargs)
+
+    monkeypatch.setattr(ImageFont, "truetype", counting_truetype)
+    renderer = AnnotationRenderer(jpeg_workers=0, font_candidates=("missing.ttf", "DejaVuSans-Bold.ttf"))
+    page = np.full((600, 400, 3), 255, dtype=np.uint8)
+
+    renderer.draw(page, _stamp([50, 100, 150, 200]))
+    first_page = len(loads)
+    for confidence in (0.5, 0.7, 0.9):
+        renderer.draw(page, _stamp([60, 110, 160, 210], confidence))
+
+    assert loads.count("missing.ttf") <= 1
+    assert len(loads) == first_page
+
+
+def test_label_and_line_scale_with_page_size():
+    assert AnnotationRenderer.style(1448, 2048) == (32, 5)
+    assert AnnotationRenderer.style(4096, 2896) == (64, 10)
+    assert AnnotationRenderer.style(724, 1024) == (16, 2)
+    assert AnnotationRenderer.style(100, 80)[0] == annotation_renderer.MIN_LABEL_FONT_SIZE
+
+
+def test_draw_outlines_box_on_a_copy():
+    renderer = AnnotationRenderer(jpeg_workers=0)
+    page = np.full((2048, 1448, 3), 255, dtype=np.uint8)
+
+    annotated = renderer.draw(page, _stamp([200, 400, 600, 800]))
+
+    assert (page == 255).all()
+    # 5 px frame inside the box edges, interior untouched
+    assert tuple(annotated[600, 200]) == STAMP_GREEN and tuple(annotated[600, 204]) == STAMP_GREEN
+    assert tuple(annotated[600, 205]) == (255, 255, 255)
+    assert tuple(annotated[796, 400]) == STAMP_GREEN and tuple(annotated[795, 400]) == (255, 255, 255)
+    # Label right above the box: background and white text
+    label = annotated[350:400, 200:400]
+    assert (label == STAMP_GREEN).all(axis=-1).mean() > 0.4
+    assert (label == 255).all(axis=-1).any()
+    # Nothing outside box and label
+    assert (annotated[:340] == 255).all() and (annotated[810:] == 255).all()
+
+
+def test_boxes_at_page_edges_are_clipped():
+    renderer = AnnotationRenderer(jpeg_workers=0)
+    page = np.zeros((300, 200, 3), dtype=np.uint8)
+
+    annotated = renderer.draw(page, _stamp([-20, 0, 250, 40]))
+
+    assert annotated.shape == page.shape
+    assert tuple(annotated[20, 0]) == STAMP_GREEN
+
+
+def test_jpegs_encode_on_pool_and_stages_are_timed(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(annotation_renderer, "registry", registry)
+    renderer = AnnotationRenderer(jpeg_workers=2)
+    pages = [np.full((400, 300, 3), value, dtype=np.uint8) for value in (0, 128, 255)]
+
+    annotated = renderer.draw_batch(pages, [_stamp([10, 50, 100, 150])] * len(pages))
+    futures = [renderer.submit_jpeg(array) for array in annotated]
+    images = [Image.open(io.BytesIO(future.result())) for future in futures]
+    renderer.shutdown()
+
+    assert [image.size for image in images] == [(300, 400)] * 3
+    assert [image.format for image in images] == ["JPEG"] * 3
+    timings = registry.get_statistics()["timings"]
+    assert timings["annotate"]["calls"] == 3
+    assert timings["jpeg_encode"]["calls"] == 3
@@ -0,0 +1,125 @@
+"""
+Annotated output modes: lazy pages are drawn on first request and cached,
+"none" writes nothing; vector PDFs keep the original pages.
+"""
+import io
+
+import fitz
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.routers import analyze
+from app.services import analysis
+from app.services.annotations import write_vector_pdf
+from app.services.detections import Detections
+from app.tests.conftest import make_pdf
+
+client = TestClient(app)
+
+STAMP = {"class": "stamp", "confidence": 0.9, "bbox": [10.0, 10.0, 50.0, 50.0], "model": "fake"}
+
+
+def test_lazy_annotations_render_on_first_request(fake_inspector, monkeypatch):
+    fake_inspector.detections = [STAMP]
+    drawn = []
+    draw = analysis.annotation_renderer.draw
+
+    def counting_draw(page, detections):
+        drawn.append(len(detections))
+        return draw(page, detections)
+
+    monkeypatch.setattr(analysis.annotation_renderer, "draw", counting_draw)
+    monkeypatch.setattr(analyze, "ANNOTATED_PDF_STYLE", "raster")
+
+    response = client.post(
+        "/analyze?annotations=lazy", files={"pdf_file": ("doc.pdf", make_pdf(2), "application/pdf")}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    job_dir = analysis.STATIC_DIR / body["job_id"]
+
+    # Nothing drawn while the job ran
+    assert drawn == []
+    assert not list(job_dir.glob("*.jpg")) and not (job_dir / "annotated.pdf").exists()
+    assert body["pages"][1]["annotated_image_url"] == f"/annotated/{body['job_id']}/pages/2"
+
+    first = client.get(body["pages"][1]["annotated_image_url"])
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(first.content)).size == tuple(body["pages"][1]["page_size"].values())
+    assert drawn == [1]
+
+    # Second request is served from disk
+    assert client.get(body["pages"][1]["annotated_image_url"]).content == first.content
+    assert drawn == [1]
+
+    pdf = client.get(body["annotated_pdf_url"])
+    assert pdf.status_code == 200
+    with fitz.open(stream=pdf.content, filetype="pdf") as doc:
+        assert doc.page_count == 2
+    assert drawn == [1, 1]   # Only the page not requested before
+
+    assert client.get(f"/annotated/{body['job_id']}/pages/3").status_code == 404
+    assert client.get("/annotated/../pages/1").status_code == 404
+
+
+def test_no_annotations(fake_inspector):
+    response = client.post(
+        "/analyze?annotations=none", files={"pdf_file": ("doc.pdf", make_pdf(1), "application/pdf")}
+    )
+    body = response.json()
+
+    assert body["pages"][0]["annotated_image_url"] is None
+    assert body["annotated_pdf_url"] is None
+    assert not (analysis.STATIC_DIR / body["job_id"]).exists()
+
+
+def _green_pixels(page):
+    """(row, column) of stamp-green pixels on the rendered page (72 dpi, so points)."""
+    pixmap = page.get_pixmap()
+    pixels = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)
+    return np.argwhere((pixels[..., 1] > 200) & (pixels[..., 0] < 80) & (pixels[..., 2] < 80))
+
+
+@pytest.mark.parametrize("rotation", [0, 90])
+def test_vector_pdf_maps_raster_boxes_to_page(tmp_path, rotation):
+    doc = fitz.open(stream=make_pdf(2), filetype="pdf")
+    doc[1].set_rotation(rotation)
+    source = doc.tobytes()
+    displayed = doc[1].rect
+    doc.close()
+
+    # Page 2 rendered at 2x; the box is 100x50 pt at (50, 100) on the displayed page
+    page_size = {"width": int(displayed.width * 2), "height": int(displayed.height * 2)}
+    detections = Detections(np.array([[100, 200, 300, 300]]), np.array([0.9]), np.array([0]), ("stamp",))
+    output = tmp_path / "annotated.pdf"
+    write_vector_pdf(source, [({"width": 595, "height": 842}, Detections.empty()), (page_size, detections)], output)
+
+    with fitz.open(output) as annotated:
+        assert len(_green_pixels(annotated[0])) == 0
+        assert "stamp 90%" in annotated[1].get_text()
+        green = _green_pixels(annotated[1])
+
+    # Box frame where the detection is, label right above it
+    assert abs(green[:, 1].min() - 50) <= 2 and abs(green[:, 1].max() - 150) <= 2
+    assert abs(green[:, 0].max() - 150) <= 2
+    assert 100 - 14 <= green[:, 0].min() < 100
+
+
+def test_eager_vector_pdf_keeps_original_pages(fake_inspector, monkeypatch):
+    fake_inspector.detections = [STAMP]
+    monkeypatch.setattr(analysis, "ANNOTATED_PDF_STYLE", "vector")
+
+    response = client.post(
+        "/analyze?annotations=eager", files={"pdf_file": ("doc.pdf", make_pdf(3), "application/pdf")}
+    )
+    body = response.json()
+    pdf = (analysis.STATIC_DIR / body["job_id"] / "annotated.pdf").read_bytes()
+
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        assert doc.page_count == 3
+        assert "Document page 2" in doc[1].get_text()   # Text layer kept
+        assert all(len(_green_pixels(page)) for page in doc)
@@ -0,0 +1,40 @@
+"""
+Exported models must give the same detections as the PyTorch weights.
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.services.document_inspector import DocumentInspector
+from app.services.model_export import backend_model_path, export_model
+from app.tests.test_batching import _pages, _sorted_boxes
+
+
+def test_backend_model_path():
+    assert backend_model_path("./models/qrcode.pt", "torch") == "models/qrcode.pt"
+    assert backend_model_path("./models/qrcode.pt", "onnx") == "models/qrcode.onnx"
+    assert backend_model_path("./models/qrcode.pt", "openvino") == "models/qrcode_openvino_model"
+    with pytest.raises(ValueError):
+        backend_model_path("./models/qrcode.pt", "tensorrt")
+
+
+def test_onnx_backend_matches_torch(tiny_model_path):
+    pytest.importorskip("onnxruntime")
+    exported = export_model(tiny_model_path, "onnx", imgsz=320)
+    assert Path(exported) == Path(backend_model_path(tiny_model_path, "onnx"))
+
+    config = {"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny", "batch_size": 2}
+    torch_inspector = DocumentInspector([config], imgsz=320)
+    onnx_inspector = DocumentInspector([{**config, "backend": "onnx"}], imgsz=320)
+    pages = _pages(3)
+
+    expected = torch_inspector.detect_images(pages, annotate=False)
+    actual = onnx_inspector.detect_images(pages, annotate=False)
+
+    assert any(detections for detections, _ in expected)
+    for (want, _), (got, _) in zip(expected, actual):
+        assert len(got) == len(want)
+        assert sorted(got.classes) == sorted(want.classes)
+        assert np.allclose(_sorted_boxes(got), _sorted_boxes(want), atol=1.0)
+        assert np.allclose(np.sort(got.confidence), np.sort(want.confidence), atol=1e-3)
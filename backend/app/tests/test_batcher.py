@@ -0,0 +1,81 @@
+"""
+Tests for the request-coalescing inference scheduler.
+"""
+import threading
+import time
+
+import pytest
+
+from app.services.batcher import InferenceBatcher
+
+
+class RecordingDetector:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batch_sizes = []
+
+    def __call__(self, pages):
+        time.sleep(self.delay)
+        self.batch_sizes.append(len(pages))
+        return [[{"class": "stamp", "page": page}] for page in pages]
+
+
+def test_results_return_to_their_callers():
+    detector = RecordingDetector()
+    batcher = InferenceBatcher(detector, max_batch_size=4, max_wait_ms=5)
+
+    results = batcher.infer(list(range(10)))
+
+    assert [r[0]["page"] for r in results] == list(range(10))
+    assert max(detector.batch_sizes) <= 4
+
+
+def test_concurrent_callers_share_batches():
+    detector = RecordingDetector(delay=0.05)
+    batcher = InferenceBatcher(detector, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def client(client_id):
+        results[client_id] = batcher.infer([(client_id, 0), (client_id, 1)])
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for client_id, detections in results.items():
+        assert [d[0]["page"] for d in detections] == [(client_id, 0), (client_id, 1)]
+    # 8 pages from 4 requests should need fewer than 4 forward passes
+    assert len(detector.batch_sizes) < 4
+
+    stats = batcher.get_statistics()
+    assert stats["pages_dispatched"] == 8
+    assert 0 < stats["avg_fill_ratio"] <= 1
+    assert stats["wait_ms"]["max"] >= stats["wait_ms"]["p50"]
+
+
+def test_errors_propagate_to_every_caller():
+    def failing(pages):
+        raise RuntimeError("CUDA out of memory")
+
+    batcher = InferenceBatcher(failing, max_batch_size=4, max_wait_ms=1)
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        batcher.infer([1, 2])
+    # The dispatcher keeps serving after a failed batch
+    with pytest.raises(RuntimeError):
+        batcher.infer([3])
+
+
+def test_missing_results_fail_every_caller():
+    def short(pages):
+        return [[] for _ in pages[1:]]
+
+    batcher = InferenceBatcher(short, max_batch_size=4, max_wait_ms=50)
+
+    futures = batcher.submit([1, 2, 3])
+    for future in futures:
+        # Would block forever for the page zip() dropped
+        with pytest.raises(RuntimeError, match="2 results for 3 pages"):
+            future.result(timeout=5)
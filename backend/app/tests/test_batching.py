@@ -0,0 +1,122 @@
+"""
+Batched inference must give the same detections as the per-page loop.
+"""
+import numpy as np
+from PIL import Image
+
+from app.services.detections import Detections
+from app.services.document_inspector import DocumentInspector
+from app.services.metrics import registry
+
+
+def _pages(count: int):
+    rng = np.random.default_rng(0)
+    return [
+        Image.fromarray(rng.integers(0, 255, (640, 480, 3), dtype=np.uint8))
+        for _ in range(count)
+    ]
+
+
+def _sorted_boxes(detections):
+    boxes = Detections.coerce(detections).xyxy
+    return boxes[np.lexsort(boxes.T[::-1])]
+
+
+def test_detect_images_matches_per_page(tiny_model_path):
+    config = [{"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny", "batch_size": 2}]
+    inspector = DocumentInspector(config, imgsz=320)
+    pages = _pages(5)
+
+    single = [inspector.detect_image(page)[0] for page in pages]
+    batched = inspector.detect_images(pages, annotate=False)
+
+    assert len(batched) == len(pages)
+    assert any(single)
+    for expected, (detections, annotated) in zip(single, batched):
+        assert annotated is None
+        assert len(detections) == len(expected)
+        # Equal-confidence boxes may come back in a different order
+        assert sorted(detections.classes) == sorted(expected.classes)
+        assert np.allclose(_sorted_boxes(detections), _sorted_boxes(expected), atol=1.0)
+
+
+def test_detect_images_empty(tiny_model_path):
+    inspector = DocumentInspector([{"path": tiny_model_path}], imgsz=320)
+
+    assert inspector.detect_images([]) == []
+
+
+def _reference(model_path, pages, conf, imgsz):
+    """What the models return when each one preprocesses the pages itself."""
+    from ultralytics import YOLO
+
+    results = YOLO(model_path).predict(
+        source=[np.array(page) for page in pages], imgsz=imgsz, conf=conf, iou=0.5, verbose=False
+    )
+    return [DocumentInspector._extract_detections(result, "tiny") for result in results]
+
+
+def test_shared_preprocessing_matches_per_model_predict(tiny_model_path):
+    config = [{"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny", "batch_size": 4}]
+    inspector = DocumentInspector(config, imgsz=320)
+    rng = np.random.default_rng(1)
+    mixed = _pages(2) + [Image.fromarray(rng.integers(0, 255, (500, 700, 3), dtype=np.uint8))]
+
+    # Same-shape pages get minimal padding, mixed shapes a square letterbox
+    for pages in (_pages(3), mixed):
+        expected = _reference(tiny_model_path, pages, 0.5, 320)
+        actual = [detections for detections, _ in inspector.detect_images(pages, annotate=False)]
+        assert any(expected)
+        for want, got in zip(expected, actual):
+            assert len(got) == len(want)
+            assert np.allclose(_sorted_boxes(got), _sorted_boxes(want), atol=1.0)
+
+
+def test_concurrent_models_match_sequential(tiny_model_path):
+    config = [
+        {"path": tiny_model_path, "conf_threshold": 0.5, "name": "first"},
+        {"path": tiny_model_path, "conf_threshold": 0.7, "name": "second"},
+    ]
+    pages = _pages(3)
+    sequential = DocumentInspector(config, imgsz=320).detect_images(pages, annotate=False)
+    concurrent = DocumentInspector(config, imgsz=320, concurrent_models=True).detect_images(pages, annotate=False)
+
+    for (want, _), (got, _) in zip(sequential, concurrent):
+        # Detections stay grouped by model, in config order
+        assert got.models == want.models
+        assert np.allclose(_sorted_boxes(got), _sorted_boxes(want), atol=1e-3)
+
+
+def test_cascade_gates_the_full_pass(tiny_model_path):
+    config = [{"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny"}]
+    pages = _pages(3)
+    baseline = DocumentInspector(config, imgsz=320).detect_images(pages, annotate=False)
+
+    # A permissive pre-pass lets every page through: same result as no cascade,
+    # also at a pre-pass size that is not a multiple of the stride
+    for cascade_imgsz in (160, 150):
+        open_gate = DocumentInspector(config, imgsz=320, cascade_imgsz=cascade_imgsz, cascade_conf=0.0)
+        for (want, _), (got, _) in zip(baseline, open_gate.detect_images(pages, annotate=False)):
+            assert np.allclose(_sorted_boxes(got), _sorted_boxes(want), atol=1e-3)
+
+    # Nothing passes the pre-pass: the full pass never runs
+    closed_gate = DocumentInspector(config, imgsz=320, cascade_imgsz=160, cascade_conf=0.99)
+    full_passes = registry.get_statistics()["timings"]["model:tiny"]["calls"]
+    assert all(not detections for detections, _ in closed_gate.detect_images(pages, annotate=False))
+    assert registry.get_statistics()["timings"]["model:tiny"]["calls"] == full_passes
+
+
+def test_imgsz_is_rounded_up_to_the_stride(tiny_model_path):
+    config = [{"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny", "batch_size": 4}]
+    inspector = DocumentInspector(config, imgsz=300)
+    rng = np.random.default_rng(1)
+    mixed = _pages(2) + [Image.fromarray(rng.integers(0, 255, (500, 700, 3), dtype=np.uint8))]
+
+    # The predictor rounds 300 up to 320 itself when given the pages
+    for pages in (_pages(3), mixed):
+        expected = _reference(tiny_model_path, pages, 0.5, 300)
+        actual = [detections for detections, _ in inspector.detect_images(pages, annotate=False)]
+        assert any(expected)
+        for want, got in zip(expected, actual):
+            assert len(got) == len(want)
+            assert np.allclose(_sorted_boxes(got), _sorted_boxes(want), atol=1.0)
@@ -0,0 +1,82 @@
+"""
+Load test for the execution layer: concurrent requests must not queue behind
+each other on the event loop, and a saturated pool must answer 429.
+"""
+import asyncio
+import time
+
+import httpx
+
+from app.main import app
+from app.routers import analyze
+from app.services import analysis
+from app.services.batcher import InferenceBatcher
+from app.services.executor import BoundedExecutor
+from app.tests.conftest import make_pdf
+
+
+async def _post_pdf(client: httpx.AsyncClient, pdf_bytes: bytes):
+    files = {"pdf_file": ("doc.pdf", pdf_bytes, "application/pdf")}
+    return await client.post("/analyze", files=files)
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_health_not_blocked_by_inference(fake_inspector, monkeypatch):
+    fake_inspector.delay = 0.5
+    monkeypatch.setattr(analyze, "executor", BoundedExecutor(max_workers=2, max_queue=2))
+    pdf_bytes = make_pdf(2)
+
+    async def scenario():
+        async with _client() as client:
+            job = asyncio.create_task(_post_pdf(client, pdf_bytes))
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            health = await client.get("/health")
+            health_latency = time.perf_counter() - start
+            response = await job
+            return health, health_latency, response
+
+    health, health_latency, response = asyncio.run(scenario())
+
+    assert health.status_code == 200
+    assert health_latency < 0.3
+    assert response.status_code == 200
+    assert len(response.json()["pages"]) == 2
+
+
+def test_concurrent_requests_overlap(fake_inspector, monkeypatch):
+    fake_inspector.delay = 0.4
+    monkeypatch.setattr(analyze, "executor", BoundedExecutor(max_workers=4, max_queue=0))
+    # Inference is serialised on the models, so the requests overlap by
+    # sharing a forward pass
+    monkeypatch.setattr(analysis, "batcher", InferenceBatcher(analysis._detect_batch, max_wait_ms=200))
+    pdf_bytes = make_pdf(1)
+
+    async def scenario():
+        async with _client() as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[_post_pdf(client, pdf_bytes) for _ in range(4)])
+            return responses, time.perf_counter() - start
+
+    responses, elapsed = asyncio.run(scenario())
+
+    assert all(r.status_code == 200 for r in responses)
+    # Serial execution would take 4 x 0.4s
+    assert elapsed < 1.2
+
+
+def test_saturated_executor_returns_429(fake_inspector, monkeypatch):
+    fake_inspector.delay = 0.4
+    monkeypatch.setattr(analyze, "executor", BoundedExecutor(max_workers=1, max_queue=0))
+    pdf_bytes = make_pdf(1)
+
+    async def scenario():
+        async with _client() as client:
+            return await asyncio.gather(*[_post_pdf(client, pdf_bytes) for _ in range(3)])
+
+    statuses = sorted(r.status_code for r in asyncio.run(scenario()))
+
+    assert statuses == [200, 429, 429]
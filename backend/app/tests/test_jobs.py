@@ -0,0 +1,181 @@
+"""
+Tests for background jobs: submit, poll, and the shared SQLite store.
+"""
+import io
+import time
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import jobs
+from app.services import job_store
+from app.services.executor import BoundedExecutor
+from app.services.job_store import InMemoryJobStore, JobRunner, JobStore, SQLiteJobStore, create_job_store
+from app.tests.conftest import make_pdf
+
+client = TestClient(app)
+
+
+def _wait_for(job_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = client.get(f"/jobs/{job_id}").json()
+        if body["status"] in ("completed", "failed"):
+            return body
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _use_runner(monkeypatch, store, tmp_path, executor=None, progress_interval=0.0):
+    executor = executor or BoundedExecutor(max_workers=1, max_queue=8)
+    runner = JobRunner(store, executor, upload_dir=str(tmp_path / "uploads"), progress_interval=progress_interval)
+    monkeypatch.setattr(jobs, "job_runner", runner)
+    return runner
+
+
+def test_pdf_job_reports_progress_and_result(fake_inspector, monkeypatch, tmp_path):
+    fake_inspector.delay = 0.2
+    _use_runner(monkeypatch, InMemoryJobStore(), tmp_path)
+
+    response = client.post("/jobs", files={"file": ("doc.pdf", make_pdf(3), "application/pdf")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}").json()["status"] in ("queued", "running")
+
+    body = _wait_for(job_id)
+    assert body["status"] == "completed"
+    assert body["progress"]["pages_done"] == 3
+    assert body["progress"]["files"]["doc.pdf"] == {"status": "completed", "pages_done": 3}
+    # Same shape as /analyze, under the job's id
+    assert body["result"]["job_id"] == job_id
+    assert len(body["result"]["pages"]) == 3
+
+
+class _CountingStore(InMemoryJobStore):
+    def __init__(self):
+        super().__init__()
+        self.progress_writes = 0
+
+    def update(self, job_id, **fields):
+        self.progress_writes += "progress" in fields
+        super().update(job_id, **fields)
+
+
+@pytest.mark.parametrize("interval, writes", [(0.0, 1 + 5 + 1 + 1), (3600.0, 1 + 1 + 1)])
+def test_page_progress_writes_are_throttled(interval, writes, fake_inspector, monkeypatch, tmp_path):
+    store = _CountingStore()
+    _use_runner(monkeypatch, store, tmp_path, progress_interval=interval)
+
+    job_id = client.post("/jobs", files={"file": ("doc.pdf", make_pdf(5), "application/pdf")}).json()["job_id"]
+    body = _wait_for(job_id)
+
+    # file_started, each page, file_completed and the final state; pages
+    # are skipped within the interval but the final state is complete
+    assert store.progress_writes == writes
+    assert body["progress"]["files"]["doc.pdf"] == {"status": "completed", "pages_done": 5}
+
+
+def test_zip_job_records_failed_files(fake_inspector, monkeypatch, tmp_path):
+    _use_runner(monkeypatch, InMemoryJobStore(), tmp_path)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.pdf", make_pdf(2))
+        zf.writestr("broken.pdf", b"not a pdf")
+
+    job_id = client.post("/jobs", files={"file": ("batch.zip", archive.getvalue(), "application/zip")}).json()["job_id"]
+
+    body = _wait_for(job_id)
+    assert body["status"] == "completed"
+    assert body["progress"]["files"]["a.pdf"]["status"] == "completed"
+    assert body["progress"]["files"]["broken.pdf"]["status"] == "failed"
+    assert set(body["result"]["result"]["a.pdf"]) == {"page_1", "page_2"}
+
+
+def test_failed_job_and_unknown_job(fake_inspector, monkeypatch, tmp_path):
+    _use_runner(monkeypatch, InMemoryJobStore(), tmp_path)
+
+    job_id = client.post("/jobs", files={"file": ("bad.zip", b"not a zip", "application/zip")}).json()["job_id"]
+    body = _wait_for(job_id)
+    assert body["status"] == "failed"
+    assert "Invalid ZIP file" in body["error"]
+
+    assert client.get("/jobs/does-not-exist").status_code == 404
+    assert client.post("/jobs", files={"file": ("notes.txt", b"x", "text/plain")}).status_code == 400
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    writer = SQLiteJobStore(path)
+    reader = SQLiteJobStore(path)   # e.g. another uvicorn worker
+
+    writer.create("job1", "pdf", "doc.pdf")
+    assert reader.get("job1")["status"] == "queued"
+
+    writer.update("job1", status="completed", progress={"pages_done": 1, "files": {}}, result={"pages": [1]})
+    record = reader.get("job1")
+    assert record["status"] == "completed"
+    assert record["progress"]["pages_done"] == 1
+    assert record["result"] == {"pages": [1]}
+    assert reader.get("missing") is None
+
+
+def test_incomplete_store_fails_on_creation():
+    class NoDelete(JobStore):
+        def create(self, job_id, kind, filename):
+            pass
+
+        def update(self, job_id, **fields):
+            pass
+
+        def get(self, job_id):
+            return None
+
+    with pytest.raises(TypeError, match="delete"):
+        NoDelete()
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_finished_jobs_are_pruned(kind, tmp_path, monkeypatch):
+    store = create_job_store(kind, str(tmp_path / "jobs.sqlite3"), retention_seconds=60, max_retained=2)
+    now = [1000.0]
+    monkeypatch.setattr(job_store.time, "time", lambda: now[0])
+
+    for index in range(4):
+        store.create(f"done{index}", "pdf", "doc.pdf")
+        now[0] += 1
+        store.update(f"done{index}", status="completed" if index % 2 else "failed", result={"pages": []})
+    store.create("running", "pdf", "doc.pdf")
+    store.update("running", status="running")
+
+    # Beyond max_retained, the ones that finished first go
+    assert [store.get(f"done{index}") is not None for index in range(4)] == [False, False, True, True]
+
+    # After the retention time, every finished job goes; unfinished ones stay
+    now[0] += 61
+    assert store.get("done3") is None
+    assert store.get("running")["status"] == "running"
+
+
+def test_jobs_share_the_executor_limits(fake_inspector, monkeypatch, tmp_path):
+    fake_inspector.delay = 0.3
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    runner = _use_runner(monkeypatch, InMemoryJobStore(), tmp_path, executor)
+
+    first = client.post("/jobs", files={"file": ("doc.pdf", make_pdf(2), "application/pdf")})
+    assert first.status_code == 202
+    assert executor.get_statistics()["running"] == 1
+
+    refused = client.post("/jobs", files={"file": ("doc.pdf", make_pdf(2), "application/pdf")})
+    assert refused.status_code == 429
+    assert refused.headers["Retry-After"]
+    # Nothing is left behind for the refused job
+    assert len(list(runner.upload_dir.iterdir())) <= 1
+    assert len(runner.store._jobs) == 1
+
+    assert _wait_for(first.json()["job_id"])["status"] == "completed"
+    deadline = time.monotonic() + 5.0
+    while list(runner.upload_dir.iterdir()) and time.monotonic() < deadline:
+        time.sleep(0.05)   # The job deletes its upload after recording the result
+    assert list(runner.upload_dir.iterdir()) == []
@@ -61,7 +61,7 @@ def test_multiple_models():
     # Check detection format
     if detections:
         print(f"✓ Detection format check:")
-        for i, det in enumerate(detections[:3]):  # Show first 3
+        for i, det in enumerate(detections.to_dicts()[:3]):  # Show first 3
             print(f"  - Detection {i+1}: class={det['class']}, confidence={det['confidence']:.2f}")
 
 
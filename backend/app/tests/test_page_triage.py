@@ -0,0 +1,103 @@
+"""
+Blank pages are triaged while rendering and skip the models; pages with
+anything a stamp, signature or QR code could be part of are not.
+"""
+import fitz
+import numpy as np
+import pytest
+
+from app.services import analysis
+from app.utils.page_triage import PageTriage, ink_coverage
+from app.utils.pdf_tools import iter_pdf_pages
+
+STAMP = {"class": "stamp", "confidence": 0.9, "bbox": [10.0, 10.0, 50.0, 50.0], "model": "fake"}
+
+
+def _add_scan(page, pixels: np.ndarray):
+    # A full-page raster image, like a scanner produces
+    height, width, _ = pixels.shape
+    pixmap = fitz.Pixmap(fitz.csRGB, width, height, np.ascontiguousarray(pixels).tobytes(), False)
+    page.insert_image(page.rect, pixmap=pixmap)
+
+
+def make_pages(*kinds: str) -> bytes:
+    doc = fitz.open()
+    for kind in kinds:
+        page = doc.new_page(width=595, height=842)
+        if kind == "note":
+            page.insert_text((200, 400), "This page intentionally left blank", fontsize=12)
+        elif kind == "text":
+            for line in range(30):
+                page.insert_text((60, 80 + line * 20), "Clause lorem ipsum dolor sit amet " * 2, fontsize=9)
+        elif kind == "line":
+            page.draw_line((300, 700), (500, 700), color=(0, 0, 0), width=0.5)
+        elif kind == "annot":
+            page.add_rect_annot(fitz.Rect(300, 650, 500, 750))
+        elif kind == "scan_blank":
+            pixels = np.full((842, 595, 3), 245, dtype=np.uint8)
+            pixels[100, 100] = pixels[500, 300] = 0   # Dust
+            _add_scan(page, pixels)
+        elif kind == "scan_qr":
+            pixels = np.full((842, 595, 3), 245, dtype=np.uint8)
+            pixels[700:730, 450:480] = 0   # About 1 cm
+            _add_scan(page, pixels)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.mark.parametrize("kind, expected", [
+    ("blank", "empty"),
+    ("note", "empty"),
+    ("text", None),
+    ("line", None),
+    ("annot", None),
+    ("scan_blank", "no_ink"),
+    ("scan_qr", None),
+])
+def test_triage(kind, expected):
+    (page,) = iter_pdf_pages(make_pages(kind), 1280, triage=PageTriage())
+    assert page.triage == expected
+
+
+def test_checks_can_be_switched_off():
+    pdf_bytes = make_pages("blank", "scan_blank")
+    assert [page.triage for page in iter_pdf_pages(pdf_bytes, triage=PageTriage(max_text_chars=None))] == [
+        "no_ink", "no_ink"
+    ]
+    assert [page.triage for page in iter_pdf_pages(pdf_bytes, triage=PageTriage(max_ink_coverage=None))] == [
+        "empty", None
+    ]
+    assert [page.triage for page in iter_pdf_pages(pdf_bytes)] == [None, None]
+
+
+def test_ink_coverage_keeps_thin_strokes():
+    array = np.full((1280, 905, 3), 255, dtype=np.uint8)
+    array[641, 100:700] = 0   # One pixel high, off the sampled rows
+
+    exact = ink_coverage(array)
+    assert exact == pytest.approx(150 / (320 * 226))
+    # The early exit only ever answers "above the limit"
+    assert ink_coverage(array, limit=0.0005) == exact
+    array[::8, ::8] = 0
+    assert ink_coverage(array, limit=0.0005) > 0.0005
+
+
+def test_triaged_pages_skip_inference(fake_inspector, monkeypatch):
+    monkeypatch.setattr(analysis.raster_pool, "triage", PageTriage())
+    fake_inspector.detections = [STAMP]
+    seen = []
+    detect_images = fake_inspector.detect_images
+
+    def record(pages, *args, **kwargs):
+        seen.extend(pages)
+        return detect_images(pages, *args, **kwargs)
+
+    monkeypatch.setattr(fake_inspector, "detect_images", record)
+
+    output = analysis.analyze_pdf(make_pages("text", "blank", "scan_blank", "line"), "doc.pdf", annotations="none")
+
+    assert len(seen) == 2
+    assert [len(page["detections"]) for page in output["pages"]] == [1, 0, 0, 1]
+    assert output["statistics"]["triage"] == {"pages": 4, "triaged": 2, "rate": 0.5}
+    assert output["statistics"]["total_detections"] == 2
@@ -0,0 +1,109 @@
+"""
+Streaming page pipeline: memory stays bounded by a constant number of pages
+and the outputs match the old materialize-everything behaviour.
+"""
+import gc
+import io
+import weakref
+import zipfile
+
+import fitz
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.config import PIPELINE_MAX_INFLIGHT_PAGES
+from app.main import app
+from app.services import analysis
+from app.tests.conftest import make_pdf
+from app.utils.pdf_tools import StreamingPdfWriter, iter_pdf_pages
+
+client = TestClient(app)
+
+
+class LivePageCounter:
+    """Wraps a page iterator factory and records how many rendered pages are alive at once."""
+
+    def __init__(self, iter_pages):
+        self.iter_pages = iter_pages
+        self.alive = 0
+        self.peak = 0
+        self.rendered = 0
+
+    def __call__(self, pdf_bytes, *args):
+        return self._track(self.iter_pages(pdf_bytes, *args))
+
+    def _track(self, pages):
+        for page in pages:
+            gc.collect()
+            self.alive += 1
+            self.rendered += 1
+            self.peak = max(self.peak, self.alive)
+            weakref.finalize(page, self._released)
+            yield page
+            del page
+
+    def _released(self):
+        self.alive -= 1
+
+
+def test_analyze_memory_bounded_by_inflight_pages(fake_inspector, monkeypatch):
+    counter = LivePageCounter(analysis.raster_pool.iter_pages)
+    monkeypatch.setattr(analysis.raster_pool, "iter_pages", counter)
+    num_pages = PIPELINE_MAX_INFLIGHT_PAGES * 4
+
+    response = client.post("/analyze", files={"pdf_file": ("long.pdf", make_pdf(num_pages), "application/pdf")})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [p["page_index"] for p in body["pages"]] == list(range(1, num_pages + 1))
+    assert counter.rendered == num_pages
+    assert counter.peak <= PIPELINE_MAX_INFLIGHT_PAGES + 2
+
+    annotated_pdf = analysis.STATIC_DIR / body["job_id"] / "annotated.pdf"
+    with fitz.open(annotated_pdf) as doc:
+        assert len(doc) == num_pages
+
+
+def test_batch_analyze_keeps_file_order_and_errors(fake_inspector):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.pdf", make_pdf(3))
+        zf.writestr("broken.pdf", b"not a pdf")
+        zf.writestr("b.pdf", make_pdf(2))
+
+    response = client.post("/batch-analyze", files={"zip_file": ("docs.zip", archive.getvalue(), "application/zip")})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert list(body["result"]) == ["a.pdf", "broken.pdf", "b.pdf"]
+    assert list(body["result"]["a.pdf"]) == ["page_1", "page_2", "page_3"]
+    assert "error" in body["result"]["broken.pdf"]
+    assert body["files_processed"] == 2
+
+
+def test_streaming_pdf_writer(tmp_path):
+    jpeg = io.BytesIO()
+    Image.new("RGB", (120, 80), "red").save(jpeg, format="JPEG")
+
+    path = tmp_path / "out.pdf"
+    with StreamingPdfWriter(path) as writer:
+        for _ in range(3):
+            writer.add_jpeg(jpeg.getvalue(), 120, 80)
+
+    with fitz.open(path) as doc:
+        assert len(doc) == 3
+        assert doc[0].rect == fitz.Rect(0, 0, 120, 80)
+        assert doc[2].get_pixmap().pixel(60, 40)[0] > 200
+
+
+def test_rendered_page_is_a_view_over_the_pixmap():
+    page = next(iter_pdf_pages(make_pdf(1)))
+
+    width, height = page.size
+    assert page.array.shape == (height, width, 3)
+    assert page.array.dtype == "uint8"
+    assert not page.array.flags["OWNDATA"]
+
+    image = page.image
+    assert image.mode == "RGB" and image.size == page.size
+    assert image.getpixel((0, 0)) == tuple(page.array[0, 0])
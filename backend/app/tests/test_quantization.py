@@ -0,0 +1,111 @@
+"""
+Tests for the quantized-variant evaluation harness and the accuracy gate.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.services.evaluation import compare_variant, evaluate_model, score
+from app.services.model_export import (
+    backend_model_path,
+    evaluation_report_path,
+    export_model,
+    select_model_path,
+)
+from app.tests.test_batching import _pages
+
+
+def _det(cls, bbox, confidence=0.9):
+    return {"class": cls, "bbox": bbox, "confidence": confidence}
+
+
+def test_score_map_and_recall():
+    labels = [[_det("stamp", [0, 0, 10, 10])], [_det("stamp", [20, 20, 40, 40])]]
+
+    perfect = score(labels, labels, ["stamp"], conf_threshold=0.5)
+    assert perfect["map50"] == pytest.approx(1.0)
+    assert perfect["recall"] == 1.0
+
+    # Second box found only below the threshold: in the AP curve, not in recall
+    partial = [[_det("stamp", [0, 0, 10, 10])], [_det("stamp", [21, 21, 40, 40], confidence=0.1)]]
+    result = score(partial, labels, ["stamp"], conf_threshold=0.5)
+    assert result["map50"] == pytest.approx(1.0)
+    assert result["recall"] == 0.5
+
+    # A wrong box ranked first halves precision at the first hit
+    noisy = [[_det("stamp", [50, 50, 60, 60], 0.95), _det("stamp", [0, 0, 10, 10])], []]
+    result = score(noisy, labels, ["stamp"], conf_threshold=0.5)
+    assert result["map50"] == pytest.approx(0.25)
+    assert result["recall"] == 0.5
+
+
+def _write_report(variant_path: str, map50_delta: float, recall_delta: float):
+    Path(evaluation_report_path(variant_path)).write_text(
+        json.dumps({"delta": {"map50": map50_delta, "recall": recall_delta}})
+    )
+
+
+def test_accuracy_gate_selects_variant(tmp_path):
+    config = {"path": str(tmp_path / "qrcode.pt"), "backend": "onnx", "precision": "int8"}
+    fp32 = backend_model_path(config["path"], "onnx")
+    int8 = backend_model_path(config["path"], "onnx", "int8")
+    assert int8.endswith("qrcode_int8.onnx")
+
+    # Never evaluated
+    assert select_model_path(config, 0.01, 0.02) == fp32
+
+    _write_report(int8, map50_delta=-0.05, recall_delta=0.0)
+    assert select_model_path(config, 0.01, 0.02) == fp32
+
+    _write_report(int8, map50_delta=-0.005, recall_delta=-0.01)
+    assert select_model_path(config, 0.01, 0.02) == int8
+
+    with pytest.raises(ValueError):
+        backend_model_path(config["path"], "torch", "int8")
+
+
+def test_int8_variant_evaluation(tiny_model_path):
+    pytest.importorskip("onnxruntime")
+    exported = export_model(tiny_model_path, "onnx", imgsz=320, precision="int8")
+    assert exported == backend_model_path(tiny_model_path, "onnx", "int8")
+
+    from app.services.document_inspector import DocumentInspector
+
+    # Label the pages with the FP32 model's most confident boxes (the random
+    # weights fire everywhere, so take a few per page)
+    config = {"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny"}
+    pages = _pages(3)
+    results = DocumentInspector([config], imgsz=320).detect_images(pages, annotate=False)
+    labels = [detections.select(np.argsort(-detections.confidence)[:5]) for detections, _ in results]
+
+    report = compare_variant(config, "onnx", "int8", pages, labels, imgsz=320)
+
+    assert report["baseline"]["recall"] == pytest.approx(1.0)
+    assert 0.0 <= report["candidate"]["map50"] <= 1.0
+    assert report["delta"]["recall"] == pytest.approx(report["candidate"]["recall"] - 1.0)
+    assert report["speedup"] > 0
+
+
+def test_evaluation_runs_the_inspector_path(tiny_model_path, monkeypatch):
+    from app.services.document_inspector import DocumentInspector
+
+    config = {"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny"}
+    pages = _pages(2)
+    results = DocumentInspector([config], imgsz=320).detect_images(pages, annotate=False)
+    labels = [detections for detections, _ in results]
+    assert sum(len(page) for page in labels)
+
+    preprocessed = []
+    preprocess = DocumentInspector._preprocess
+    monkeypatch.setattr(DocumentInspector, "_preprocess", lambda self, arrays, *args: (
+        preprocessed.append(len(arrays)) or preprocess(self, arrays, *args)
+    ))
+    report = evaluate_model(tiny_model_path, pages, labels, conf_threshold=0.5, imgsz=320)
+
+    # Pages are letterboxed by the inspector, once for the warm-up
+    assert preprocessed == [1, 2]
+    # ...so the production boxes are found exactly, ranked above the rest
+    assert report["recall"] == 1.0
+    assert report["map50"] == pytest.approx(1.0)
@@ -0,0 +1,147 @@
+"""
+Multi-process rasterization must produce the same pages, in the same order,
+as rendering in-process.
+"""
+import os
+import threading
+import time
+
+import fitz
+import numpy as np
+import pytest
+
+from app.services.raster_pool import RasterPool
+from app.tests.conftest import make_pdf
+from app.utils.pdf_tools import OversizedPdfError, PdfRenderError, iter_pdf_pages
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = RasterPool(workers=2, chunk_pages=3, min_pool_pages=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_iter_pages_matches_in_process(pool):
+    pdf_bytes = make_pdf(10)
+
+    expected = [page.array for page in iter_pdf_pages(pdf_bytes)]
+    rendered = [page.array for page in pool.iter_pages(pdf_bytes)]
+
+    assert len(rendered) == 10
+    for a, b in zip(rendered, expected):
+        assert np.array_equal(a, b)
+
+
+def test_iter_pages_fails_fast_on_invalid_pdf(pool):
+    with pytest.raises(PdfRenderError):
+        pool.iter_pages(b"not a pdf")
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_iter_documents_events_in_order(pool, workers):
+    raster = pool if workers else RasterPool(workers=0)
+    documents = [("a.pdf", make_pdf(4)), ("bad.pdf", b"garbage"), ("b.pdf", make_pdf(2))]
+
+    events = [
+        (key, page_index, type(page).__name__)
+        for key, page_index, page in raster.iter_documents(iter(documents))
+    ]
+
+    assert events == [
+        ("a.pdf", 1, "RenderedPage"), ("a.pdf", 2, "RenderedPage"),
+        ("a.pdf", 3, "RenderedPage"), ("a.pdf", 4, "RenderedPage"),
+        ("a.pdf", None, "NoneType"),
+        ("bad.pdf", None, "PdfRenderError"),
+        ("b.pdf", 1, "RenderedPage"), ("b.pdf", 2, "RenderedPage"),
+        ("b.pdf", None, "NoneType"),
+    ]
+
+
+def _pdf_with_oversized_page(num_pages: int, oversized_page: int) -> bytes:
+    # The image's dictionary claims far more pixels than MAX_IMAGE_PIXELS
+    doc = fitz.open(stream=make_pdf(num_pages), filetype="pdf")
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), False)
+    xref = doc[oversized_page - 1].insert_image(fitz.Rect(60, 60, 300, 240), pixmap=pixmap)
+    doc.xref_set_key(xref, "Width", "30000")
+    doc.xref_set_key(xref, "Height", "30000")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _shared_memory_blocks():
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+def _wait_for_shared_memory(expected, timeout: float = 10.0):
+    # Chunks still rendering when the consumer gave up release their blocks
+    # once they finish
+    deadline = time.monotonic() + timeout
+    while _shared_memory_blocks() != expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return _shared_memory_blocks()
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="Needs POSIX shared memory in /dev/shm")
+def test_failed_document_releases_shared_memory():
+    before = _shared_memory_blocks()
+    pool = RasterPool(workers=2, chunk_pages=2, min_pool_pages=2)
+    try:
+        with pytest.raises(OversizedPdfError):
+            list(pool.iter_pages(_pdf_with_oversized_page(16, 2)))
+        assert _wait_for_shared_memory(before) == before
+
+        events = list(pool.iter_documents([
+            ("bad.pdf", _pdf_with_oversized_page(16, 3)), ("good.pdf", make_pdf(6))
+        ]))
+        assert [(key, index) for key, index, _ in events] == (
+            [("bad.pdf", 1), ("bad.pdf", 2), ("bad.pdf", None)]
+            + [("good.pdf", index) for index in range(1, 7)] + [("good.pdf", None)]
+        )
+        assert _wait_for_shared_memory(before) == before
+
+        # A consumer that stops early
+        pages = pool.iter_pages(make_pdf(16))
+        next(pages)
+        pages.close()
+        assert _wait_for_shared_memory(before) == before
+    finally:
+        pool.shutdown()
+
+
+def _kill_workers(pool: RasterPool):
+    executor = pool._pool
+    for process in list(executor._processes.values()):
+        process.kill()
+        process.join()
+    # The executor notices on its own, as after an OOM kill
+    deadline = time.monotonic() + 10.0
+    while not executor._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return executor
+
+
+def test_pool_is_replaced_after_a_worker_dies():
+    pool = RasterPool(workers=1, chunk_pages=2, min_pool_pages=2, max_dimension=1024)
+    try:
+        assert len(list(pool.iter_pages(make_pdf(4)))) == 4
+        broken = _kill_workers(pool)
+
+        assert len(list(pool.iter_pages(make_pdf(4)))) == 4
+        assert pool._pool is not broken
+
+        # Dying while a chunk renders fails that document, and only it
+        pool.chunk_pages = 120
+        pages = pool.iter_pages(make_pdf(120))
+        killer = threading.Timer(0.15, _kill_workers, (pool,))
+        killer.start()
+        with pytest.raises(PdfRenderError, match="died"):
+            list(pages)
+        killer.join()
+
+        pool.chunk_pages = 2
+        events = list(pool.iter_documents([("a.pdf", make_pdf(4)), ("b.pdf", make_pdf(4))]))
+        assert [index for _, index, _ in events] == [1, 2, 3, 4, None] * 2
+    finally:
+        pool.shutdown()
@@ -0,0 +1,139 @@
+"""
+Pages only the models see are rendered at the model input size, while
+detections are still reported in full-raster coordinates; oversized pages
+are refused before rendering.
+"""
+import io
+import zipfile
+
+import fitz
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import analysis
+from app.services.raster_pool import RasterPool
+from app.tests.conftest import make_pdf
+from app.utils import pdf_tools
+from app.utils.pdf_tools import OversizedPdfError, iter_pdf_pages
+
+client = TestClient(app)
+
+BBOX = [10.0, 20.0, 50.0, 80.0]
+
+
+@pytest.fixture
+def seen_sizes(fake_inspector, monkeypatch):
+    """Sizes of the page arrays the models were given."""
+    sizes = []
+    detect_images = fake_inspector.detect_images
+
+    def record(pages, *args, **kwargs):
+        sizes.extend(page.size for page in pages)
+        return detect_images(pages, *args, **kwargs)
+
+    monkeypatch.setattr(fake_inspector, "detect_images", record)
+    fake_inspector.detections = [{"class": "stamp", "confidence": 0.9, "bbox": BBOX, "model": "fake"}]
+    return sizes
+
+
+def _pdf_with_image(width: int, height: int) -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pixmap.clear_with(200)
+    page.insert_image(fitz.Rect(60, 60, 300, 240), pixmap=pixmap)
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return data
+
+
+def test_output_size_is_the_full_raster():
+    pdf_bytes = make_pdf(2)
+    full = list(iter_pdf_pages(pdf_bytes, 2048))
+    small = list(iter_pdf_pages(pdf_bytes, 1280, output_dimension=2048))
+
+    assert [max(page.size) for page in small] == [1280, 1280]
+    assert [page.output_size for page in small] == [page.size for page in full]
+    assert [page.output_size for page in full] == [page.size for page in full]
+
+
+def test_raster_pool_keeps_output_size():
+    pdf_bytes = make_pdf(6)
+    pool = RasterPool(workers=2, chunk_pages=2, min_pool_pages=2)
+    try:
+        rendered = list(pool.iter_pages(pdf_bytes, render_dimension=1280))
+        events = list(pool.iter_documents([("a.pdf", pdf_bytes)], render_dimension=1280))
+    finally:
+        pool.shutdown()
+
+    expected = list(iter_pdf_pages(pdf_bytes, 1280, output_dimension=2048))
+    assert all(np.array_equal(a.array, b.array) for a, b in zip(rendered, expected))
+    assert [page.output_size for page in rendered] == [page.output_size for page in expected]
+    assert [page.output_size for _, index, page in events if index] == [page.output_size for page in expected]
+
+
+@pytest.mark.parametrize("annotations", ["none", "lazy"])
+def test_model_resolution_reports_full_raster_coordinates(seen_sizes, annotations):
+    full_width, full_height = next(iter_pdf_pages(make_pdf(1), analysis.RASTER_MAX_DIMENSION)).size
+
+    output = analysis.analyze_pdf(make_pdf(1), "doc.pdf", annotations=annotations)
+
+    (width, height), = seen_sizes
+    assert max(width, height) == analysis.INFERENCE_IMGSZ
+    page = output["pages"][0]
+    assert page["page_size"] == {"width": full_width, "height": full_height}
+    bbox = page["detections"][0]["bbox"]
+    assert bbox["x"] == pytest.approx(BBOX[0] * full_width / width, rel=1e-4)
+    assert bbox["height"] == pytest.approx((BBOX[3] - BBOX[1]) * full_height / height, rel=1e-4)
+
+
+def test_eager_annotations_render_the_full_raster(seen_sizes):
+    full_size = next(iter_pdf_pages(make_pdf(1), analysis.RASTER_MAX_DIMENSION)).size
+
+    output = analysis.analyze_pdf(make_pdf(1), "doc.pdf", annotations="eager")
+
+    assert seen_sizes == [full_size]
+    assert output["pages"][0]["detections"][0]["bbox"]["x"] == BBOX[0]
+
+
+def test_tiled_models_render_the_full_raster(seen_sizes, monkeypatch):
+    monkeypatch.setattr(analysis, "MODEL_CONFIGS", [{"name": "tiled", "tile_size": 640}])
+    full_size = next(iter_pdf_pages(make_pdf(1), analysis.RASTER_MAX_DIMENSION)).size
+
+    analysis.analyze_pdf(make_pdf(1), "doc.pdf", annotations="none")
+
+    assert seen_sizes == [full_size]
+
+
+def test_oversized_image_is_refused_before_rendering(monkeypatch):
+    monkeypatch.setattr(pdf_tools, "MAX_IMAGE_PIXELS", 3000 * 3000)
+    pdf_bytes = _pdf_with_image(4000, 3000)
+    rendered = []
+    monkeypatch.setattr(pdf_tools.RenderedPage, "from_pixmap", classmethod(lambda cls, *args: rendered.append(1)))
+
+    with pytest.raises(OversizedPdfError, match="4000x3000"):
+        list(iter_pdf_pages(pdf_bytes))
+    assert rendered == []
+
+
+def test_oversized_image_http_errors(fake_inspector, monkeypatch):
+    monkeypatch.setattr(pdf_tools, "MAX_IMAGE_PIXELS", 3000 * 3000)
+    large = _pdf_with_image(4000, 3000)
+
+    response = client.post("/analyze", files={"pdf_file": ("large.pdf", large, "application/pdf")})
+    assert response.status_code == 400
+    assert "very large images" in response.json()["detail"]
+
+    # The raster pool's workers do not see the lowered limit
+    monkeypatch.setattr(analysis, "raster_pool", RasterPool(workers=0))
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("large.pdf", large)
+        zf.writestr("small.pdf", make_pdf(1))
+    response = client.post("/batch-analyze", files={"zip_file": ("docs.zip", archive.getvalue(), "application/zip")})
+
+    result = response.json()["result"]
+    assert result["large.pdf"] == {"error": "PDF contains very large images and cannot be processed"}
+    assert "page_1" in result["small.pdf"]
@@ -0,0 +1,176 @@
+"""
+Tests for the content-addressed result cache and its use in the routers.
+"""
+import io
+import json
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import analysis
+from app.services.model_export import backend_model_path, evaluation_report_path
+from app.services.result_cache import CacheBackend, DiskBackend, MemoryLRUBackend, ResultCache
+from app.tests.conftest import make_pdf
+from app.utils.page_regions import PageRegion
+
+client = TestClient(app)
+
+
+def test_memory_lru_evicts_to_byte_budget():
+    backend = MemoryLRUBackend(max_bytes=100)
+    backend.set("a", "x" * 40)
+    backend.set("b", "y" * 40)
+    assert backend.get("a") == "x" * 40   # a is now most recent
+    backend.set("c", "z" * 40)
+
+    assert backend.get("b") is None
+    assert backend.get("a") is not None and backend.get("c") is not None
+    stats = backend.get_statistics()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 100
+    assert stats["misses"] == 1
+
+
+def test_disk_backend_persists_and_evicts(tmp_path):
+    backend = DiskBackend(tmp_path, max_bytes=1000)
+    backend.set("k1", [{"class": "stamp"}])
+
+    reopened = DiskBackend(tmp_path, max_bytes=1000)
+    assert reopened.get("k1") == [{"class": "stamp"}]
+
+    for i in range(50):
+        reopened.set(f"filler{i}", "x" * 50)
+    assert reopened.get_statistics()["bytes"] <= 1000
+    assert reopened.get("k1") is None
+
+
+def test_incomplete_backend_fails_on_creation():
+    class NoStatistics(CacheBackend):
+        def get(self, key):
+            return None
+
+        def set(self, key, value):
+            pass
+
+        def clear(self):
+            pass
+
+    with pytest.raises(TypeError, match="get_statistics"):
+        NoStatistics()
+
+
+def test_fingerprint_changes_with_weights(tmp_path):
+    weights = tmp_path / "model.pt"
+    weights.write_bytes(b"v1")
+    memory = MemoryLRUBackend(1 << 20)
+    cache = ResultCache([memory], [{"path": str(weights), "conf_threshold": 0.5}], imgsz=1280)
+    page = np.zeros((4, 4, 3), dtype=np.uint8)
+
+    key = cache.page_key(page)
+    cache.set(key, [])
+    assert cache.get(cache.page_key(page)) == []
+
+    weights.write_bytes(b"v2 - retrained")
+    assert cache.page_key(page) != key
+    assert memory.get_statistics()["entries"] == 0
+    assert cache.get(cache.page_key(page)) is None
+
+
+def test_page_key_covers_output_size_and_regions():
+    cache = ResultCache([MemoryLRUBackend(1 << 20)], [], imgsz=1280)
+    page = np.zeros((4, 4, 3), dtype=np.uint8)
+    crop = np.zeros((2, 2, 3), dtype=np.uint8)
+
+    keys = {
+        cache.page_key(page),
+        cache.page_key(page, output_size=(8, 8)),
+        cache.page_key(page, regions=[PageRegion(crop, 0, 0, 1.0)]),
+        cache.page_key(page, regions=[PageRegion(crop, 2, 0, 1.0)]),
+        cache.page_key(page, regions=[PageRegion(crop + 1, 0, 0, 1.0)])
+    }
+    assert len(keys) == 5
+    assert cache.page_key(page, (8, 8)) == cache.page_key(page.copy(), (8, 8))
+
+
+def test_repeated_zip_skips_inference(fake_inspector, monkeypatch):
+    cache = ResultCache([MemoryLRUBackend(1 << 20)], [], imgsz=1280)
+    monkeypatch.setattr(analysis, "result_cache", cache)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.pdf", make_pdf(2))
+        zf.writestr("b.pdf", make_pdf(1, text="Other"))
+    files = {"zip_file": ("docs.zip", archive.getvalue(), "application/zip")}
+
+    first = client.post("/batch-analyze", files=files).json()
+    calls_after_first = fake_inspector.calls
+    second = client.post("/batch-analyze", files=files).json()
+
+    assert calls_after_first > 0
+    assert fake_inspector.calls == calls_after_first
+    assert first["result"] == second["result"]
+    assert cache.get_statistics()["hits"]["document"] == 2
+
+
+def test_repeated_page_in_new_document_hits_page_cache(fake_inspector, monkeypatch):
+    cache = ResultCache([MemoryLRUBackend(1 << 20)], [], imgsz=1280)
+    monkeypatch.setattr(analysis, "result_cache", cache)
+
+    client.post("/analyze", files={"pdf_file": ("one.pdf", make_pdf(1), "application/pdf")})
+    calls = fake_inspector.calls
+    # Same page content, but a different file (two copies of the page)
+    response = client.post("/analyze", files={"pdf_file": ("two.pdf", make_pdf(2, text="Document"), "application/pdf")})
+
+    assert response.status_code == 200
+    assert cache.get_statistics()["hits"]["page"] >= 1
+    assert fake_inspector.calls - calls <= 1
+
+
+def test_fingerprint_follows_the_loaded_model(tmp_path):
+    weights = tmp_path / "model.pt"
+    weights.write_bytes(b"weights")
+    fp32 = Path(backend_model_path(str(weights), "onnx"))
+    int8 = Path(backend_model_path(str(weights), "onnx", "int8"))
+    fp32.write_bytes(b"onnx v1")
+    int8.write_bytes(b"int8 v1")
+    report = Path(evaluation_report_path(str(int8)))
+    cache = ResultCache(
+        [MemoryLRUBackend(1 << 20)],
+        [{"path": str(weights), "backend": "onnx", "precision": "int8", "conf_threshold": 0.5}],
+        imgsz=1280
+    )
+    fingerprints = [cache.fingerprint]
+
+    # Evaluated and within the gate: the int8 graph is loaded from now on
+    report.write_text(json.dumps({"delta": {"map50": -0.005, "recall": -0.01}}))
+    fingerprints.append(cache.fingerprint)
+    # Re-exported
+    int8.write_bytes(b"int8 v2, requantized")
+    fingerprints.append(cache.fingerprint)
+    # Re-evaluated outside the gate: back to fp32
+    report.write_text(json.dumps({"delta": {"map50": -0.05, "recall": 0.0}}))
+    fingerprints.append(cache.fingerprint)
+    fp32.write_bytes(b"onnx v2, re-exported")
+    fingerprints.append(cache.fingerprint)
+    assert len(set(fingerprints)) == len(fingerprints)
+
+    # The .pt is not what runs
+    weights.write_bytes(b"weights, retrained but not exported")
+    assert cache.fingerprint == fingerprints[-1]
+
+
+def test_fingerprint_hashes_model_directories(tmp_path):
+    weights = tmp_path / "model.pt"
+    export = Path(backend_model_path(str(weights), "openvino"))
+    export.mkdir()
+    (export / "model.xml").write_text("<net/>")
+    (export / "model.bin").write_bytes(b"v1")
+    cache = ResultCache([MemoryLRUBackend(1 << 20)], [{"path": str(weights), "backend": "openvino"}], imgsz=1280)
+
+    before = cache.fingerprint
+    (export / "model.bin").write_bytes(b"v2 - re-exported")
+    assert cache.fingerprint != before
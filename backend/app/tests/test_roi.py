@@ -0,0 +1,114 @@
+"""
+ROI mode: regions come from the placements of images, drawings and
+annotations, are rendered at their own resolution, and their boxes map back
+onto the page.
+"""
+import fitz
+import numpy as np
+import pytest
+
+from app.services.detections import Detections
+from app.services.document_inspector import DocumentInspector
+from app.services.raster_pool import RasterPool
+from app.utils.page_regions import PageRegion, RegionExtractor
+from app.utils.pdf_tools import RenderedPage, iter_pdf_pages
+
+IMAGE_RECT = fitz.Rect(100, 600, 250, 675)
+
+
+def make_document(rotation: int = 0, kind: str = "born_digital") -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((72, 72), "Contract", fontsize=14)
+    if kind == "born_digital":
+        # A 600x300 "signature" image at 4 pixels per point, and a drawn frame
+        pixels = np.full((300, 600, 3), 255, dtype=np.uint8)
+        pixels[100:200, 50:550] = (200, 0, 0)
+        page.insert_image(IMAGE_RECT, pixmap=fitz.Pixmap(fitz.csRGB, 600, 300, pixels.tobytes(), False))
+        page.draw_rect(fitz.Rect(350, 100, 450, 150), color=(0, 0, 1), fill=(0, 0, 1))
+    elif kind == "scan":
+        pixels = np.full((842, 595, 3), 240, dtype=np.uint8)
+        page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, 595, 842, pixels.tobytes(), False))
+    elif kind == "busy":
+        for index in range(20):
+            x, y = 60 + (index % 4) * 120, 100 + (index // 4) * 120
+            page.draw_rect(fitz.Rect(x, y, x + 30, y + 20), color=(0, 0, 0), fill=(0, 0, 0))
+    page.set_rotation(rotation)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _page(pdf_bytes: bytes, extractor=RegionExtractor()) -> RenderedPage:
+    (page,) = iter_pdf_pages(pdf_bytes, 1280, regions=extractor)
+    return page
+
+
+def _mapped_pixel(page: RenderedPage, region: PageRegion, u: int, v: int) -> np.ndarray:
+    x, y = region.x + u * region.scale, region.y + v * region.scale
+    return page.array[int(y), int(x)]
+
+
+@pytest.mark.parametrize("rotation", [0, 90])
+def test_regions_map_onto_the_page(rotation):
+    page = _page(make_document(rotation))
+
+    assert len(page.regions) == 2
+    for region in page.regions:
+        height, width, _ = region.array.shape
+        # Crops are finer than the page, and at most the crop inference size
+        assert region.scale < 1.0
+        assert max(width, height) <= RegionExtractor().target_size + 1
+        # The crop's centre shows the same thing as the page there
+        centre = region.array[height // 2, width // 2].astype(int)
+        assert np.abs(centre - _mapped_pixel(page, region, width // 2, height // 2)).max() < 40
+
+    # The image is rendered at about its own pixel density (4 px/pt, padded)
+    image_region = max(page.regions, key=lambda region: region.array.size)
+    assert max(image_region.array.shape[:2]) == pytest.approx(640, abs=2)
+
+
+@pytest.mark.parametrize("kind, expected", [("scan", None), ("busy", None), ("text", [])])
+def test_pages_that_keep_full_page_inference(kind, expected):
+    assert _page(make_document(kind=kind)).regions == expected
+
+
+def test_regions_survive_the_raster_pool():
+    pdf_bytes = make_document()
+    pool = RasterPool(workers=2, chunk_pages=1, min_pool_pages=1, max_dimension=1280, regions=RegionExtractor())
+    try:
+        (page,) = pool.iter_pages(pdf_bytes)
+    finally:
+        pool.shutdown()
+
+    expected = _page(pdf_bytes).regions
+    assert [(region.x, region.y, region.scale) for region in page.regions] == [
+        (region.x, region.y, region.scale) for region in expected
+    ]
+    assert all(np.array_equal(a.array, b.array) for a, b in zip(page.regions, expected))
+
+
+def test_region_boxes_map_back_to_page(tiny_model_path):
+    rng = np.random.default_rng(4)
+    arrays = [rng.integers(0, 255, (640, 480, 3), dtype=np.uint8) for _ in range(3)]
+    crops = [rng.integers(0, 255, (256, 320, 3), dtype=np.uint8) for _ in range(2)]
+    config = [{"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny", "batch_size": 2}]
+    inspector = DocumentInspector(config, imgsz=320, roi_imgsz=320)
+
+    pages = [
+        RenderedPage(arrays[0], regions=[PageRegion(crops[0], 40.0, 100.0, 0.5), PageRegion(crops[1], 200.0, 8.0, 1.0)]),
+        RenderedPage(arrays[1]),              # Full page, e.g. a scan
+        RenderedPage(arrays[2], regions=[]),  # Nothing the targets could be part of
+    ]
+    results = [detections for detections, _ in inspector.detect_images(pages, annotate=False)]
+
+    direct = [detections for detections, _ in inspector.detect_images(crops, annotate=False)]
+    expected = Detections.concatenate([direct[0].scale(0.5, 0.5).shift(40.0, 100.0), direct[1].shift(200.0, 8.0)])
+    assert len(expected)
+    assert np.allclose(np.array(sorted(results[0].xyxy.tolist())), np.array(sorted(expected.xyxy.tolist())), atol=1.0)
+    assert np.allclose(results[1].xyxy, inspector.detect_image(arrays[1])[0].xyxy)
+    assert len(results[2]) == 0
+
+    # Without ROI mode, regions are ignored
+    whole = DocumentInspector(config, imgsz=320).detect_images(pages[:1], annotate=False)[0][0]
+    assert np.allclose(whole.xyxy, inspector.detect_image(arrays[0])[0].xyxy)
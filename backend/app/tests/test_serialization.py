@@ -0,0 +1,107 @@
+"""
+Response encoding: orjson output must decode to the same JSON, and the
+compact format must carry the same detections as the default one.
+"""
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import analysis
+from app.services.detections import Detections
+from app.tests.conftest import make_pdf
+from app.utils import serialization
+
+client = TestClient(app)
+
+STAMP = {"class": "stamp", "confidence": 0.9, "bbox": [10.0, 20.0, 50.0, 80.0], "model": "fake"}
+QR = {"class": "qr_code", "confidence": 0.75, "bbox": [100.0, 100.0, 140.0, 140.0], "model": "fake"}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_handles_numpy(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson not installed")
+
+    content = {"bboxes": np.array([[1.5, 2.0, 3.0, 4.0]]), "count": np.int64(3), "empty": np.empty((0, 4)), "name": "é"}
+    assert json.loads(serialization.dumps(content)) == {
+        "bboxes": [[1.5, 2.0, 3.0, 4.0]], "count": 3, "empty": [], "name": "é"
+    }
+
+
+def _zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_batch_compact_format_matches_default(fake_inspector):
+    fake_inspector.detections = [STAMP, QR]
+    archive = _zip({"a.pdf": make_pdf(2, "A"), "b.pdf": make_pdf(1, "B")})
+
+    default = client.post("/batch-analyze", files={"zip_file": ("docs.zip", archive, "application/zip")}).json()
+    compact = client.post(
+        "/batch-analyze?format=compact", files={"zip_file": ("docs.zip", archive, "application/zip")}
+    ).json()
+
+    assert compact["statistics"] == default["statistics"]
+    for name, pages in default["result"].items():
+        assert compact["result"][name].keys() == pages.keys()
+        for page_key, page in pages.items():
+            columns = compact["result"][name][page_key]
+            annotations = [next(iter(entry.values())) for entry in page["annotations"]]
+            assert columns["page_size"] == page["page_size"]
+            assert columns["categories"] == [a["category"] for a in annotations]
+            assert columns["bboxes"] == [
+                [a["bbox"]["x"], a["bbox"]["y"], a["bbox"]["width"], a["bbox"]["height"]] for a in annotations
+            ]
+            assert columns["confidences"] == pytest.approx([0.9, 0.75])
+
+
+def test_analyze_default_format_unchanged(fake_inspector):
+    fake_inspector.detections = [STAMP]
+
+    body = client.post("/analyze", files={"pdf_file": ("doc.pdf", make_pdf(1), "application/pdf")}).json()
+
+    (page,) = body["pages"]
+    assert page["detections"] == [{
+        "category": "stamp",
+        "confidence": pytest.approx(0.9),
+        "bbox": {"x": 10.0, "y": 20.0, "width": 40.0, "height": 60.0}
+    }]
+    assert body["result"]["doc.pdf"]["page_1"]["annotations"] == [{
+        "annotation_1": {"category": "stamp", "bbox": page["detections"][0]["bbox"], "area": 2400.0}
+    }]
+
+    compact = client.post(
+        "/analyze?format=compact", files={"pdf_file": ("doc.pdf", make_pdf(1), "application/pdf")}
+    ).json()
+    assert compact["pages"][0]["bboxes"] == [[10.0, 20.0, 40.0, 60.0]]
+    assert client.post(
+        "/analyze?format=columns", files={"pdf_file": ("doc.pdf", make_pdf(1), "application/pdf")}
+    ).status_code == 422
+
+
+def test_compact_output_does_not_depend_on_the_encoder(monkeypatch):
+    if serialization.orjson is None:
+        pytest.skip("orjson not installed")
+    # Detections hold float32; 0.9 is not exact in float32
+    detections = Detections(
+        np.array([[10.1, 20.2, 50.3, 80.4]], dtype=np.float32), np.array([0.9], dtype=np.float32),
+        np.array([0]), ("stamp",)
+    )
+    content = analysis._compact_detections(detections)
+
+    with_orjson = serialization.dumps(content)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps(content) == with_orjson
+    # The same numbers as the default format
+    assert json.loads(with_orjson)["confidences"] == detections.confidence.tolist()
@@ -0,0 +1,62 @@
+"""
+Tests for request-scoped statistics: concurrent jobs must not share counts.
+"""
+import asyncio
+
+import httpx
+
+from app.main import app
+from app.routers import analyze
+from app.services.executor import BoundedExecutor
+from app.services.metrics import DetectionStatistics, MetricsRegistry
+from app.tests.conftest import make_pdf
+
+STAMP = {"class": "stamp", "confidence": 0.9, "bbox": [10.0, 10.0, 50.0, 50.0], "model": "fake"}
+
+
+def test_concurrent_jobs_report_their_own_statistics(fake_inspector, monkeypatch):
+    fake_inspector.delay = 0.2
+    fake_inspector.detections = [STAMP]
+    monkeypatch.setattr(analyze, "executor", BoundedExecutor(max_workers=3, max_queue=0))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/analyze", files={"pdf_file": ("doc.pdf", make_pdf(pages, text=f"Doc {pages}"), "application/pdf")})
+                for pages in (1, 2, 3)
+            ])
+
+    responses = asyncio.run(scenario())
+
+    totals = [r.json()["statistics"]["total_detections"] for r in responses]
+    assert totals == [1, 2, 3]
+    assert responses[2].json()["statistics"]["class_statistics"] == {"stamp": 3}
+
+
+def test_statistics_merge_and_registry():
+    first = DetectionStatistics.from_pages([[STAMP], [STAMP, {**STAMP, "class": "qr_code"}]])
+    second = DetectionStatistics()
+    second.add([], triaged=True)
+    second.merge(first)
+    assert second.to_dict() == {
+        "total_detections": 3,
+        "class_statistics": {"stamp": 2, "qr_code": 1},
+        "triage": {"pages": 3, "triaged": 1, "rate": 1 / 3}
+    }
+
+    metrics = MetricsRegistry()
+    metrics.record_page([STAMP])
+    metrics.record_page([], source="cached")
+    metrics.record_page([], source="triaged")
+    metrics.record_timing("preprocess", 0.010)
+    metrics.record_timing("preprocess", 0.030)
+    stats = metrics.get_statistics()
+    assert {key: stats[key] for key in ("pages", "total_detections", "class_statistics")} == {
+        "pages": {"inferred": 1, "cached": 1, "triaged": 1},
+        "total_detections": 1,
+        "class_statistics": {"stamp": 1}
+    }
+    assert stats["triage"] == {"pages": 3, "triaged": 1, "rate": 1 / 3}
+    assert stats["timings"]["preprocess"]["calls"] == 2
+    assert abs(stats["timings"]["preprocess"]["avg_ms"] - 20.0) < 1e-6
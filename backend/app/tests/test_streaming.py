@@ -0,0 +1,117 @@
+"""
+Tests for the NDJSON streaming variants of /analyze and /batch-analyze.
+"""
+import asyncio
+import io
+import json
+import time
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import analyze
+from app.services import analysis
+from app.services.batcher import InferenceBatcher
+from app.tests.conftest import make_pdf
+from app.tests.test_raster_pool import _pdf_with_oversized_page
+
+client = TestClient(app)
+
+
+def _events(response):
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def test_analyze_stream_emits_pages_then_summary(fake_inspector):
+    response = client.post("/analyze/stream", files={"pdf_file": ("doc.pdf", make_pdf(3), "application/pdf")})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    events = _events(response)
+    assert [e["event"] for e in events] == ["file_started", "page", "page", "page", "file_completed", "summary"]
+    assert [e["page_index"] for e in events if e["event"] == "page"] == [1, 2, 3]
+
+    summary = events[-1]
+    page = events[1]["page"]
+    assert page["annotated_image_url"] == f"/static/annotated/{summary['job_id']}/page_1.jpg"
+    assert "statistics" in summary and "annotated_pdf_url" in summary
+    assert "pages" not in summary
+
+
+def test_batch_stream_reports_failed_files(fake_inspector):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.pdf", make_pdf(2))
+        zf.writestr("broken.pdf", b"not a pdf")
+
+    response = client.post("/batch-analyze/stream", files={"zip_file": ("batch.zip", archive.getvalue(), "application/zip")})
+    events = _events(response)
+
+    pages = [e for e in events if e["event"] == "page"]
+    assert [(e["file"], list(e["page"])) for e in pages] == [("a.pdf", ["page_1"]), ("a.pdf", ["page_2"])]
+    assert any(e["event"] == "file_failed" and e["file"] == "broken.pdf" for e in events)
+    assert events[-1]["event"] == "summary"
+    assert events[-1]["files_processed"] == 1
+
+
+def test_stream_errors_become_events(fake_inspector):
+    response = client.post("/batch-analyze/stream", files={"zip_file": ("bad.zip", b"not a zip", "application/zip")})
+    events = _events(response)
+
+    assert events[-1]["event"] == "error"
+    assert events[-1]["status_code"] == 400
+
+
+def test_first_page_arrives_before_the_job_finishes(fake_inspector, monkeypatch):
+    fake_inspector.delay = 0.3
+    # One page per forward pass, so pages finish one after another
+    monkeypatch.setattr(analysis, "batcher", InferenceBatcher(analysis._detect_batch, max_batch_size=1))
+    pdf_bytes = make_pdf(4)
+
+    async def scenario():
+        start = time.perf_counter()
+        response = analyze._stream_blocking(analysis.analyze_pdf, pdf_bytes, "doc.pdf")
+        arrivals = []
+        async for chunk in response.body_iterator:
+            arrivals.append((json.loads(chunk)["event"], time.perf_counter() - start))
+        return arrivals
+
+    arrivals = asyncio.run(scenario())
+
+    first_page = next(t for event, t in arrivals if event == "page")
+    summary = arrivals[-1][1]
+    assert arrivals[-1][0] == "summary"
+    # 4 passes of 0.3s: the first page must not wait for the other three
+    assert summary - first_page > 0.6
+
+
+def test_batch_drops_files_that_fail_mid_document(fake_inspector):
+    fake_inspector.detections = [
+        {"class": "stamp", "confidence": 0.9, "bbox": [10.0, 10.0, 50.0, 50.0], "model": "fake"}
+    ]
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.pdf", make_pdf(2))
+        zf.writestr("late.pdf", _pdf_with_oversized_page(24, 20))
+        zf.writestr("c.pdf", make_pdf(2))
+
+    response = client.post("/batch-analyze/stream", files={"zip_file": ("batch.zip", archive.getvalue(), "application/zip")})
+    events = _events(response)
+
+    # Pages before the failure went out, then file_failed supersedes them
+    assert any(e["event"] == "page" and e["file"] == "late.pdf" for e in events)
+    assert [e["event"] for e in events if e.get("file") == "late.pdf"][-1] == "file_failed"
+
+    summary = events[-1]
+    assert summary["files_processed"] == 2
+    assert summary["statistics"]["total_detections"] == 4
+    assert summary["statistics"]["triage"]["pages"] == 4
+    # Numbering carries on from a.pdf as if late.pdf had no pages
+    c_pages = [e["page"] for e in events if e["event"] == "page" and e["file"] == "c.pdf"]
+    assert [list(page["page_1"]["annotations"][0]) for page in c_pages[:1]] == [["annotation_3"]]
+
+    result = client.post("/batch-analyze", files={"zip_file": ("batch.zip", archive.getvalue(), "application/zip")}).json()
+    assert result["statistics"] == summary["statistics"]
+    assert list(result["result"]["late.pdf"]) == ["error"]
+    assert list(result["result"]["c.pdf"]["page_2"]["annotations"][0]) == ["annotation_4"]
@@ -0,0 +1,92 @@
+"""
+Tiled inference: tile layout, box merging and mapping tile boxes onto the page.
+"""
+import numpy as np
+import pytest
+
+from app.services.box_merge import merge_detections, pairwise_overlap
+from app.services.detections import Detections
+from app.services.document_inspector import DocumentInspector, tile_grid
+
+
+def _detection(bbox, confidence, class_name="qr_code"):
+    return {"class": class_name, "confidence": confidence, "bbox": bbox, "model": "m"}
+
+
+def test_tile_grid_covers_page_with_overlap():
+    tiles = tile_grid(1000, 1500, 640, 0.25)
+
+    covered = np.zeros((1000, 1500), dtype=bool)
+    for x1, y1, x2, y2 in tiles:
+        assert x2 - x1 == 640 and y2 - y1 == 640
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+    # Last column/row end exactly at the page edge
+    assert max(x2 for _, _, x2, _ in tiles) == 1500
+    assert max(y2 for _, _, _, y2 in tiles) == 1000
+
+    # A page smaller than a tile is one (smaller) tile
+    assert tile_grid(300, 500, 640, 0.2) == [(0, 0, 500, 300)]
+
+
+def test_nms_keeps_best_box_per_object_and_class():
+    detections = [
+        _detection([0, 0, 100, 100], 0.6),
+        _detection([2, 2, 102, 102], 0.9),
+        _detection([0, 0, 40, 100], 0.5),               # Fragment cut by a tile edge
+        _detection([1, 1, 101, 101], 0.8, "signature"),  # Other class: kept
+        _detection([300, 300, 350, 350], 0.4),
+    ]
+    merged = merge_detections(Detections.from_dicts(detections), method="nms", threshold=0.5)
+
+    # Survivors keep their original order
+    assert merged.classes == ["qr_code", "signature", "qr_code"]
+    assert merged.confidence.tolist() == pytest.approx([0.9, 0.8, 0.4])
+
+
+def test_wbf_averages_boxes_by_confidence():
+    detections = [_detection([0, 0, 100, 100], 0.75), _detection([10, 10, 110, 110], 0.25)]
+    fused = merge_detections(Detections.from_dicts(detections), method="wbf", threshold=0.5, metric="iou")
+
+    assert len(fused) == 1
+    assert fused.confidence[0] == 0.75
+    assert np.allclose(fused.xyxy[0], [2.5, 2.5, 102.5, 102.5])
+
+    with pytest.raises(ValueError):
+        merge_detections(Detections.from_dicts(detections), method="mean")
+
+
+def test_tile_boxes_map_back_to_page(tiny_model_path):
+    rng = np.random.default_rng(2)
+    page = rng.integers(0, 255, (320, 640, 3), dtype=np.uint8)
+    config = [{"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny",
+               "tile_size": 320, "tile_overlap": 0.0}]
+    inspector = DocumentInspector(config, imgsz=320)
+
+    # Two tiles, left and right half; each should match running the crop alone
+    tiled = Detections.concatenate(inspector._predict_tiles(inspector.models[0], [page], model_batch=4)[0])
+    expected = Detections.concatenate([
+        inspector.detect_image(np.ascontiguousarray(page[:, x1:x1 + 320]))[0].shift(x1, 0)
+        for x1 in (0, 320)
+    ])
+
+    assert len(expected)
+    assert np.allclose(np.array(sorted(tiled.xyxy.tolist())), np.array(sorted(expected.xyxy.tolist())), atol=1.0)
+
+
+def test_tiled_detect_images_merges_duplicates(tiny_model_path):
+    rng = np.random.default_rng(3)
+    pages = [rng.integers(0, 255, (640, 480, 3), dtype=np.uint8) for _ in range(2)]
+    config = [{"path": tiny_model_path, "conf_threshold": 0.5, "name": "tiny",
+               "tile_size": 320, "tile_overlap": 0.25, "batch_size": 3}]
+    inspector = DocumentInspector(config, imgsz=320)
+
+    for page, (detections, _) in zip(pages, inspector.detect_images(pages, annotate=False)):
+        assert len(detections)
+        boxes = detections.xyxy
+        assert (boxes[:, [0, 2]] >= -1).all() and (boxes[:, [0, 2]] <= page.shape[1] + 1).all()
+        assert (boxes[:, [1, 3]] >= -1).all() and (boxes[:, [1, 3]] <= page.shape[0] + 1).all()
+        for class_name in set(detections.classes):
+            overlap = pairwise_overlap(boxes[detections.class_mask(class_name)])
+            np.fill_diagonal(overlap, 0.0)
+            assert (overlap <= 0.5).all()
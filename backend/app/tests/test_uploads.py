@@ -0,0 +1,65 @@
+"""
+/analyze works on a spooled copy of the upload: PDFs are opened from their
+path, and the copy is deleted once the job is done.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import analysis
+from app.services.raster_pool import RasterPool
+from app.tests.conftest import make_pdf
+from app.utils.pdf_tools import iter_pdf_pages
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "spool"
+    directory.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(directory))
+    return directory
+
+
+@pytest.mark.parametrize("endpoint", ["/analyze", "/analyze/stream"])
+def test_spooled_pdf_is_removed_after_the_request(fake_inspector, spool_dir, endpoint):
+    response = client.post(endpoint, files={"pdf_file": ("doc.pdf", make_pdf(3), "application/pdf")})
+
+    assert response.status_code == 200
+    assert os.listdir(spool_dir) == []
+
+
+def test_analyze_from_path_matches_bytes(fake_inspector, tmp_path):
+    fake_inspector.detections = [{"class": "stamp", "confidence": 0.9, "bbox": [10.0, 10.0, 50.0, 50.0], "model": "fake"}]
+    pdf_bytes = make_pdf(3)
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(pdf_bytes)
+
+    from_bytes = analysis.analyze_pdf(pdf_bytes, "doc.pdf", annotations="lazy")
+    from_path = analysis.analyze_pdf(pdf_path, "doc.pdf", annotations="lazy")
+
+    assert from_path["result"] == from_bytes["result"]
+    assert [page["page_size"] for page in from_path["pages"]] == [page["page_size"] for page in from_bytes["pages"]]
+    # The lazy job keeps its own copy; the spooled file stays with its owner
+    assert (analysis.STATIC_DIR / from_path["job_id"] / "source.pdf").read_bytes() == pdf_bytes
+    assert pdf_path.exists()
+
+
+def test_raster_pool_reads_path_in_place(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(make_pdf(6))
+    pool = RasterPool(workers=2, chunk_pages=2, min_pool_pages=2)
+    try:
+        rendered = [page.array for page in pool.iter_pages(pdf_path)]
+    finally:
+        pool.shutdown()
+
+    expected = [page.array for page in iter_pdf_pages(pdf_path)]
+    assert len(rendered) == 6
+    assert all(np.array_equal(a, b) for a, b in zip(rendered, expected))
+    assert pdf_path.exists()
@@ -0,0 +1,110 @@
+"""
+/batch-analyze reads archives from disk: members are extracted one at a time,
+memory does not grow with the archive, and oversized archives are refused.
+"""
+import io
+import os
+import tempfile
+import tracemalloc
+import zipfile
+
+import fitz
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import analysis
+from app.tests.conftest import make_pdf
+
+client = TestClient(app)
+
+MEMBER_BYTES = 4 * 1024 * 1024
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    """Temp files of the job (spooled upload, extracted members) land here."""
+    directory = tmp_path / "spool"
+    directory.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(directory))
+    return directory
+
+
+@pytest.fixture(scope="module")
+def large_pdf():
+    # One small page plus an incompressible attachment of MEMBER_BYTES
+    doc = fitz.open()
+    doc.new_page(width=100, height=100).insert_text((10, 50), "Large", fontsize=10)
+    doc.embfile_add("blob.bin", os.urandom(MEMBER_BYTES))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _write_zip(path, pdf_bytes, members: int, tag: str):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for index in range(members):
+            # Bytes after %%EOF are ignored by readers but make every member unique
+            zf.writestr(f"doc_{index}.pdf", pdf_bytes + f"\n% {tag} {index}\n".encode())
+    return path
+
+
+def _peak_memory(zip_path) -> int:
+    tracemalloc.start()
+    try:
+        output = analysis.batch_analyze_zip(zip_path, zip_path.name)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert output["files_processed"] == len(output["result"])
+    assert all(document == {"page_1": document["page_1"]} for document in output["result"].values())
+    return peak
+
+
+def test_peak_memory_does_not_grow_with_archive(fake_inspector, spool_dir, tmp_path, large_pdf):
+    # Both long enough to fill the page pipeline
+    small = _write_zip(tmp_path / "small.zip", large_pdf, 12, "small")
+    large = _write_zip(tmp_path / "large.zip", large_pdf, 36, "large")
+    assert large.stat().st_size > 36 * MEMBER_BYTES
+
+    small_peak = _peak_memory(small)
+    large_peak = _peak_memory(large)
+
+    # Holding the archive (or even two members) would show up here, and so
+    # would rendered pages queueing up per document
+    assert large_peak < 2 * MEMBER_BYTES
+    assert large_peak < small_peak + MEMBER_BYTES // 4
+    # Every extracted member was deleted once rendered
+    assert os.listdir(spool_dir) == []
+
+
+def test_spooled_upload_is_removed_after_the_request(fake_inspector, spool_dir):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.pdf", make_pdf(2))
+        zf.writestr("b.pdf", make_pdf(1))
+
+    response = client.post("/batch-analyze", files={"zip_file": ("docs.zip", archive.getvalue(), "application/zip")})
+
+    assert response.status_code == 200
+    assert response.json()["files_processed"] == 2
+    assert os.listdir(spool_dir) == []
+
+
+def test_archive_limits(fake_inspector, spool_dir, monkeypatch):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for index in range(3):
+            zf.writestr(f"doc_{index}.pdf", make_pdf(1))
+    files = {"zip_file": ("docs.zip", archive.getvalue(), "application/zip")}
+
+    monkeypatch.setattr(analysis, "ZIP_MAX_MEMBERS", 2)
+    response = client.post("/batch-analyze", files=files)
+    assert response.status_code == 413
+    assert "at most 2" in response.json()["detail"]
+
+    monkeypatch.setattr(analysis, "ZIP_MAX_MEMBERS", 3)
+    monkeypatch.setattr(analysis, "ZIP_MAX_UNCOMPRESSED_BYTES", 2 * len(make_pdf(1)))
+    response = client.post("/batch-analyze", files=files)
+    assert response.status_code == 413
+    assert os.listdir(spool_dir) == []
@@ -0,0 +1,148 @@
+"""
+Regions of interest from the structure of born-digital PDFs.
+
+Stamps, signatures and QR codes pasted into a generated PDF are usually
+embedded images or blocks of vector drawings (or the appearance of an
+annotation, e.g. a signed field). PyMuPDF lists their placements almost for
+free, so RegionExtractor hands the detectors just those areas instead of the
+whole page. Each is rendered as a clip at its own resolution: an image at its
+native pixel density, a drawing at the size the detectors run crops at (and
+neither larger than that size, nor coarser than the page itself).
+
+Pages where this does not pay off keep full-page inference: scans (an image
+covering most of the page), pages with many placements, or placements that
+together cover much of the page.
+"""
+from typing import List, NamedTuple, Optional
+
+import fitz
+import numpy as np
+
+
+class PageRegion(NamedTuple):
+    """
+    A crop of a page, rendered at its own resolution. Crop pixel (u, v) is
+    pixel (x + u * scale, y + v * scale) of the page's rendered array.
+    """
+    array: np.ndarray
+    x: float
+    y: float
+    scale: float
+
+
+class RegionExtractor(NamedTuple):
+    """
+    Settings for finding and rendering regions of interest.
+
+    Attributes:
+        target_size: Crop size the detectors run at; crops are rendered
+                     at most this large, vector drawings at this size
+        max_regions: Pages with more regions use full-page inference
+        max_page_share: Pages where one placement, or all regions together,
+                        cover more than this share of the page use
+                        full-page inference
+        min_size: Placements smaller than this (points, either side) are
+                  ignored, e.g. bullets and rules
+        padding: Points of context added around each placement
+        max_scale: Highest render scale (pixels per point) of a crop; 4.0 is
+                   288 DPI
+    """
+    target_size: int = 640
+    max_regions: int = 12
+    max_page_share: float = 0.5
+    min_size: float = 8.0
+    padding: float = 8.0
+    max_scale: float = 4.0
+
+    def extract(self, page, page_scale: float) -> Optional[List[PageRegion]]:
+        """
+        Render the regions of interest of a page.
+
+        Args:
+            page: The fitz.Page
+            page_scale: Scale the page's array was rendered at, which region
+                        coordinates refer to
+
+        Returns:
+            The regions (an empty list if the page has no image, drawing or
+            annotation at all), or None if the page needs full-page
+            inference.
+        """
+        placements = self.placements(page)
+        if placements is None:
+            return None
+
+        regions = []
+        for rect, scale in placements:
+            scale = min(scale, self.max_scale, self.target_size / max(rect.width, rect.height))
+            scale = max(scale, page_scale)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), clip=rect, alpha=False, colorspace=fitz.csRGB)
+            if pixmap.width == 0 or pixmap.height == 0:
+                continue
+            array = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)
+            factor = page_scale / scale
+            regions.append(PageRegion(array, pixmap.x * factor, pixmap.y * factor, factor))
+        return regions
+
+    def placements(self, page) -> Optional[List[tuple]]:
+        """
+        (rect, scale) of every region in page (display) coordinates, merged
+        where they overlap; scale is the pixel density the region wants. None
+        if the page needs full-page inference.
+        """
+        page_rect = page.rect
+        page_area = page_rect.width * page_rect.height
+        rotate = page.rotation_matrix
+
+        found = []
+        for image in page.get_image_info():
+            rect = fitz.Rect(image["bbox"]) * rotate
+            if rect.width > 0 and rect.height > 0:
+                found.append((rect, max(image["width"] / rect.width, image["height"] / rect.height)))
+        # Vector drawings and annotation appearances have no native
+        # resolution: they are rendered at the detectors' crop size
+        vector = list(page.cluster_drawings()) + [annot.rect for annot in page.annots()]
+        for rect in vector:
+            rect = fitz.Rect(rect) * rotate
+            if rect.width > 0 and rect.height > 0:
+                found.append((rect, self.target_size / max(rect.width, rect.height)))
+
+        if len(found) > 4 * self.max_regions:
+            return None
+
+        regions = []
+        for rect, scale in found:
+            rect = rect & page_rect
+            if rect.is_empty or rect.width < self.min_size or rect.height < self.min_size:
+                continue
+            if rect.width * rect.height > self.max_page_share * page_area:
+                return None   # A scan, or a full-page background
+            padded = fitz.Rect(rect.x0 - self.padding, rect.y0 - self.padding,
+                               rect.x1 + self.padding, rect.y1 + self.padding) & page_rect
+            regions.append((padded, scale))
+
+        regions = _merge_overlapping(regions)
+        if len(regions) > self.max_regions:
+            return None
+        if sum(rect.width * rect.height for rect, _ in regions) > self.max_page_share * page_area:
+            return None
+        return regions
+
+
+def _merge_overlapping(regions: List[tuple]) -> List[tuple]:
+    """Union overlapping rects (keeping the higher scale) until none overlap."""
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                (a, scale_a), (b, scale_b) = merged[i], merged[j]
+                if a.intersects(b):
+                    merged[i] = (a | b, max(scale_a, scale_b))
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
@@ -0,0 +1,109 @@
+"""
+Blank page triage.
+
+Scanned batches carry many blank separator sheets and back sides, which
+cannot contain a stamp, signature or QR code. PageTriage recognises them
+while they are rendered, so they can skip the models:
+
+- "empty": the PDF shows no images, vector drawings or annotations on the
+  page, and at most a little text (e.g. "This page intentionally left blank")
+- "no_ink": hardly any cell of a downsampled copy of the rendered page holds
+  a dark pixel, e.g. a scanned blank page
+
+Both checks are cheap next to rendering: one pass listing the page's content,
+and NumPy reductions that stop early on pages a sparse sample already shows
+ink on. They run on the raster workers.
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# Entries of Page.get_bboxlog() that are text; any other entry (image, path,
+# shading, ...) is content a target could be part of
+TEXT_OPERATIONS = frozenset({"fill-text", "stroke-text", "clip-text", "clip-stroke-text", "ignore-text"})
+
+
+class PageTriage(NamedTuple):
+    """
+    Thresholds for the blank page checks; either check is off when its
+    threshold is None.
+
+    Attributes:
+        max_text_chars: Pages with no other content and at most this many
+                        (non-whitespace) characters of text are "empty"
+        max_ink_coverage: Pages whose share of cells holding ink is at
+                          most this are "no_ink"
+        ink_threshold: A pixel whose darkest channel is below this is ink
+        cell_size: Side of the cells, in pixels, the page is downsampled to
+    """
+    max_text_chars: Optional[int] = 100
+    max_ink_coverage: Optional[float] = 0.0005
+    ink_threshold: int = 160
+    cell_size: int = 4
+
+    def check(self, page, array: np.ndarray) -> Optional[str]:
+        """
+        Triage one page.
+
+        Args:
+            page: The fitz.Page
+            array: Its rendered HxWx3 pixels
+
+        Returns:
+            "empty" or "no_ink" if the page is blank, otherwise None.
+        """
+        if self.max_text_chars is not None and not has_graphics(page):
+            if text_chars(page) <= self.max_text_chars:
+                return "empty"
+        if self.max_ink_coverage is not None:
+            coverage = ink_coverage(array, self.ink_threshold, self.cell_size, limit=self.max_ink_coverage)
+            if coverage <= self.max_ink_coverage:
+                return "no_ink"
+        return None
+
+
+def has_graphics(page) -> bool:
+    """Whether the page draws anything but text, or carries annotations (e.g. a signed field)."""
+    if page.first_annot is not None or page.first_widget is not None:
+        return True
+    return any(operation not in TEXT_OPERATIONS for operation, _ in page.get_bboxlog())
+
+
+def text_chars(page) -> int:
+    """Non-whitespace characters of text on the page."""
+    return sum(len(word) for word in page.get_text().split())
+
+
+def ink_coverage(
+    array: np.ndarray,
+    ink_threshold: int = 160,
+    cell_size: int = 4,
+    limit: Optional[float] = None
+) -> float:
+    """
+    Share of cell_size x cell_size cells of the page holding at least one ink
+    pixel (darkest channel below ink_threshold). Taking the minimum of every
+    cell, rather than every cell_size-th pixel, keeps one-pixel strokes such
+    as a thin signature line.
+
+    With a limit, pages whose ink shows in a sparse sample are not
+    downsampled: some value above limit is returned instead.
+    """
+    height = array.shape[0] // cell_size * cell_size
+    width = array.shape[1] // cell_size * cell_size
+    if height == 0 or width == 0:
+        return 0.0
+    cells = (height // cell_size) * (width // cell_size)
+
+    if limit is not None:
+        # Each sampled ink pixel lies in a different cell
+        sample = array[:height:cell_size * 2, :width:cell_size * 2]
+        inked = np.count_nonzero(sample.min(axis=2) < ink_threshold)
+        if inked > limit * cells:
+            return inked / cells
+
+    rows = array[0:height:cell_size, :width].copy()
+    for offset in range(1, cell_size):
+        np.minimum(rows, array[offset:height:cell_size, :width], out=rows)
+    darkest = rows.reshape(height // cell_size, width // cell_size, cell_size * 3).min(axis=2)
+    return float(np.count_nonzero(darkest < ink_threshold)) / cells
@@ -1,51 +1,332 @@
+import ctypes
 import fitz  # PyMuPDF
+import numpy as np
 from PIL import Image
-import io
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, Tuple, Union
 
-# Increase PIL's image size limit to handle large PDFs
-# Default is ~178 million pixels, we increase it to 500 million
-Image.MAX_IMAGE_PIXELS = 500_000_000
+from app.utils.page_regions import PageRegion, RegionExtractor
+from app.utils.page_triage import PageTriage
 
+# Largest raster (rendered page, or embedded image decoded by PyMuPDF) we
+# accept, in pixels. PIL's own limit is raised to match: its default is ~178
+# million pixels
+MAX_IMAGE_PIXELS = 500_000_000
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
 
-def pdf_bytes_to_images(pdf_bytes: bytes, max_dimension: int = 2048):
+
+class PdfRenderError(Exception):
+    """Raised when a PDF cannot be opened or one of its pages cannot be rendered."""
+
+
+class OversizedPdfError(PdfRenderError):
+    """Raised before rendering a page whose raster or embedded images exceed MAX_IMAGE_PIXELS."""
+
+
+class RenderedPage:
+    """
+    A rasterized PDF page.
+    
+    `array` is an HxWx3 uint8 NumPy view straight over the PyMuPDF pixmap
+    samples - no PNG encode/decode and no copy - and is what the models
+    consume. A PIL image is only built (as a copy) when `image` is accessed,
+    e.g. for annotation.
+
+    A page rendered below the full raster size (for the models only) also
+    carries `output_size`: the size of the full raster it stands in for,
+    which detections are reported in.
+
+    `triage` is why the page was found blank while rendering ("empty" or
+    "no_ink", see app.utils.page_triage), or None. `regions` are the crops
+    the models run on in ROI mode (see app.utils.page_regions); None means
+    the whole page.
+    """
+
+    def __init__(
+        self,
+        array: np.ndarray,
+        output_size: Optional[Tuple[int, int]] = None,
+        triage: Optional[str] = None,
+        regions: Optional[List[PageRegion]] = None
+    ):
+        self.array = array
+        self._output_size = output_size
+        self.triage = triage
+        self.regions = regions
+
+    @classmethod
+    def from_pixmap(cls, pixmap: "fitz.Pixmap", output_size: Optional[Tuple[int, int]] = None) -> "RenderedPage":
+        # samples_mv does not keep the pixmap alive, so wrap the sample memory
+        # in a ctypes buffer that does; the array's base then owns the pixmap
+        # and the view stays valid for as long as the array is referenced
+        buffer = (ctypes.c_ubyte * (pixmap.stride * pixmap.height)).from_address(pixmap.samples_ptr)
+        buffer._pixmap = pixmap
+        array = np.frombuffer(buffer, dtype=np.uint8).reshape(
+            pixmap.height, pixmap.width, pixmap.n
+        )
+        return cls(array, output_size)
+
+    def __reduce__(self):
+        # Pixmaps cannot be pickled; pages sent between processes carry an
+        # owned copy of the pixels instead
+        return RenderedPage, (np.array(self.array), self._output_size, self.triage, self.regions)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height), like PIL.Image.size."""
+        return self.array.shape[1], self.array.shape[0]
+
+    @property
+    def output_size(self) -> Tuple[int, int]:
+        """(width, height) of the coordinate space detections are reported in."""
+        return self._output_size or self.size
+
+    @property
+    def image(self) -> Image.Image:
+        """A PIL copy of the page."""
+        return Image.fromarray(self.array)
+
+
+def pdf_bytes_to_images(pdf_bytes: bytes, max_dimension: int = 2048) -> List[Image.Image]:
     """
     Convert PDF bytes into a list of PIL Images (one per page).
     
+    Holds every page in memory at once; use iter_pdf_pages for large documents.
+    
     Args:
         pdf_bytes: PDF file as bytes
         max_dimension: Maximum width/height in pixels (default 2048)
                       This prevents excessive memory usage while maintaining quality
     """
-    pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
-
-    images = []
-    for page_index in range(len(pdf)):
-        page = pdf.load_page(page_index)
-        
-        # Get page dimensions
-        page_rect = page.rect
-        page_width = page_rect.width
-        page_height = page_rect.height
-        
-        # Calculate appropriate DPI to keep within max_dimension
-        # Default DPI is 72, we scale it to fit within max_dimension
-        scale_width = max_dimension / page_width
-        scale_height = max_dimension / page_height
-        scale = min(scale_width, scale_height, 2.8)  # Cap at ~200 DPI (2.8x scale)
-        
-        # Render page with calculated scale
-        mat = fitz.Matrix(scale, scale)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-
-        img_bytes = pix.tobytes("png")
-        image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-
-        images.append(image)
-
-    pdf.close()
-    return images
+    return [page.image for page in iter_pdf_pages(pdf_bytes, max_dimension)]
+
+
+def iter_pdf_pages(
+    pdf_source: Union[bytes, str, Path],
+    max_dimension: int = 2048,
+    output_dimension: Optional[int] = None,
+    triage: Optional[PageTriage] = None,
+    regions: Optional[RegionExtractor] = None
+) -> Iterator[RenderedPage]:
+    """
+    Render PDF pages one at a time, as RenderedPage objects.
+    
+    The document (bytes, or a path PyMuPDF reads from as needed) is opened
+    immediately so an invalid file fails here; each page is only rasterized
+    when the caller asks for it, so memory does not grow with page count.
+    
+    Args:
+        pdf_source: PDF file as bytes, or its path
+        max_dimension: Maximum rendered width/height in pixels
+        output_dimension: max_dimension of the full raster the pages stand
+                          in for, when rendering below it (e.g. at the model
+                          input size); sets RenderedPage.output_size
+        triage: Blank page checks setting RenderedPage.triage; None skips them
+        regions: Sets RenderedPage.regions of pages that are not blank;
+                 None leaves every page whole
+    
+    Raises:
+        PdfRenderError: If the document cannot be opened, or (while iterating)
+                        a page cannot be rendered
+        OversizedPdfError: (while iterating) If a page is too large to render
+    """
+    try:
+        if isinstance(pdf_source, bytes):
+            pdf = fitz.open(stream=pdf_source, filetype="pdf")
+        else:
+            pdf = fitz.open(str(pdf_source), filetype="pdf")
+    except Exception as e:
+        raise PdfRenderError(str(e)) from e
+    return _render_pages(pdf, max_dimension, output_dimension, triage, regions)
+
+
+def _render_pages(
+    pdf,
+    max_dimension: int,
+    output_dimension: Optional[int],
+    triage: Optional[PageTriage],
+    regions: Optional[RegionExtractor]
+) -> Iterator[RenderedPage]:
+    try:
+        for page_index in range(len(pdf)):
+            try:
+                image = _render_page(pdf.load_page(page_index), max_dimension, output_dimension, triage, regions)
+            except PdfRenderError:
+                raise
+            except Exception as e:
+                raise PdfRenderError(str(e)) from e
+            yield image
+    finally:
+        pdf.close()
+
+
+def _page_scale(page_rect, max_dimension: int) -> float:
+    # Default DPI is 72, we scale it to fit within max_dimension
+    scale_width = max_dimension / page_rect.width
+    scale_height = max_dimension / page_rect.height
+    return min(scale_width, scale_height, 2.8)  # Cap at ~200 DPI (2.8x scale)
+
+
+def _raster_size(page_rect, scale: float) -> Tuple[int, int]:
+    # The pixmap size get_pixmap produces for this scale
+    rect = (page_rect * fitz.Matrix(scale, scale)).irect
+    return rect.width, rect.height
+
+
+def check_page_size(page, scale: float, max_pixels: Optional[int] = None):
+    """
+    Refuse a page before it is rendered: its raster at `scale`, and every
+    image it embeds (decoded at full size by PyMuPDF), must stay within
+    max_pixels (default MAX_IMAGE_PIXELS). Image sizes come from the image
+    dictionaries, so nothing is decoded here.
+    
+    Raises:
+        OversizedPdfError: If the page or one of its images is too large
+    """
+    max_pixels = max_pixels or MAX_IMAGE_PIXELS
+    width, height = _raster_size(page.rect, scale)
+    if width * height > max_pixels:
+        raise OversizedPdfError(
+            f"Page {page.number + 1} renders at {width}x{height} pixels; at most {max_pixels} are accepted"
+        )
+    for image in page.get_images(full=True):
+        image_width, image_height = image[2], image[3]
+        if image_width * image_height > max_pixels:
+            raise OversizedPdfError(
+                f"Page {page.number + 1} contains a {image_width}x{image_height} image; "
+                f"at most {max_pixels} pixels are accepted"
+            )
+
+
+def _render_page(
+    page,
+    max_dimension: int,
+    output_dimension: Optional[int] = None,
+    triage: Optional[PageTriage] = None,
+    regions: Optional[RegionExtractor] = None
+) -> RenderedPage:
+    page_rect = page.rect
+    scale = _page_scale(page_rect, max_dimension)
+    check_page_size(page, scale)
+
+    # Render page with calculated scale
+    mat = fitz.Matrix(scale, scale)
+    pix = page.get_pixmap(matrix=mat, alpha=False, colorspace=fitz.csRGB)
+
+    output_size = None
+    if output_dimension is not None and output_dimension != max_dimension:
+        output_size = _raster_size(page_rect, _page_scale(page_rect, output_dimension))
+    rendered = RenderedPage.from_pixmap(pix, output_size)
+    if triage is not None:
+        rendered.triage = triage.check(page, rendered.array)
+    if regions is not None and rendered.triage is None:
+        rendered.regions = regions.extract(page, scale)
+    return rendered
+
+
+def render_page_range(
+    pdf_path: str,
+    start: int,
+    stop: int,
+    max_dimension: int = 2048,
+    output_dimension: Optional[int] = None,
+    triage: Optional[PageTriage] = None,
+    regions: Optional[RegionExtractor] = None
+) -> List[RenderedPage]:
+    """
+    Render pages [start, stop) of the PDF at pdf_path (see iter_pdf_pages
+    for the arguments).
+    
+    Used by the rasterization worker processes: each opens the document from
+    the shared temp file itself and renders its own page range.
+    """
+    with fitz.open(pdf_path) as pdf:
+        return [
+            _render_page(pdf.load_page(index), max_dimension, output_dimension, triage, regions)
+            for index in range(start, stop)
+        ]
+
+
+class StreamingPdfWriter:
+    """
+    Write an image-only PDF one JPEG page at a time.
+    
+    Each page's JPEG bytes are embedded as-is (DCTDecode) and flushed to disk
+    immediately; only the object offsets are kept in memory, so the annotated
+    PDF of a 300-page document costs no more RAM than a 1-page one.
+    
+    Usage:
+        with StreamingPdfWriter(path) as writer:
+            writer.add_jpeg(jpeg_bytes, width, height)
+    """
+
+    def __init__(self, output_path):
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(output_path, "wb")
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3   # 1 = catalog, 2 = page tree
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_jpeg(self, jpeg_bytes: bytes, width: int, height: int):
+        """Append a page showing a JPEG image at 72 DPI (1 pixel = 1 point)."""
+        image_id, contents_id, page_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+
+        self._write_object(
+            image_id,
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length %d >>"
+            % (width, height, len(jpeg_bytes)),
+            jpeg_bytes
+        )
+        self._write_object(
+            contents_id,
+            None,
+            b"q %d 0 0 %d 0 0 cm /image Do Q" % (width, height)
+        )
+        self._write_object(
+            page_id,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /XObject << /image %d 0 R >> >> /Contents %d 0 R >>"
+            % (width, height, image_id, contents_id)
+        )
+        self._page_ids.append(page_id)
+
+    def close(self):
+        if self._file.closed:
+            return
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)))
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._file.tell()
+        self._file.write(b"xref\n0 %d\n" % self._next_id)
+        self._file.write(b"0000000000 65535 f \n")
+        for object_id in range(1, self._next_id):
+            self._file.write(b"%010d 00000 n \n" % self._offsets[object_id])
+        self._file.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (self._next_id, xref_offset)
+        )
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write_object(self, object_id: int, header: Optional[bytes], stream: Optional[bytes] = None):
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % object_id)
+        if stream is not None:
+            if header is None:
+                header = b"<< /Length %d >>" % len(stream)
+            self._file.write(header + b"\nstream\n" + stream + b"\nendstream")
+        else:
+            self._file.write(header)
+        self._file.write(b"\nendobj\n")
 
 
 
@@ -0,0 +1,47 @@
+"""
+JSON encoding for API responses.
+
+Large /batch-analyze results spend a noticeable part of the request in the
+stdlib encoder, so responses go through orjson when it is installed (it
+also writes NumPy arrays directly, which the compact output format relies
+on). Without orjson the stdlib encoder is used, with NumPy values
+converted to lists first.
+
+Hand over float64 arrays: orjson writes float32 values in their shortest
+float32 form (0.9) but the fallback in float64 digits (0.8999999761581543),
+so float32 output would depend on whether orjson is installed.
+"""
+import json
+from typing import Any
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional; see requirements.txt
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON of content; NumPy arrays and scalars are allowed."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
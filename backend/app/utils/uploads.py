@@ -0,0 +1,77 @@
+"""
+Uploads spooled to disk.
+
+Starlette buffers multipart uploads in a SpooledTemporaryFile, but reading
+one back with `await upload.read()` puts the whole file in memory as a
+single bytes object. save_upload copies it in chunks to a named temp file
+instead; the job then opens that path (as do the raster pool's worker
+processes) and owns it: remove_upload deletes it once the job is done.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Tuple, Union
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+
+from app.config import UPLOAD_CHUNK_BYTES, UPLOAD_TMP_DIR
+
+
+async def save_upload(
+    upload: UploadFile,
+    suffix: str = "",
+    directory: Union[str, Path, None] = UPLOAD_TMP_DIR
+) -> Path:
+    """Copy an upload to a new temp file, UPLOAD_CHUNK_BYTES at a time; return its path."""
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        remove_upload(path)
+        raise
+    return Path(path)
+
+
+def spool_stream(
+    source: BinaryIO,
+    suffix: str = "",
+    directory: Union[str, Path, None] = UPLOAD_TMP_DIR
+) -> Tuple[Path, str]:
+    """
+    Copy a file object (e.g. a ZIP member) to a new temp file in chunks.
+
+    Returns:
+        (path, SHA-256 hex digest of the contents)
+    """
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: source.read(UPLOAD_CHUNK_BYTES), b""):
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        remove_upload(path)
+        raise
+    return Path(path), digest.hexdigest()
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove_upload(path: Union[str, Path, None]):
+    if path is not None:
+        Path(path).unlink(missing_ok=True)
@@ -0,0 +1,77 @@
+"""
+Time and size of the annotated PDF: raster (annotated page JPGs assembled
+into an image-only PDF) against vector (annotations added to the original).
+
+    python -m benchmarks.bench_annotated_pdf --pages 40 --detections 6
+
+No models are needed: every page gets random detections. Only the cost of
+producing the PDF is measured; rasterizing the pages for inference is paid
+either way and is not counted. The raster row does need each page drawn
+and JPEG-encoded (the per-page JPGs reuse that work in eager mode).
+"""
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.annotation_renderer import AnnotationRenderer
+from app.services.annotations import write_vector_pdf
+from app.services.detections import Detections
+from app.utils.pdf_tools import StreamingPdfWriter, iter_pdf_pages
+from benchmarks.common import base_parser, print_table, synthetic_pdf
+
+
+def _detections(pages, count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    classes = ("qr_code", "signature", "stamp")
+    for page in pages:
+        width, height = page.size
+        xy = rng.uniform(0, [width * 0.8, height * 0.8], (count, 2))
+        wh = rng.uniform(40, width * 0.2, (count, 2))
+        yield Detections(
+            np.concatenate([xy, xy + wh], axis=1), rng.uniform(0.25, 1.0, count),
+            rng.integers(0, len(classes), count), classes
+        )
+
+
+def _raster(pages, detections, path: Path):
+    renderer = AnnotationRenderer(jpeg_workers=0)
+    with StreamingPdfWriter(path) as writer:
+        for page, page_detections in zip(pages, detections):
+            writer.add_jpeg(renderer.render_jpeg(page, page_detections), *page.size)
+
+
+def _vector(pdf_bytes, pages, detections, path: Path):
+    sizes = [{"width": page.size[0], "height": page.size[1]} for page in pages]
+    write_vector_pdf(pdf_bytes, list(zip(sizes, detections)), path)
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--detections", type=int, default=6, help="Detections per page")
+    parser.add_argument("--max-dimension", type=int, default=2048, help="Raster size of the pages")
+    args = parser.parse_args()
+
+    pdf_bytes = synthetic_pdf(args.pages)
+    pages = list(iter_pdf_pages(pdf_bytes, args.max_dimension))
+    detections = list(_detections(pages, args.detections))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for style, build in (("raster", lambda path: _raster(pages, detections, path)),
+                             ("vector", lambda path: _vector(pdf_bytes, pages, detections, path))):
+            path = Path(tmp) / f"{style}.pdf"
+            start = time.perf_counter()
+            build(path)
+            elapsed = time.perf_counter() - start
+            rows.append({"style": style, "seconds": elapsed, "ms/page": elapsed * 1000 / len(pages),
+                         "MB": path.stat().st_size / 1e6})
+
+    print(f"{len(pages)} pages at {pages[0].size[0]}x{pages[0].size[1]}, {args.detections} detections/page, "
+          f"source {len(pdf_bytes) / 1e6:.2f} MB")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
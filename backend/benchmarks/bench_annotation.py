@@ -0,0 +1,107 @@
+"""
+Annotated page JPGs: the previous per-page PIL drawing against
+AnnotationRenderer, and JPEG encoding in the caller against the pool.
+
+    python -m benchmarks.bench_annotation --pages 40 --detections 6 --jpeg-workers 2
+
+No models are needed: pages of the synthetic document get random
+detections. "draw ms" and "encode ms" are per page; the pool rows report
+wall time for the whole document, since encodes overlap.
+"""
+import io
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.services.annotation_renderer import AnnotationRenderer
+from app.services.annotations import CLASS_COLORS, DEFAULT_COLOR
+from app.utils.pdf_tools import iter_pdf_pages
+from benchmarks.bench_annotated_pdf import _detections
+from benchmarks.common import base_parser, print_table, synthetic_pdf
+
+
+def _draw_pil(page, detections) -> Image.Image:
+    # What DocumentInspector._draw_all_detections did for every page
+    image = page.image
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("arial.ttf", 32)
+    except OSError:
+        try:
+            font = ImageFont.truetype("Arial Bold.ttf", 32)
+        except OSError:
+            font = ImageFont.load_default()
+    colors = dict(CLASS_COLORS)
+    for class_name, confidence, (x1, y1, x2, y2) in zip(
+        detections.classes, detections.confidence.tolist(), detections.xyxy.tolist()
+    ):
+        color = colors.get(class_name, DEFAULT_COLOR)
+        draw.rectangle([x1, y1, x2, y2], outline=color, width=5)
+        label = f"{class_name} {confidence:.0%}"
+        bbox = draw.textbbox((x1, y1 - 40), label, font=font)
+        draw.rectangle(bbox, fill=color)
+        draw.text((x1, y1 - 40), label, fill="white", font=font)
+    return image
+
+
+def _encode_pil(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--detections", type=int, default=6, help="Detections per page")
+    parser.add_argument("--max-dimension", type=int, default=2048, help="Raster size of the pages")
+    parser.add_argument("--jpeg-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    pages = list(iter_pdf_pages(synthetic_pdf(args.pages), args.max_dimension))
+    detections = list(_detections(pages, args.detections))
+    count = len(pages)
+
+    # Previous path: draw and encode one page after another
+    start = time.perf_counter()
+    drawn = [_draw_pil(page, page_detections) for page, page_detections in zip(pages, detections)]
+    draw_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for image in drawn:
+        _encode_pil(image)
+    encode_time = time.perf_counter() - start
+    rows = [{"path": "PIL, sequential", "draw ms": draw_time * 1000 / count,
+             "encode ms": encode_time * 1000 / count, "total s": draw_time + encode_time, "speedup": 1.0}]
+    baseline = draw_time + encode_time
+    del drawn
+
+    for workers in sorted({0, args.jpeg_workers}):
+        renderer = AnnotationRenderer(jpeg_workers=workers)
+        renderer.draw(pages[0], detections[0])   # Loads the font
+        start = time.perf_counter()
+        futures = [
+            renderer.submit_jpeg(renderer.draw(page, page_detections))
+            for page, page_detections in zip(pages, detections)
+        ]
+        for future in futures:
+            future.result()
+        total = time.perf_counter() - start
+        renderer.shutdown()
+
+        start = time.perf_counter()
+        annotated = [renderer.draw(page, page_detections) for page, page_detections in zip(pages, detections)]
+        draw_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for array in annotated[:8]:
+            renderer.encode_jpeg(array)
+        encode_time = (time.perf_counter() - start) / min(8, count)
+        del annotated
+
+        rows.append({"path": f"renderer, {workers} JPEG workers", "draw ms": draw_time * 1000 / count,
+                     "encode ms": encode_time * 1000, "total s": total, "speedup": baseline / total})
+
+    print(f"{count} pages at {pages[0].size[0]}x{pages[0].size[1]}, {args.detections} detections/page")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Pages/sec and peak memory of the torch, ONNX Runtime and OpenVINO backends.
+
+    python -m benchmarks.bench_backends --pages 40 --synthetic
+    python -m benchmarks.bench_backends --pages 40 --backends torch onnx
+
+Missing exports are created first (app.services.model_export). Every backend
+runs in a fresh process on the same pages, so peak RSS is comparable.
+"""
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+
+from benchmarks.common import base_parser, model_configs, print_table, synthetic_pdf
+
+
+def _run_backend(configs, backend, pages, device, imgsz, batch_size):
+    from app.services.document_inspector import DocumentInspector
+    from app.utils.pdf_tools import iter_pdf_pages
+
+    configs = [{**config, "backend": backend} for config in configs]
+    inspector = DocumentInspector(configs, device=device, imgsz=imgsz)
+    pages = list(iter_pdf_pages(synthetic_pdf(pages)))
+
+    # Warm up so graph compilation / session setup is not timed
+    inspector.detect_images(pages[:2], batch_size=batch_size, annotate=False)
+
+    start = time.perf_counter()
+    results = inspector.detect_images(pages, batch_size=batch_size, annotate=False)
+    elapsed = time.perf_counter() - start
+
+    detections = sum(len(detections) for detections, _ in results)
+    # ru_maxrss is in KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return elapsed, detections, peak_mb
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino"],
+                        choices=("torch", "onnx", "openvino"))
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    from app.services.model_export import backend_model_path, export_model
+
+    configs = model_configs(args.synthetic)
+    for backend in args.backends:
+        if backend == "torch":
+            continue
+        for path in {config["path"] for config in configs}:
+            if not Path(backend_model_path(path, backend)).exists():
+                export_model(path, backend, args.imgsz)
+
+    rows = []
+    baseline = None
+    context = multiprocessing.get_context("spawn")
+    for backend in args.backends:
+        with context.Pool(1) as pool:
+            elapsed, detections, peak_mb = pool.apply(
+                _run_backend, (configs, backend, args.pages, args.device, args.imgsz, args.batch_size)
+            )
+        pages_per_sec = args.pages / elapsed
+        baseline = baseline or pages_per_sec
+        rows.append({"backend": backend, "seconds": elapsed, "pages/sec": pages_per_sec,
+                     "speedup": pages_per_sec / baseline, "detections": detections,
+                     "peak RSS MB": peak_mb})
+
+    print(f"{args.pages} pages, {len(configs)} models, device={args.device}, "
+          f"imgsz={args.imgsz}, batch={args.batch_size}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
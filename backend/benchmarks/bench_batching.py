@@ -0,0 +1,46 @@
+"""
+Pages/sec of the per-page detect_image loop vs batched detect_images.
+
+    python -m benchmarks.bench_batching --pages 40 --device cpu
+    python -m benchmarks.bench_batching --pages 40 --device cuda --batch-sizes 1 4 8 16
+"""
+import time
+
+from app.services.document_inspector import DocumentInspector
+from app.utils.pdf_tools import iter_pdf_pages
+from benchmarks.common import base_parser, model_configs, print_table, synthetic_pdf
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 8, 16])
+    args = parser.parse_args()
+
+    inspector = DocumentInspector(model_configs(args.synthetic), device=args.device, imgsz=args.imgsz)
+    pages = list(iter_pdf_pages(synthetic_pdf(args.pages)))
+
+    # Warm up so model fusing / CUDA init is not timed
+    inspector.detect_images(pages[:2], annotate=False)
+
+    rows = []
+    start = time.perf_counter()
+    for page in pages:
+        inspector.detect_images([page], annotate=False)
+    elapsed = time.perf_counter() - start
+    baseline = len(pages) / elapsed
+    rows.append({"mode": "per-page loop", "batch": 1, "seconds": elapsed,
+                 "pages/sec": baseline, "speedup": 1.0})
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        inspector.detect_images(pages, batch_size=batch_size, annotate=False)
+        elapsed = time.perf_counter() - start
+        rows.append({"mode": "detect_images", "batch": batch_size, "seconds": elapsed,
+                     "pages/sec": len(pages) / elapsed, "speedup": len(pages) / elapsed / baseline})
+
+    print(f"{len(pages)} pages, {len(inspector.models)} models, device={args.device}, imgsz={args.imgsz}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
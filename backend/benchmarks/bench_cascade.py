@@ -0,0 +1,76 @@
+"""
+Throughput and recall of cascade settings against the always-full-resolution
+baseline.
+
+    python -m benchmarks.bench_cascade --pages 24 --blank-ratio 0.5
+    python -m benchmarks.bench_cascade --cascade-sizes 320 640 --cascade-confs 0.01 0.05 0.1
+
+Recall is measured against the baseline's own detections (same class,
+IoU >= 0.5), so it shows what the cascade drops rather than model accuracy.
+"pass rate" is the share of (page, model) pairs that reached the full pass.
+"""
+import time
+
+import numpy as np
+
+from app.services import document_inspector
+from app.services.document_inspector import DocumentInspector
+from app.services.evaluation import score
+from app.services.metrics import MetricsRegistry
+from app.utils.pdf_tools import iter_pdf_pages
+from benchmarks.common import base_parser, model_configs, print_table, synthetic_pdf
+
+
+def _run(inspector, pages, batch_size):
+    registry = MetricsRegistry()
+    document_inspector.registry = registry
+    start = time.perf_counter()
+    results = inspector.detect_images(pages, batch_size=batch_size, annotate=False)
+    elapsed = time.perf_counter() - start
+    return [detections for detections, _ in results], elapsed, registry.get_statistics()["counters"]
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--blank-ratio", type=float, default=0.5,
+                        help="Share of pages replaced by blank pages, like much of the archive")
+    parser.add_argument("--cascade-sizes", type=int, nargs="+", default=[320, 640])
+    parser.add_argument("--cascade-confs", type=float, nargs="+", default=[0.01, 0.05, 0.1])
+    args = parser.parse_args()
+
+    configs = model_configs(args.synthetic)
+    pages = [page.array for page in iter_pdf_pages(synthetic_pdf(args.pages))]
+    if args.blank_ratio > 0:
+        for index in range(0, len(pages), max(1, round(1 / args.blank_ratio))):
+            pages[index] = np.full_like(pages[index], 255)
+
+    baseline_inspector = DocumentInspector(configs, device=args.device, imgsz=args.imgsz)
+    baseline_inspector.detect_images(pages[:1], annotate=False)
+    reference, baseline_time, _ = _run(baseline_inspector, pages, args.batch_size)
+    classes = sorted(set().union(*(detections.classes for detections in reference)))
+
+    rows = [{"cascade": "off", "conf": "-", "seconds": baseline_time,
+             "pages/sec": len(pages) / baseline_time, "speedup": 1.0, "pass rate": 1.0, "recall": 1.0}]
+
+    for cascade_imgsz in args.cascade_sizes:
+        for cascade_conf in args.cascade_confs:
+            inspector = DocumentInspector(configs, device=args.device, imgsz=args.imgsz,
+                                          cascade_imgsz=cascade_imgsz, cascade_conf=cascade_conf)
+            inspector.detect_images(pages[:1], annotate=False)
+            detections, elapsed, counters = _run(inspector, pages, args.batch_size)
+
+            checked = sum(v for k, v in counters.items() if k.endswith(":pages"))
+            passed = sum(v for k, v in counters.items() if k.endswith(":passed"))
+            recall = score(detections, reference, classes, conf_threshold=0.0)["recall"] if classes else 1.0
+            rows.append({"cascade": cascade_imgsz, "conf": cascade_conf, "seconds": elapsed,
+                         "pages/sec": len(pages) / elapsed, "speedup": baseline_time / elapsed,
+                         "pass rate": passed / checked if checked else 0.0, "recall": recall})
+
+    print(f"{len(pages)} pages ({args.blank_ratio:.0%} blank), {len(configs)} models, "
+          f"device={args.device}, imgsz={args.imgsz}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Rasterization throughput of RasterPool from in-process rendering up to N workers.
+
+    python -m benchmarks.bench_raster_pool --pages 60 --documents 5 --workers 1 2 4 8
+
+The corpus is --documents synthetic PDFs of --pages pages each, rendered the
+way /batch-analyze renders a ZIP (iter_documents).
+"""
+import time
+
+from app.services.raster_pool import RasterPool
+from benchmarks.common import base_parser, print_table, synthetic_pdf
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-pages", type=int, default=4)
+    args = parser.parse_args()
+
+    corpus = [(f"doc_{i}.pdf", synthetic_pdf(args.pages, seed=i)) for i in range(args.documents)]
+    total_pages = args.pages * args.documents
+
+    rows = []
+    baseline = None
+    for workers in [0] + args.workers:
+        pool = RasterPool(workers, chunk_pages=args.chunk_pages)
+        if workers:
+            # Start the processes outside the timed region
+            list(pool.iter_documents(iter(corpus[:1])))
+
+        start = time.perf_counter()
+        pages = sum(1 for _, page_index, _ in pool.iter_documents(iter(corpus)) if page_index)
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+
+        throughput = pages / elapsed
+        baseline = baseline or throughput
+        rows.append({"workers": workers or "in-process", "pages": pages, "seconds": elapsed,
+                     "pages/sec": throughput, "speedup": throughput / baseline})
+
+    print(f"{args.documents} documents, {total_pages} pages")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Per-page rasterization cost: the old PNG round trip vs the zero-copy pixmap view.
+
+    python -m benchmarks.bench_rasterize --pages 40
+
+"png round trip" is what pdf_bytes_to_images used to do for every page:
+pix.tobytes("png") → Image.open(...).convert("RGB") → np.array(...), i.e. the
+model input. "pixmap view" is iter_pdf_pages, whose RenderedPage.array is
+handed to the models directly.
+"""
+import io
+import time
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from app.utils.pdf_tools import iter_pdf_pages
+from benchmarks.common import base_parser, print_table, synthetic_pdf
+
+
+def png_round_trip(pdf_bytes: bytes, max_dimension: int = 2048):
+    pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
+    for page in pdf:
+        scale = min(max_dimension / page.rect.width, max_dimension / page.rect.height, 2.8)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        image = Image.open(io.BytesIO(pix.tobytes("png"))).convert("RGB")
+        yield np.array(image)
+    pdf.close()
+
+
+def pixmap_view(pdf_bytes: bytes):
+    for page in iter_pdf_pages(pdf_bytes):
+        yield page.array
+
+
+def main():
+    args = base_parser(__doc__).parse_args()
+    pdf_bytes = synthetic_pdf(args.pages)
+
+    rows = []
+    for name, render in [("png round trip", png_round_trip), ("pixmap view", pixmap_view)]:
+        start = time.perf_counter()
+        count = sum(1 for _ in render(pdf_bytes))
+        elapsed = time.perf_counter() - start
+        rows.append({"path": name, "pages": count, "ms/page": elapsed / count * 1000})
+
+    rows[1]["speedup"] = rows[0]["ms/page"] / rows[1]["ms/page"]
+    rows[0]["speedup"] = 1.0
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Rendering pages at the full raster size against rendering them at the model
+input size (RASTER_AT_MODEL_RESOLUTION).
+
+    python -m benchmarks.bench_render_resolution --pages 20 --synthetic --conf 0.01
+    python -m benchmarks.bench_render_resolution --max-dimension 2048 --imgsz 1280
+
+"render ms" and "infer ms" are per page; inference runs on the same
+inspector for both rows. Detections of the smaller render are mapped back to
+the full raster, as the pipeline reports them; "recall vs full" counts the
+full-raster detections (same class, IoU >= 0.5) the smaller render still
+finds, "extra" the detections only it reports. Random --synthetic weights
+rarely pass the configured thresholds; --conf lowers them for both rows.
+"""
+import time
+
+from app.services.document_inspector import DocumentInspector
+from app.services.evaluation import score
+from app.utils.pdf_tools import iter_pdf_pages
+from benchmarks.common import base_parser, model_configs, print_table, synthetic_pdf
+
+
+def _run(inspector, pdf_bytes, render_dimension, output_dimension, batch_size):
+    start = time.perf_counter()
+    pages = list(iter_pdf_pages(pdf_bytes, render_dimension, output_dimension))
+    render_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = inspector.detect_images([page.array for page in pages], batch_size=batch_size, annotate=False)
+    infer_time = time.perf_counter() - start
+
+    detections = []
+    for page, (page_detections, _) in zip(pages, results):
+        (width, height), (output_width, output_height) = page.size, page.output_size
+        detections.append(page_detections.scale(output_width / width, output_height / height))
+    return pages, detections, render_time, infer_time
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--batch-size", type=int, default=8, help="Pages per forward pass")
+    parser.add_argument("--max-dimension", type=int, default=2048, help="RASTER_MAX_DIMENSION")
+    parser.add_argument("--conf", type=float, default=None, help="Override every model's conf_threshold")
+    args = parser.parse_args()
+
+    configs = model_configs(args.synthetic)
+    if args.conf is not None:
+        for config in configs:
+            config["conf_threshold"] = args.conf
+
+    pdf_bytes = synthetic_pdf(args.pages)
+    inspector = DocumentInspector(configs, device=args.device, imgsz=args.imgsz)
+    inspector.detect_images([next(iter_pdf_pages(pdf_bytes, args.max_dimension)).array], annotate=False)
+
+    rows = []
+    reference = baseline = None
+    for label, render_dimension in (("full raster", args.max_dimension), ("model input", args.imgsz)):
+        pages, detections, render_time, infer_time = _run(
+            inspector, pdf_bytes, render_dimension, args.max_dimension, args.batch_size
+        )
+        total = render_time + infer_time
+        found = sum(len(page) for page in detections)
+        if reference is None:
+            reference, baseline = detections, total
+            classes = sorted(set().union(*(page.classes for page in reference)))
+        recall = score(detections, reference, classes, conf_threshold=0.0)["recall"] if classes else 1.0
+        reference_found = sum(len(page) for page in reference)
+        rows.append({
+            "render": f"{label} ({pages[0].size[0]}x{pages[0].size[1]})",
+            "render ms": render_time * 1000 / len(pages),
+            "infer ms": infer_time * 1000 / len(pages),
+            "pages/sec": len(pages) / total,
+            "speedup": baseline / total,
+            "detections": found,
+            "recall vs full": recall,
+            "extra": max(0, found - round(recall * reference_found))
+        })
+
+    print(f"{args.pages} pages, device={args.device}, imgsz={args.imgsz}, max dimension={args.max_dimension}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
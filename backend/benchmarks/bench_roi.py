@@ -0,0 +1,90 @@
+"""
+ROI mode against full-page inference on a born-digital document.
+
+    python -m benchmarks.bench_roi --pages 20 --synthetic --conf 0.01
+    python -m benchmarks.bench_roi --roi-imgsz 640 --max-regions 12
+
+Pages of the synthetic document carry an embedded image and a drawn box, so
+ROI mode runs the models on two crops per page. "render ms" includes finding
+and rendering the regions, "infer ms" is per page; "recall vs full" counts
+the full-page detections (same class, IoU >= 0.5) ROI mode still reports,
+"extra" the detections only it found (e.g. small objects the crops resolve
+better). Random --synthetic weights rarely pass the configured thresholds;
+--conf lowers them for both rows.
+"""
+import time
+
+from app.services import document_inspector
+from app.services.document_inspector import DocumentInspector
+from app.services.evaluation import score
+from app.services.metrics import MetricsRegistry
+from app.utils.page_regions import RegionExtractor
+from app.utils.pdf_tools import iter_pdf_pages
+from benchmarks.common import base_parser, model_configs, print_table, synthetic_pdf
+
+
+def _run(inspector, pdf_bytes, max_dimension, extractor):
+    registry = MetricsRegistry()
+    document_inspector.registry = registry
+    start = time.perf_counter()
+    pages = list(iter_pdf_pages(pdf_bytes, max_dimension, regions=extractor))
+    render_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = inspector.detect_images(pages, annotate=False)
+    infer_time = time.perf_counter() - start
+    return [detections for detections, _ in results], render_time, infer_time, registry.get_statistics()["counters"]
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--max-dimension", type=int, default=1280, help="Page raster size")
+    parser.add_argument("--roi-imgsz", type=int, default=640)
+    parser.add_argument("--max-regions", type=int, default=12)
+    parser.add_argument("--conf", type=float, default=None, help="Override every model's conf_threshold")
+    args = parser.parse_args()
+
+    configs = model_configs(args.synthetic)
+    if args.conf is not None:
+        for config in configs:
+            config["conf_threshold"] = args.conf
+
+    pdf_bytes = synthetic_pdf(args.pages)
+    extractor = RegionExtractor(target_size=args.roi_imgsz, max_regions=args.max_regions)
+    runs = (
+        ("full page", DocumentInspector(configs, device=args.device, imgsz=args.imgsz), None),
+        ("ROI", DocumentInspector(configs, device=args.device, imgsz=args.imgsz, roi_imgsz=args.roi_imgsz), extractor),
+    )
+
+    rows = []
+    reference = baseline = None
+    for label, inspector, run_extractor in runs:
+        warmup = list(iter_pdf_pages(synthetic_pdf(1), args.max_dimension, regions=run_extractor))
+        inspector.detect_images(warmup, annotate=False)
+
+        detections, render_time, infer_time, counters = _run(inspector, pdf_bytes, args.max_dimension, run_extractor)
+        total = render_time + infer_time
+        found = sum(len(page) for page in detections)
+        if reference is None:
+            reference, baseline = detections, total
+            classes = sorted(set().union(*(page.classes for page in reference)))
+        recall = score(detections, reference, classes, conf_threshold=0.0)["recall"] if classes else 1.0
+        reference_found = sum(len(page) for page in reference)
+        rows.append({
+            "mode": label,
+            "regions/page": counters.get("roi:regions", 0) / args.pages,
+            "render ms": render_time * 1000 / args.pages,
+            "infer ms": infer_time * 1000 / args.pages,
+            "pages/sec": args.pages / total,
+            "speedup": baseline / total,
+            "detections": found,
+            "recall vs full": recall,
+            "extra": max(0, found - round(recall * reference_found))
+        })
+
+    print(f"{args.pages} pages, device={args.device}, imgsz={args.imgsz}, roi imgsz={args.roi_imgsz}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Size and encode time of the /batch-analyze response: default vs. compact
+format, stdlib json (what JSONResponse used) vs. orjson.
+
+    python -m benchmarks.bench_serialization --files 50 --pages 20 --detections 6
+
+No models are needed: the response is built from random detections with
+the same helpers batch_analyze_zip uses. "build ms" is the time to turn
+the detections into the response structure, "encode ms" the time to
+serialize it.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.analysis import _compact_detections, _format_annotations
+from app.services.detections import Detections
+from app.utils import serialization
+from benchmarks.common import print_table
+
+
+def _pages(files: int, pages: int, detections: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    classes = ("qr_code", "signature", "stamp")
+    for _ in range(files * pages):
+        xy = rng.uniform(0, 1400, (detections, 2))
+        wh = rng.uniform(20, 300, (detections, 2))
+        yield Detections(
+            np.concatenate([xy, xy + wh], axis=1), rng.uniform(0.25, 1.0, detections),
+            rng.integers(0, len(classes), detections), classes
+        )
+
+
+def _build(all_detections, files: int, pages: int, compact: bool):
+    result = {}
+    index = 1
+    for number, detections in enumerate(all_detections):
+        document = result.setdefault(f"document_{number // pages}.pdf", {})
+        page_size = {"width": 1448, "height": 2048}
+        if compact:
+            document[f"page_{number % pages + 1}"] = {**_compact_detections(detections), "page_size": page_size}
+        else:
+            document[f"page_{number % pages + 1}"] = {
+                "annotations": _format_annotations(detections, index), "page_size": page_size
+            }
+        index += len(detections)
+    return {"job_id": "bench", "files_processed": files, "result": result, "statistics": {}}
+
+
+def _stdlib(content) -> bytes:
+    # JSONResponse.render, plus NumPy support for the compact format
+    return json.dumps(
+        content, default=serialization._default, ensure_ascii=False, allow_nan=False,
+        indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _best_of(fn, repeat: int):
+    best, value = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=20, help="Pages per file")
+    parser.add_argument("--detections", type=int, default=6, help="Detections per page")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    detections = list(_pages(args.files, args.pages, args.detections))
+    encoders = [("json", _stdlib)]
+    if serialization.orjson is not None:
+        encoders.append(("orjson", serialization.dumps))
+
+    rows = []
+    baseline = None
+    for format_name, compact in (("default", False), ("compact", True)):
+        build, content = _best_of(lambda: _build(detections, args.files, args.pages, compact), args.repeat)
+        for encoder_name, encode in encoders:
+            seconds, payload = _best_of(lambda: encode(content), args.repeat)
+            total = build + seconds
+            baseline = baseline or total
+            rows.append({"format": format_name, "encoder": encoder_name, "build ms": build * 1000,
+                         "encode ms": seconds * 1000, "total speedup": baseline / total,
+                         "bytes": len(payload)})
+
+    print(f"{args.files} files x {args.pages} pages x {args.detections} detections")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
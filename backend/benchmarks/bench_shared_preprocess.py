@@ -0,0 +1,73 @@
+"""
+Per-model preprocessing vs. one shared preprocessed tensor, with the models
+run one after another or concurrently.
+
+    python -m benchmarks.bench_shared_preprocess --pages 16 --synthetic
+    python -m benchmarks.bench_shared_preprocess --pages 16 --device cuda
+
+The breakdown comes from the stage timings in the metrics registry
+(/metrics → detections.timings).
+"""
+import time
+
+from app.services import document_inspector
+from app.services.document_inspector import DocumentInspector, _as_array
+from app.services.metrics import MetricsRegistry
+from app.utils.pdf_tools import iter_pdf_pages
+from benchmarks.common import base_parser, model_configs, print_table, synthetic_pdf
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    configs = model_configs(args.synthetic)
+    pages = list(iter_pdf_pages(synthetic_pdf(args.pages)))
+    arrays = [_as_array(page) for page in pages]
+
+    rows = []
+
+    # Baseline: every model letterboxes and transfers the pages itself
+    inspector = DocumentInspector(configs, device=args.device, imgsz=args.imgsz)
+    for info in inspector.models:
+        info["model"].predict(source=arrays[:1], imgsz=args.imgsz, device=args.device, verbose=False)
+    start = time.perf_counter()
+    for info in inspector.models:
+        for offset in range(0, len(arrays), args.batch_size):
+            info["model"].predict(
+                source=arrays[offset:offset + args.batch_size], imgsz=args.imgsz,
+                conf=info["conf_threshold"], iou=0.5, device=args.device, verbose=False
+            )
+    elapsed = time.perf_counter() - start
+    baseline = len(pages) / elapsed
+    rows.append({"mode": "per-model preprocess", "seconds": elapsed, "pages/sec": baseline,
+                 "speedup": 1.0, "preprocess ms": "-", "models ms": "-"})
+
+    for concurrent in (False, True):
+        inspector = DocumentInspector(configs, device=args.device, imgsz=args.imgsz, concurrent_models=concurrent)
+        inspector.detect_images(pages[:1], annotate=False)
+
+        # Fresh registry so only the timed run is counted
+        registry = MetricsRegistry()
+        document_inspector.registry = registry
+        start = time.perf_counter()
+        inspector.detect_images(pages, batch_size=args.batch_size, annotate=False)
+        elapsed = time.perf_counter() - start
+
+        timings = registry.get_statistics()["timings"]
+        model_ms = " / ".join(
+            f"{timing['total_ms']:.0f}" for stage, timing in timings.items() if stage.startswith("model:")
+        )
+        rows.append({"mode": "shared, " + ("concurrent" if concurrent else "sequential"),
+                     "seconds": elapsed, "pages/sec": len(pages) / elapsed,
+                     "speedup": len(pages) / elapsed / baseline,
+                     "preprocess ms": f"{timings['preprocess']['total_ms']:.0f}", "models ms": model_ms})
+
+    print(f"{len(pages)} pages, {len(configs)} models, device={args.device}, "
+          f"imgsz={args.imgsz}, batch={args.batch_size}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
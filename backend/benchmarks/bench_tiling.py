@@ -0,0 +1,75 @@
+"""
+Throughput and detections of tiled inference against full-page inference.
+
+    python -m benchmarks.bench_tiling --pages 8 --synthetic
+    python -m benchmarks.bench_tiling --render-dimension 4096 --tile-sizes 640 1024 --merge wbf
+
+Pages are rendered at --render-dimension (the RASTER_MAX_DIMENSION a tiled
+deployment would use); every row runs on the same pages. "recall vs full"
+counts the full-page detections (same class, IoU >= 0.5) the tiled run
+still reports, "extra" the detections only the tiled run found.
+"""
+import copy
+import time
+
+from app.services import document_inspector
+from app.services.document_inspector import DocumentInspector
+from app.services.evaluation import score
+from app.services.metrics import MetricsRegistry
+from app.utils.pdf_tools import iter_pdf_pages
+from benchmarks.common import base_parser, model_configs, print_table, synthetic_pdf
+
+
+def _run(inspector, pages, batch_size):
+    registry = MetricsRegistry()
+    document_inspector.registry = registry
+    start = time.perf_counter()
+    results = inspector.detect_images(pages, batch_size=batch_size, annotate=False)
+    elapsed = time.perf_counter() - start
+    return [detections for detections, _ in results], elapsed, registry.get_statistics()["counters"]
+
+
+def main():
+    parser = base_parser(__doc__)
+    parser.add_argument("--batch-size", type=int, default=8, help="Pages (or tiles) per forward pass")
+    parser.add_argument("--render-dimension", type=int, default=4096)
+    parser.add_argument("--tile-sizes", type=int, nargs="+", default=[640, 1024])
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--merge", choices=["nms", "wbf"], default="nms")
+    args = parser.parse_args()
+
+    configs = model_configs(args.synthetic)
+    pages = [page.array for page in iter_pdf_pages(synthetic_pdf(args.pages), args.render_dimension)]
+
+    inspector = DocumentInspector(configs, device=args.device, imgsz=args.imgsz)
+    inspector.detect_images(pages[:1], annotate=False)
+    reference, baseline_time, _ = _run(inspector, pages, args.batch_size)
+    found = sum(len(detections) for detections in reference)
+    classes = sorted(set().union(*(detections.classes for detections in reference)))
+
+    rows = [{"tile": "off", "tiles/page": 0, "seconds": baseline_time, "pages/sec": len(pages) / baseline_time,
+             "speedup": 1.0, "detections": found, "recall vs full": 1.0, "extra": 0}]
+
+    for tile_size in args.tile_sizes:
+        tiled_configs = copy.deepcopy(configs)
+        for config in tiled_configs:
+            config.update(tile_size=tile_size, tile_overlap=args.overlap, tile_merge=args.merge)
+        inspector = DocumentInspector(tiled_configs, device=args.device, imgsz=args.imgsz)
+        inspector.detect_images(pages[:1], annotate=False)
+        detections, elapsed, counters = _run(inspector, pages, args.batch_size)
+
+        tiles = sum(v for k, v in counters.items() if k.startswith("tiles:")) / len(configs)
+        total = sum(len(page) for page in detections)
+        recall = score(detections, reference, classes, conf_threshold=0.0)["recall"] if classes else 1.0
+        rows.append({"tile": tile_size, "tiles/page": tiles / len(pages), "seconds": elapsed,
+                     "pages/sec": len(pages) / elapsed, "speedup": baseline_time / elapsed,
+                     "detections": total, "recall vs full": recall,
+                     "extra": max(0, total - round(recall * found))})
+
+    print(f"{len(pages)} pages at {pages[0].shape[1]}x{pages[0].shape[0]}, {len(configs)} models, "
+          f"device={args.device}, imgsz={args.imgsz}, overlap={args.overlap}, merge={args.merge}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run the benchmarks from the backend directory, e.g.:
+    python -m benchmarks.bench_batching --pages 40 --device cpu
+
+Without the real weights in ./models, pass --synthetic to use randomly
+initialised YOLOv8n models with the same input pipeline.
+"""
+import argparse
+import copy
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+import fitz
+import numpy as np
+
+from app.config import MODEL_CONFIGS
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--pages", type=int, default=40, help="Pages in the synthetic document")
+    parser.add_argument("--device", default="cpu", help="Inference device ('cpu', 'cuda', '0', ...)")
+    parser.add_argument("--imgsz", type=int, default=1280, help="Inference image size")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Use random YOLOv8n weights instead of the models in MODEL_CONFIGS")
+    return parser
+
+
+def model_configs(synthetic: bool) -> List[Dict]:
+    """MODEL_CONFIGS, or the same configs pointing at random weights."""
+    configs = copy.deepcopy(MODEL_CONFIGS)
+    if not synthetic:
+        return configs
+
+    from ultralytics import YOLO
+
+    weights = Path(tempfile.gettempdir()) / "inspector_bench_yolov8n.pt"
+    if not weights.exists():
+        YOLO("yolov8n.yaml").save(str(weights))
+    for config in configs:
+        config["path"] = str(weights)
+    return configs
+
+
+def synthetic_pdf(num_pages: int, seed: int = 0) -> bytes:
+    """A document that looks roughly like a scanned contract: text, boxes and an image."""
+    rng = np.random.default_rng(seed)
+    doc = fitz.open()
+    for index in range(num_pages):
+        page = doc.new_page(width=595, height=842)
+        for line in range(40):
+            page.insert_text((60, 80 + line * 18), f"Clause {index}.{line} " + "lorem ipsum " * 6, fontsize=9)
+        page.draw_rect(fitz.Rect(380, 700, 520, 780), color=(0, 0, 1), width=2)
+
+        stamp = rng.integers(0, 255, (120, 120, 3), dtype=np.uint8)
+        pix = fitz.Pixmap(fitz.csRGB, 120, 120, stamp.tobytes(), False)
+        page.insert_image(fitz.Rect(60, 690, 160, 790), pixmap=pix)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@contextmanager
+def timed(results: Dict, key: str):
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def print_table(rows: List[Dict]):
+    """Print a list of dicts as an aligned text table."""
+    if not rows:
+        return
+    headers = list(rows[0].keys())
+    cells = [[_format(row[h]) for h in headers] for row in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for row in cells:
+        print("  ".join(c.ljust(w) for c, w in zip(row, widths)))
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
@@ -1,5 +1,9 @@
 import axios from "axios";
-import type { AnalyzeResponse, BatchAnalyzeResponse } from "../types/types";
+import type {
+  AnalyzeResponse,
+  BatchAnalyzeResponse,
+  BatchStreamEvent,
+} from "../types/types";
 
 const API_BASE = "http://localhost:8000";
 
@@ -28,3 +32,39 @@ export async function analyzeBatch(file: File): Promise<BatchAnalyzeResponse> {
 
   return res.data;
 }
+
+// Streams /batch-analyze results: onEvent is called for every page as it
+// finishes, so the results view can fill in while the ZIP is processed.
+export async function analyzeBatchStream(
+  file: File,
+  onEvent: (event: BatchStreamEvent) => void
+): Promise<void> {
+  const formData = new FormData();
+  formData.append("zip_file", file);
+
+  const res = await fetch(`${API_BASE}/batch-analyze/stream`, {
+    method: "POST",
+    body: formData,
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`Batch analysis failed with status ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+
+    // One JSON event per line; keep a trailing partial line for later
+    const lines = buffered.split("\n");
+    buffered = lines.pop() ?? "";
+    for (const line of lines) {
+      if (line.trim()) onEvent(JSON.parse(line));
+    }
+
+    if (done) break;
+  }
+}
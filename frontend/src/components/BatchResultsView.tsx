@@ -1,15 +1,17 @@
 import { useState } from "react";
 import { motion } from "framer-motion";
-import { CheckCircle, Copy, Check } from "lucide-react";
+import { CheckCircle, Copy, Check, Loader2 } from "lucide-react";
 import type { BatchAnalyzeResponse } from "../types/types";
 
 interface BatchResultsViewProps {
   result: BatchAnalyzeResponse;
+  inProgress?: boolean;
   onReset: () => void;
 }
 
 export default function BatchResultsView({
   result,
+  inProgress = false,
   onReset,
 }: BatchResultsViewProps) {
   const [copied, setCopied] = useState(false);
@@ -30,9 +32,13 @@ export default function BatchResultsView({
       <div className="flex items-center justify-between mb-8">
         {/* LEFT SIDE — Title */}
         <div className="flex items-center gap-3">
-          <CheckCircle className="w-8 h-8 text-green-500" />
+          {inProgress ? (
+            <Loader2 className="w-8 h-8 text-blue-500 animate-spin" />
+          ) : (
+            <CheckCircle className="w-8 h-8 text-green-500" />
+          )}
           <h2 className="text-3xl font-black bg-gradient-to-r from-gray-300 via-white to-gray-400 bg-clip-text text-transparent">
-            Batch Analysis Complete
+            {inProgress ? "Analyzing Batch..." : "Batch Analysis Complete"}
           </h2>
         </div>
 
@@ -59,6 +65,7 @@ export default function BatchResultsView({
           {/* RESET BUTTON */}
           <button
             onClick={onReset}
+            disabled={inProgress}
             className="px-6 py-2 bg-gray-800 hover:bg-gray-700 rounded-lg transition-colors font-semibold"
           >
             Upload New File
@@ -76,7 +83,9 @@ export default function BatchResultsView({
           <div>
             <span className="text-gray-400">Files Processed:</span>{" "}
             <span className="text-white font-semibold">
-              {result.files_processed}
+              {inProgress
+                ? `${Object.keys(result.result).length} so far`
+                : result.files_processed}
             </span>
           </div>
         </div>
@@ -1,10 +1,14 @@
 import { useState } from "react";
-import type { AnalyzeResponse, BatchAnalyzeResponse } from "../types/types";
+import type {
+  AnalyzeResponse,
+  BatchAnalyzeResponse,
+  BatchStreamEvent,
+} from "../types/types";
 import Header from "./Header";
 import FileUploader from "./FileUploader";
 import ResultsView from "./ResultsView";
 import BatchResultsView from "./BatchResultsView";
-import { analyzePdf, analyzeBatch } from "../api/api";
+import { analyzePdf, analyzeBatchStream } from "../api/api";
 
 export default function UploadForm() {
   const [loading, setLoading] = useState(false);
@@ -12,6 +16,36 @@ export default function UploadForm() {
   const [batchResult, setBatchResult] = useState<BatchAnalyzeResponse | null>(
     null
   );
+  const [batchInProgress, setBatchInProgress] = useState(false);
+
+  // Fold one streamed event into the batch result shown so far
+  function applyBatchEvent(event: BatchStreamEvent) {
+    if (event.event === "error") {
+      throw new Error(event.detail);
+    }
+    setBatchResult((current) => {
+      if (!current) return current;
+      const result = { ...current.result };
+      switch (event.event) {
+        case "file_started":
+          result[event.file] = {};
+          break;
+        case "page":
+          result[event.file] = { ...result[event.file], ...event.page };
+          break;
+        case "file_failed":
+          result[event.file] = { error: event.error };
+          break;
+        case "summary":
+          return {
+            job_id: event.job_id,
+            files_processed: event.files_processed,
+            result,
+          };
+      }
+      return { ...current, result };
+    });
+  }
 
   async function handleUpload(file: File) {
     setLoading(true);
@@ -20,9 +54,18 @@ export default function UploadForm() {
         file.type === "application/zip" || file.name.endsWith(".zip");
 
       if (isZip) {
-        const data = await analyzeBatch(file);
-        setBatchResult(data);
+        // Show the results view right away and fill it in page by page
         setResult(null);
+        setBatchResult({ job_id: "", files_processed: 0, result: {} });
+        setBatchInProgress(true);
+        try {
+          await analyzeBatchStream(file, applyBatchEvent);
+        } catch (err) {
+          setBatchResult(null);
+          throw err;
+        } finally {
+          setBatchInProgress(false);
+        }
       } else {
         const data = await analyzePdf(file);
         setResult(data);
@@ -51,7 +94,11 @@ export default function UploadForm() {
           )}
           {result && <ResultsView result={result} onReset={handleReset} />}
           {batchResult && (
-            <BatchResultsView result={batchResult} onReset={handleReset} />
+            <BatchResultsView
+              result={batchResult}
+              inProgress={batchInProgress}
+              onReset={handleReset}
+            />
           )}
         </div>
       </div>
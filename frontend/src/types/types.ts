@@ -48,3 +48,22 @@ export interface BatchAnalyzeResponse {
   files_processed: number;
   result: Record<string, Record<string, BatchPageResult> | { error: string }>;
 }
+
+// Events of /batch-analyze/stream (one JSON object per line)
+export type BatchStreamEvent =
+  | { event: "file_started"; file: string }
+  | {
+      event: "page";
+      file: string;
+      page_index: number;
+      page: Record<string, BatchPageResult>;
+    }
+  | { event: "file_completed"; file: string; pages: number }
+  | { event: "file_failed"; file: string; error: string }
+  | {
+      event: "summary";
+      job_id: string;
+      files_processed: number;
+      statistics: Record<string, unknown>;
+    }
+  | { event: "error"; status_code: number; detail: string };